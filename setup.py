@@ -72,8 +72,10 @@ setup(
         'console_scripts': [
             'pathfinding-service=pathfinding_service.cli:main',
             'claim-pfs-fees=pathfinding_service.claim_fees:main',
+            'export-pfs-snapshot=pathfinding_service.snapshot:main',
             'monitoring-service=monitoring_service.cli:main',
             'request-collector=request_collector.cli:main',
+            'chain-indexer=raiden_libs.indexer:main',
         ],
     },
 )
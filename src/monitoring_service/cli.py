@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 import click
 import structlog
@@ -14,6 +14,7 @@ from raiden_contracts.constants import (
     CONTRACT_USER_DEPOSIT,
 )
 from raiden_libs.cli import blockchain_options, common_options
+from raiden_libs.constants import DEFAULT_SYNC_PREFETCH_SIZE
 
 log = structlog.get_logger(__name__)
 
@@ -34,6 +35,22 @@ log = structlog.get_logger(__name__)
     type=click.IntRange(min=0),
     help='Number of block confirmations to wait for',
 )
+@click.option(
+    '--eth-ws',
+    type=str,
+    help='Ethereum node websocket URI, new blocks are handled when the node announces them',
+)
+@click.option(
+    '--sync-prefetch',
+    default=DEFAULT_SYNC_PREFETCH_SIZE,
+    type=click.IntRange(min=0),
+    help='Number of block ranges fetched while handling events, 0 syncs sequentially',
+)
+@click.option(
+    '--event-store',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Read the contract events from the event store of a chain indexer, not from the node',
+)
 @common_options('raiden-monitoring-service')
 def main(
     private_key: str,
@@ -42,7 +59,10 @@ def main(
     contracts: Dict[str, Contract],
     start_block: BlockNumber,
     confirmations: BlockNumber,
+    eth_ws: Optional[str],
     min_reward: int,
+    sync_prefetch: int,
+    event_store: Optional[str],
 ) -> int:
     """ The Monitoring service for the Raiden Network. """
     log.info("Starting Raiden Monitoring Service")
@@ -55,6 +75,9 @@ def main(
         required_confirmations=confirmations,
         db_filename=state_db,
         min_reward=min_reward,
+        sync_prefetch_size=sync_prefetch,
+        event_store_filename=event_store,
+        eth_ws_uri=eth_ws,
     )
     ms.start()
 
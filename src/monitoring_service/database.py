@@ -1,6 +1,8 @@
+import heapq
 import os
 import sqlite3
-from typing import List, Optional, Union, cast
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Optional, Tuple, Union, cast
 
 import structlog
 from eth_utils import is_checksum_address
@@ -16,22 +18,44 @@ from monitoring_service.states import (
     MonitorRequest,
     OnChainUpdateStatus,
 )
+from raiden.constants import UINT256_MAX
 from raiden.utils.typing import BlockNumber
 from raiden_libs.states import BlockchainState
 from raiden_libs.types import Address
+from raiden_libs.utils import hex256
 
 SubEvent = Union[ActionMonitoringTriggeredEvent, ActionClaimRewardTriggeredEvent]
+# The primary key of the `scheduled_events` table, ordered by trigger block first
+ScheduledEventKey = Tuple[int, int, str, int, str]
 
 log = structlog.get_logger(__name__)
 SCHEMA_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'schema.sql')
 EVENT_ID_TYPE_MAP = {0: ActionMonitoringTriggeredEvent, 1: ActionClaimRewardTriggeredEvent}
 EVENT_TYPE_ID_MAP = {v: k for k, v in EVENT_ID_TYPE_MAP.items()}
+# Stored as `PRAGMA user_version`, version 0 databases contain `hex` encoded numbers
+SCHEMA_VERSION = 1
+HEX_INT_COLUMNS = {
+    'channel': ['identifier', 'settle_timeout', 'closing_block', 'update_status_nonce'],
+    'monitor_request': ['channel_identifier', 'nonce', 'reward_amount'],
+    'scheduled_events': ['trigger_block_number', 'channel_identifier'],
+}
 
 
 def convert_hex(raw: bytes) -> int:
     return int(raw, 16)
 
 
+def scheduled_event_key(event: ScheduledEvent) -> ScheduledEventKey:
+    contained_event: SubEvent = cast(SubEvent, event.event)
+    return (
+        event.trigger_block_number,
+        EVENT_TYPE_ID_MAP[type(contained_event)],
+        contained_event.token_network_address,
+        contained_event.channel_identifier,
+        contained_event.non_closing_participant,
+    )
+
+
 sqlite3.register_converter('HEX_INT', convert_hex)
 
 
@@ -52,16 +76,33 @@ class SharedDatabase:
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA foreign_keys = ON")
 
+    @contextmanager
+    def transaction(self) -> Generator[None, None, None]:
+        """ Commit all changes made within the context at once
+
+        Nested transactions are part of the outer transaction.
+        """
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
     def upsert_monitor_request(self, request: MonitorRequest) -> None:
         values = [
-            hex(request.channel_identifier),
+            hex256(request.channel_identifier),
             request.token_network_address,
             request.balance_hash,
-            hex(request.nonce),
+            hex256(request.nonce),
             request.additional_hash,
             request.closing_signature,
             request.non_closing_signature,
-            hex(request.reward_amount),
+            hex256(request.reward_amount),
             request.reward_proof_signature,
             request.non_closing_signer,
         ]
@@ -84,7 +125,7 @@ class SharedDatabase:
                   AND token_network_address = ?
                   AND non_closing_signer = ?
             """,
-            [hex(channel_id), token_network_address, non_closing_signer],
+            [hex256(channel_id), token_network_address, non_closing_signer],
         ).fetchone()
         if row is None:
             return None
@@ -99,12 +140,12 @@ class SharedDatabase:
     def upsert_channel(self, channel: Channel) -> None:
         values = [
             channel.token_network_address,
-            hex(channel.identifier),
+            hex256(channel.identifier),
             channel.participant1,
             channel.participant2,
-            hex(channel.settle_timeout),
+            hex256(channel.settle_timeout),
             channel.state,
-            hex(channel.closing_block) if channel.closing_block else None,
+            hex256(channel.closing_block) if channel.closing_block else None,
             channel.closing_participant,
             channel.closing_tx_hash,
             channel.claim_tx_hash,
@@ -112,7 +153,7 @@ class SharedDatabase:
         if channel.update_status:
             values += [
                 channel.update_status.update_sender_address,
-                hex(channel.update_status.nonce),
+                hex256(channel.update_status.nonce),
             ]
         else:
             values += [None, None]
@@ -128,7 +169,7 @@ class SharedDatabase:
                 SELECT * FROM channel
                 WHERE identifier = ? AND token_network_address = ?
             """,
-            [hex(channel_id), token_network_address],
+            [hex256(channel_id), token_network_address],
         ).fetchone()
 
         if row is None:
@@ -151,10 +192,10 @@ class SharedDatabase:
     def upsert_scheduled_event(self, event: ScheduledEvent) -> None:
         contained_event: SubEvent = cast(SubEvent, event.event)
         values = [
-            hex(event.trigger_block_number),
+            hex256(event.trigger_block_number),
             EVENT_TYPE_ID_MAP[type(contained_event)],
             contained_event.token_network_address,
-            hex(contained_event.channel_identifier),
+            hex256(contained_event.channel_identifier),
             contained_event.non_closing_participant,
         ]
         upsert_sql = "INSERT OR REPLACE INTO scheduled_events VALUES ({})".format(
@@ -167,8 +208,9 @@ class SharedDatabase:
             """
                 SELECT * FROM scheduled_events
                 WHERE trigger_block_number <= ?
+                ORDER BY trigger_block_number
             """,
-            [hex(max_trigger_block)],
+            [hex256(max_trigger_block)],
         ).fetchall()
 
         def create_scheduled_event(row: sqlite3.Row) -> ScheduledEvent:
@@ -188,15 +230,17 @@ class SharedDatabase:
     def remove_scheduled_event(self, event: ScheduledEvent) -> None:
         contained_event: SubEvent = cast(SubEvent, event.event)
         values = [
-            hex(event.trigger_block_number),
+            hex256(event.trigger_block_number),
+            EVENT_TYPE_ID_MAP[type(contained_event)],
             contained_event.token_network_address,
-            hex(contained_event.channel_identifier),
+            hex256(contained_event.channel_identifier),
             contained_event.non_closing_participant,
         ]
         self.conn.execute(
             """
                 DELETE FROM scheduled_events
                 WHERE trigger_block_number = ?
+                    AND event_type = ?
                     AND token_network_address = ?
                     AND channel_identifier = ?
                     AND non_closing_participant =?
@@ -256,6 +300,13 @@ class Database(SharedDatabase):
         super(Database, self).__init__(filename, allow_create=True)
         self._setup(chain_id, msc_address, registry_address, receiver, sync_start_block)
 
+        # Scheduled events are kept in memory, ordered by trigger block, and
+        # written through to the db. The heap can contain keys of removed
+        # events, they are skipped when they get to the top.
+        self.scheduled_events: Dict[ScheduledEventKey, ScheduledEvent] = {}
+        self.scheduled_event_heap: List[ScheduledEventKey] = []
+        self._load_scheduled_events()
+
     def _setup(
         self,
         chain_id: int,
@@ -287,10 +338,12 @@ class Database(SharedDatabase):
             ).fetchone()
             for name, old, new in zip(old_settings.keys(), old_settings, settings):
                 assert old == new, f'DB was created with {name}={old}, got {new}!'
+            self._migrate()
         else:
             # create db schema
             with open(SCHEMA_FILENAME) as schema_file:
                 self.conn.executescript(schema_file.read())
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             self.conn.execute(
                 """
                 UPDATE blockchain
@@ -303,6 +356,76 @@ class Database(SharedDatabase):
                 settings + [sync_start_block],
             )
 
+    def _migrate(self) -> None:
+        """ Convert databases created by older versions to the current schema """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        log.info('Migrating database', from_version=version, to_version=SCHEMA_VERSION)
+        # `hex` is not fixed width, so the stored strings don't sort like the numbers
+        self.conn.create_function(
+            'hex_to_hex256', 1, lambda x: None if x is None else hex256(int(x, 16))
+        )
+        self.conn.execute("BEGIN")
+        try:
+            for table, columns in HEX_INT_COLUMNS.items():
+                assignments = ', '.join(
+                    f'{column} = hex_to_hex256({column})' for column in columns
+                )
+                self.conn.execute(f"UPDATE {table} SET {assignments}")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self) -> Generator[None, None, None]:
+        try:
+            with super().transaction():
+                yield
+        except BaseException:
+            # Drop the scheduled events of the rolled back changes
+            self._load_scheduled_events()
+            raise
+
+    def upsert_scheduled_event(self, event: ScheduledEvent) -> None:
+        super().upsert_scheduled_event(event)
+        self._schedule(event)
+
+    def remove_scheduled_event(self, event: ScheduledEvent) -> None:
+        super().remove_scheduled_event(event)
+        self.scheduled_events.pop(scheduled_event_key(event), None)
+
+    def scheduled_event_count(self) -> int:
+        return len(self.scheduled_events)
+
+    def next_scheduled_event(self, max_trigger_block: BlockNumber) -> Optional[ScheduledEvent]:
+        """ Return the scheduled event with the lowest trigger block, if it is due """
+        while self.scheduled_event_heap:
+            key = self.scheduled_event_heap[0]
+            if key[0] > max_trigger_block:
+                return None
+            event = self.scheduled_events.get(key)
+            if event is not None:
+                return event
+            heapq.heappop(self.scheduled_event_heap)
+        return None
+
+    def _load_scheduled_events(self) -> None:
+        self.scheduled_events.clear()
+        self.scheduled_event_heap.clear()
+        for event in self.get_scheduled_events(max_trigger_block=BlockNumber(UINT256_MAX)):
+            self._schedule(event)
+
+    def _schedule(self, event: ScheduledEvent) -> None:
+        key = scheduled_event_key(event)
+        # Events are only stored once, like in the db
+        if key not in self.scheduled_events:
+            self.scheduled_events[key] = event
+            heapq.heappush(self.scheduled_event_heap, key)
+
     def update_state(self, state: MonitoringServiceState) -> None:
         self.conn.execute(
             "UPDATE blockchain SET latest_known_block = ?",
@@ -65,6 +65,7 @@ CREATE TABLE scheduled_events (
     channel_identifier      HEX_INT     NOT NULL,
     non_closing_participant CHAR(42)    NOT NULL,
 
+    -- the primary key index serves the scans for due events by trigger_block_number
     PRIMARY KEY (trigger_block_number, event_type, token_network_address, channel_identifier, non_closing_participant),
     FOREIGN KEY (token_network_address)
         REFERENCES token_network(address)
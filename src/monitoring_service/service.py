@@ -1,6 +1,6 @@
 import sys
 import time
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional
 
 import structlog
 from web3 import Web3
@@ -11,7 +11,6 @@ from monitoring_service.constants import (
     DEFAULT_GAS_BUFFER_FACTOR,
     DEFAULT_GAS_CHECK_BLOCKS,
     DEFAULT_REQUIRED_CONFIRMATIONS,
-    MAX_FILTER_INTERVAL,
 )
 from monitoring_service.database import Database
 from monitoring_service.handlers import HANDLERS, Context
@@ -22,9 +21,13 @@ from raiden_contracts.constants import (
     CONTRACT_USER_DEPOSIT,
     GAS_REQUIRED_FOR_MS_MONITOR,
 )
-from raiden_libs.blockchain import get_blockchain_events
+from raiden_libs.blockchain import stream_blockchain_events
 from raiden_libs.contract_info import CONTRACT_MANAGER
+from raiden_libs.event_store import EventStore
 from raiden_libs.events import Event
+from raiden_libs.new_heads import NewHeadsSubscription, get_head_block_number
+from raiden_libs.states import BlockchainState
+from raiden_libs.sync import SyncPipeline, read_block_range
 from raiden_libs.utils import private_key_to_address
 
 log = structlog.get_logger(__name__)
@@ -66,12 +69,24 @@ class MonitoringService:  # pylint: disable=too-few-public-methods
         required_confirmations: int = DEFAULT_REQUIRED_CONFIRMATIONS,
         poll_interval: float = 1,
         min_reward: int = 0,
+        sync_prefetch_size: int = 0,
+        event_store_filename: Optional[str] = None,
+        eth_ws_uri: Optional[str] = None,
     ):
         self.web3 = web3
         self.private_key = private_key
         self.address = private_key_to_address(private_key)
         self.required_confirmations = required_confirmations
         self.poll_interval = poll_interval
+        self.sync_prefetch_size = sync_prefetch_size
+        self.event_store: Optional[EventStore] = None
+        if event_store_filename is not None:
+            self.event_store = EventStore(event_store_filename)
+            self.event_store.check_required_confirmations(required_confirmations)
+        # The confirmed blocks of the event store are not announced by the node
+        self.new_heads: Optional[NewHeadsSubscription] = None
+        if eth_ws_uri is not None and self.event_store is None:
+            self.new_heads = NewHeadsSubscription(eth_ws_uri)
         self.last_gas_check_block = 0
 
         web3.middleware_stack.add(construct_sign_and_send_raw_middleware(private_key))
@@ -104,8 +119,25 @@ class MonitoringService:  # pylint: disable=too-few-public-methods
     def start(
         self, wait_function: Callable = time.sleep, check_account_gas_reserve: bool = True
     ) -> None:
+        if self.new_heads is not None:
+            self.new_heads.start()
+        sync_pipeline = None
+        # Reading the events from the event store doesn't need prefetching
+        if self.sync_prefetch_size > 0 and self.event_store is None:
+            sync_pipeline = SyncPipeline(
+                web3=self.web3,
+                contract_manager=CONTRACT_MANAGER,
+                chain_state=self.context.ms_state.blockchain_state,
+                required_confirmations=self.required_confirmations,
+                poll_interval=self.poll_interval,
+                prefetch_size=self.sync_prefetch_size,
+                event_types=HANDLERS.keys(),
+                new_heads=self.new_heads,
+            )
+            sync_pipeline.start()
+
         while True:
-            last_confirmed_block = self.web3.eth.blockNumber - self.required_confirmations
+            last_confirmed_block = self._get_last_confirmed_block()
 
             # check gas reserve
             do_gas_reserve_check = (
@@ -116,56 +148,142 @@ class MonitoringService:  # pylint: disable=too-few-public-methods
                 check_gas_reserve(self.web3, self.private_key)
                 self.last_gas_check_block = last_confirmed_block
 
+            if sync_pipeline is not None:
+                self._handle_next_block_range(sync_pipeline)
+                continue
+
             max_query_interval_end_block = (
-                self.context.ms_state.blockchain_state.latest_known_block + MAX_FILTER_INTERVAL
+                self.context.ms_state.blockchain_state.latest_known_block
+                + self.context.ms_state.blockchain_state.filter_interval
             )
             # Limit the max number of blocks that is processed per iteration
-            last_block = min(last_confirmed_block, max_query_interval_end_block)
+            last_block = BlockNumber(min(last_confirmed_block, max_query_interval_end_block))
 
             self._process_new_blocks(last_block)
 
             try:
-                wait_function(self.poll_interval)
+                self._wait_for_new_blocks(wait_function)
             except KeyboardInterrupt:
                 log.info('Shutting down')
                 sys.exit(0)
 
-    def _process_new_blocks(self, last_block: BlockNumber) -> None:
-        self.context.last_known_block = last_block
+    def _handle_next_block_range(self, sync_pipeline: SyncPipeline) -> None:
+        try:
+            # The next range is fetched while the current one is handled
+            block_range = sync_pipeline.get(timeout=self.poll_interval)
+        except KeyboardInterrupt:
+            log.info('Shutting down')
+            sync_pipeline.stop()
+            sys.exit(0)
 
-        # BCL return a new state and events related to channel lifecycle
-        new_chain_state, events = get_blockchain_events(
-            web3=self.web3,
-            contract_manager=CONTRACT_MANAGER,
-            chain_state=self.context.ms_state.blockchain_state,
-            to_block=last_block,
+        if block_range is None:
+            # No new blocks, but triggered events and transactions are still checked
+            self._handle_new_blocks(
+                BlockNumber(self.context.last_known_block),
+                self.context.ms_state.blockchain_state,
+                [],
+            )
+        else:
+            self._handle_new_blocks(
+                block_range.last_block, block_range.chain_state, block_range.events
+            )
+
+    def _wait_for_new_blocks(self, wait_function: Callable) -> None:
+        """ Wake up when the next block is confirmed, poll while there is no subscription """
+        next_block = BlockNumber(
+            self.context.ms_state.blockchain_state.latest_known_block
+            + self.required_confirmations
+            + 1
         )
+        if self.new_heads is None or not self.new_heads.wait_for_block(
+            next_block, timeout=self.poll_interval
+        ):
+            wait_function(self.poll_interval)
 
-        # If a new token network was found we need to write it to the DB, otherwise
-        # the constraints for new channels will not be constrained. But only update
-        # the network addresses here, all else is done later.
-        token_networks_changed = (
-            self.context.ms_state.blockchain_state.token_network_addresses
-            != new_chain_state.token_network_addresses
+    def _get_last_confirmed_block(self) -> BlockNumber:
+        last_confirmed_block = BlockNumber(
+            get_head_block_number(self.web3, self.new_heads) - self.required_confirmations
         )
-        if token_networks_changed:
-            self.context.ms_state.blockchain_state.token_network_addresses = (
-                new_chain_state.token_network_addresses
+        if self.event_store is not None:
+            # The indexer may wait for fewer confirmations than this service
+            return min(last_confirmed_block, self.event_store.get_confirmed_block())
+        return last_confirmed_block
+
+    def _process_new_blocks(self, last_block: BlockNumber) -> None:
+        # BCL return a new state and events related to channel lifecycle
+        if self.event_store is None:
+            new_chain_state, events = stream_blockchain_events(
+                web3=self.web3,
+                contract_manager=CONTRACT_MANAGER,
+                chain_state=self.context.ms_state.blockchain_state,
+                to_block=last_block,
+                event_types=HANDLERS.keys(),
+            )
+        else:
+            new_chain_state, events = self.event_store.stream_blockchain_events(
+                chain_state=self.context.ms_state.blockchain_state,
+                to_block=last_block,
+                event_types=HANDLERS.keys(),
             )
-            self.context.db.update_state(self.context.ms_state)
+        # Fetch the range before the transaction starts. Otherwise the database
+        # would be locked for the request collector during the RPC calls. Large
+        # ranges are ended early.
+        block_range = read_block_range(
+            chain_state=self.context.ms_state.blockchain_state,
+            new_chain_state=new_chain_state,
+            last_block=last_block,
+            events=events,
+        )
+        self._handle_new_blocks(
+            block_range.last_block, block_range.chain_state, block_range.events
+        )
 
-        # Now set the updated chain state to the context, will be stored later
-        self.context.ms_state.blockchain_state = new_chain_state
-        for event in events:
-            handle_event(event, self.context)
+    def _handle_new_blocks(
+        self, last_block: BlockNumber, new_chain_state: BlockchainState, events: List[Event]
+    ) -> None:
+        previous_last_known_block = self.context.last_known_block
+        previous_chain_state = self.context.ms_state.blockchain_state
+        previous_token_network_addresses = list(previous_chain_state.token_network_addresses)
+        self.context.last_known_block = last_block
+
+        # All changes of the block range are committed together with the new
+        # `latest_known_block`, so a crash never leaves a partially handled range
+        try:
+            with self.context.db.transaction():
+                # If a new token network was found we need to write it to the DB, otherwise
+                # the constraints for new channels will not be constrained. But only update
+                # the network addresses here, all else is done later.
+                token_networks_changed = (
+                    previous_chain_state.token_network_addresses
+                    != new_chain_state.token_network_addresses
+                )
+                if token_networks_changed:
+                    previous_chain_state.token_network_addresses = (
+                        new_chain_state.token_network_addresses
+                    )
+                    self.context.db.update_state(self.context.ms_state)
+
+                # Now set the updated chain state to the context, will be stored later
+                self.context.ms_state.blockchain_state = new_chain_state
+                for event in events:
+                    handle_event(event, self.context)
+        except BaseException:
+            # Keep the state in memory consistent with the rolled back database
+            previous_chain_state.token_network_addresses = previous_token_network_addresses
+            self.context.ms_state.blockchain_state = previous_chain_state
+            self.context.last_known_block = previous_last_known_block
+            raise
 
         # check triggered events and trigger the correct ones
-        triggered_events = self.context.db.get_scheduled_events(max_trigger_block=last_block)
-        for scheduled_event in triggered_events:
-            event = scheduled_event.event
+        while True:
+            scheduled_event = self.context.db.next_scheduled_event(max_trigger_block=last_block)
+            if scheduled_event is None:
+                break
 
-            handle_event(event, self.context)
-            self.context.db.remove_scheduled_event(scheduled_event)
+            # Committed right away, the action might have sent a transaction
+            with self.context.db.transaction():
+                handle_event(scheduled_event.event, self.context)
+                self.context.db.remove_scheduled_event(scheduled_event)
 
         # check pending transactions
         # this is done here so we don't have to block waiting for receipts in the state machine
@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import ClassVar, Dict, List, Optional, Tuple, Type
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Type
 
 import marshmallow
 import pkg_resources
@@ -21,11 +21,13 @@ from pathfinding_service.config import (
     DEFAULT_API_PORT,
     DEFAULT_MAX_PATHS,
     MAX_AGE_OF_IOU_REQUESTS,
+    MAX_PATH_REQUESTS_PER_BATCH,
     MAX_PATHS_PER_REQUEST,
     MIN_IOU_EXPIRY,
     UDC_SECURITY_MARGIN_FACTOR,
 )
-from pathfinding_service.model import IOU
+from pathfinding_service.model import IOU, TokenNetwork
+from pathfinding_service.snapshot import encode_snapshot
 from raiden.exceptions import InvalidSignature
 from raiden.utils.signer import recover
 from raiden.utils.typing import Signature, TokenAmount
@@ -67,6 +69,23 @@ class PathfinderResource(Resource):
 
         return None
 
+    def _graph_state(self, token_network: TokenNetwork) -> dict:
+        """ Identifies the state of `token_network` used for a path search """
+        return dict(
+            graph_version=token_network.version,
+            block=self.pathfinding_service.blockchain_state.latest_known_block,
+        )
+
+    def _search_paths(self, token_network: TokenNetwork, method_name: str, **kwargs: Any) -> Any:
+        """ Run the path search `method_name` of `token_network`
+
+        When path workers are used, the search runs in one of them.
+        """
+        worker_pool = self.pathfinding_service.worker_pool
+        if worker_pool is None:
+            return getattr(token_network, method_name)(**kwargs)
+        return worker_pool.call(token_network.address, method_name, kwargs)
+
 
 @add_schema
 @dataclass
@@ -86,6 +105,33 @@ class PathRequest:
     Schema: ClassVar[Type[marshmallow.Schema]]
 
 
+def path_request_args(path_req: PathRequest) -> Dict:
+    """ Return the arguments for `TokenNetwork.get_paths` """
+    args = dict(
+        source=path_req.from_,
+        target=path_req.to,
+        value=path_req.value,
+        max_paths=path_req.max_paths,
+    )
+    # only optional args if not None, so we can use defaults
+    for arg in ['diversity_penalty', 'fee_penalty']:
+        value = getattr(path_req, arg)
+        if value is not None:
+            args[arg] = value
+    return args
+
+
+def no_path_error(path_req: PathRequest) -> Tuple[dict, int]:
+    return (
+        {
+            'errors': 'No suitable path found for transfer from {} to {}.'.format(
+                path_req.from_, path_req.to
+            )
+        },
+        400,
+    )
+
+
 class PathsResource(PathfinderResource):
     def post(self, token_network_address: str) -> Tuple[dict, int]:
         token_network_error = self._validate_token_network_argument(token_network_address)
@@ -106,37 +152,85 @@ class PathsResource(PathfinderResource):
         # Existence is checked in _validate_token_network_argument
         assert token_network, 'Requested token network cannot be found'
 
+        # Reject requests which can't succeed without running a path search
+        if not token_network.is_path_possible(path_req.from_, path_req.to, path_req.value):
+            return no_path_error(path_req)
+
+        # Taken before the search, since other greenlets can update the token
+        # network while a path worker is searching
+        graph_state = self._graph_state(token_network)
         try:
-            # only optional args if not None, so we can use defaults
-            optional_args = {}
-            for arg in ['diversity_penalty', 'fee_penalty']:
-                value = getattr(path_req, arg)
-                if value is not None:
-                    optional_args[arg] = value
-
-            paths = token_network.get_paths(
-                source=path_req.from_,
-                target=path_req.to,
-                value=path_req.value,
-                max_paths=path_req.max_paths,
-                **optional_args,
-            )
+            paths = self._search_paths(token_network, 'get_paths', **path_request_args(path_req))
         except (NetworkXNoPath, NodeNotFound):
-            return (
-                {
-                    'errors': 'No suitable path found for transfer from {} to {}.'.format(
-                        path_req.from_, path_req.to
-                    )
-                },
-                400,
-            )
+            return no_path_error(path_req)
 
-        return {'result': paths}, 200
+        return dict(result=paths, **graph_state), 200
 
 
-def process_payment(iou: IOU, pathfinding_service: PathfindingService) -> None:
+@add_schema
+@dataclass
+class BatchPathRequest:
+    """A HTTP request to BatchPathsResource"""
+
+    requests: List[PathRequest] = field(
+        metadata=dict(validate=marshmallow.validate.Length(min=1, max=MAX_PATH_REQUESTS_PER_BATCH))
+    )
+    iou: Optional[IOU] = None
+    Schema: ClassVar[Type[marshmallow.Schema]]
+
+
+class BatchPathsResource(PathfinderResource):
+    def post(self, token_network_address: str) -> Tuple[dict, int]:
+        token_network_error = self._validate_token_network_argument(token_network_address)
+        if token_network_error is not None:
+            return token_network_error
+
+        json = request.get_json()
+        if not json:
+            raise exceptions.ApiException('JSON payload expected')
+        batch_req, errors = BatchPathRequest.Schema().load(json)
+        if errors:
+            raise exceptions.InvalidRequest(**errors)
+        if any(path_req.iou is not None for path_req in batch_req.requests):
+            raise exceptions.InvalidRequest(iou='Use a single IOU for the whole batch')
+        process_payment(
+            batch_req.iou, self.pathfinding_service, num_requests=len(batch_req.requests)
+        )
+
+        token_network = self.pathfinding_service.token_networks.get(
+            TokenNetworkAddress(token_network_address)
+        )
+        # Existence is checked in _validate_token_network_argument
+        assert token_network, 'Requested token network cannot be found'
+
+        # The path searches don't yield to other greenlets and a worker handles
+        # the whole batch, so all requests are answered for the same state of
+        # the token network.
+        graph_state = self._graph_state(token_network)
+        results = self._search_paths(
+            token_network,
+            'get_paths_batch',
+            requests=[path_request_args(path_req) for path_req in batch_req.requests],
+        )
+        return (
+            {
+                'results': [
+                    dict(result=paths) if paths is not None else no_path_error(path_req)[0]
+                    for path_req, paths in zip(batch_req.requests, results)
+                ],
+                **graph_state,
+            },
+            200,
+        )
+
+
+def process_payment(
+    iou: IOU, pathfinding_service: PathfindingService, num_requests: int = 1
+) -> None:
+    """ Check and store the IOU paying for `num_requests` path requests """
     if pathfinding_service.service_fee == 0:
         return
+    service_fee = pathfinding_service.service_fee * num_requests
     if iou is None:
         raise exceptions.MissingIOU
 
@@ -152,7 +246,7 @@ def process_payment(iou: IOU, pathfinding_service: PathfindingService) -> None:
         if active_iou.expiration_block != iou.expiration_block:
             raise exceptions.UseThisIOU(iou=active_iou)
 
-        expected_amount = active_iou.amount + pathfinding_service.service_fee
+        expected_amount = active_iou.amount + service_fee
     else:
         claimed_iou = pathfinding_service.database.get_iou(
             sender=iou.sender, expiration_block=iou.expiration_block, claimed=True
@@ -163,7 +257,7 @@ def process_payment(iou: IOU, pathfinding_service: PathfindingService) -> None:
         min_expiry = pathfinding_service.web3.eth.blockNumber + MIN_IOU_EXPIRY
         if iou.expiration_block < min_expiry:
             raise exceptions.IOUExpiredTooEarly(min_expiry=min_expiry)
-        expected_amount = pathfinding_service.service_fee
+        expected_amount = service_fee
     if iou.amount < expected_amount:
         raise exceptions.InsufficientServicePayment(expected_amount=expected_amount)
 
@@ -249,8 +343,24 @@ class InfoResource(PathfinderResource):
         )
 
 
+class SnapshotResource(PathfinderResource):
+    def get(self) -> Response:
+        """ Export the token networks as snapshot for bootstrapping other instances """
+        pfs = self.pathfinding_service
+        # Read the block together with the token networks, so that it matches
+        # the exported state
+        with pfs.confirmed_token_networks() as token_networks:
+            block = pfs.blockchain_state.latest_known_block
+            snapshot = encode_snapshot(token_networks, pfs.chain_id, pfs.registry_address, block)
+        return Response(
+            snapshot,
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename=pfs-snapshot-{block}.json.gz'},
+        )
+
+
 class ServiceApi:
-    def __init__(self, pathfinding_service: PathfindingService):
+    def __init__(self, pathfinding_service: PathfindingService, enable_admin_api: bool = False):
         self.flask_app = Flask(__name__)
         self.api = ApiWithErrorHandler(self.flask_app)
         self.rest_server: WSGIServer = None
@@ -258,9 +368,12 @@ class ServiceApi:
 
         resources: List[Tuple[str, Resource, Dict]] = [
             ('/<token_network_address>/paths', PathsResource, {}),
+            ('/<token_network_address>/paths/batch', BatchPathsResource, {}),
             ('/<token_network_address>/payment/iou', IOUResource, {}),
             ('/info', InfoResource, {}),
         ]
+        if enable_admin_api:
+            resources.append(('/admin/snapshot', SnapshotResource, {}))
 
         for endpoint_url, resource, kwargs in resources:
             endpoint_url = API_PATH + endpoint_url
@@ -5,7 +5,7 @@ from gevent import monkey, config  # isort:skip # noqa
 config.resolver = ['dnspython', 'ares', 'block']  # noqa
 monkey.patch_all()  # isort:skip # noqa
 
-from typing import Dict
+from typing import Dict, Optional, Type
 
 import click
 import structlog
@@ -14,15 +14,28 @@ from web3.contract import Contract
 
 from pathfinding_service import PathfindingService
 from pathfinding_service.api import ServiceApi
-from pathfinding_service.config import DEFAULT_API_HOST, DEFAULT_POLL_INTERVALL
+from pathfinding_service.config import (
+    DEFAULT_API_HOST,
+    DEFAULT_PATH_WORKERS,
+    DEFAULT_POLL_INTERVALL,
+    DEFAULT_ROUTE_CACHE_SIZE,
+)
+from pathfinding_service.model import ArrayTokenNetwork, TokenNetwork
+from pathfinding_service.routing import RoutingEngine
 from raiden.utils.typing import BlockNumber
 from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, CONTRACT_USER_DEPOSIT
 from raiden_libs.cli import blockchain_options, common_options
+from raiden_libs.constants import DEFAULT_SYNC_PREFETCH_SIZE
 
 log = structlog.get_logger(__name__)
 
 DEFAULT_REQUIRED_CONFIRMATIONS = 8  # ~2min with 15s blocks
 
+GRAPH_BACKENDS: Dict[str, Type[TokenNetwork]] = {
+    'networkx': TokenNetwork,
+    'array': ArrayTokenNetwork,
+}
+
 
 @blockchain_options(
     contracts_version='0.10.1', contracts=[CONTRACT_TOKEN_NETWORK_REGISTRY, CONTRACT_USER_DEPOSIT]
@@ -43,6 +56,62 @@ DEFAULT_REQUIRED_CONFIRMATIONS = 8  # ~2min with 15s blocks
     type=click.IntRange(min=0),
     help='Number of block confirmations to wait for',
 )
+@click.option(
+    '--eth-ws',
+    type=str,
+    help='Ethereum node websocket URI, new blocks are handled when the node announces them',
+)
+@click.option(
+    '--sync-prefetch',
+    default=DEFAULT_SYNC_PREFETCH_SIZE,
+    type=click.IntRange(min=0),
+    help='Number of block ranges fetched while handling events, 0 syncs sequentially',
+)
+@click.option(
+    '--event-store',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Read the contract events from the event store of a chain indexer, not from the node',
+)
+@click.option(
+    '--optimistic-channels',
+    is_flag=True,
+    help='Route through new channels and deposits before they are confirmed, '
+    'they are removed again if a reorg drops them',
+)
+@click.option(
+    '--routing-engine',
+    default=RoutingEngine.YEN.value,
+    type=click.Choice([engine.value for engine in RoutingEngine]),
+    help='Algorithm used to find multiple paths per request',
+)
+@click.option(
+    '--graph-backend',
+    default='networkx',
+    type=click.Choice(list(GRAPH_BACKENDS)),
+    help='Storage of the token network graphs, `array` needs less memory for large networks',
+)
+@click.option(
+    '--route-cache-size',
+    default=DEFAULT_ROUTE_CACHE_SIZE,
+    type=click.IntRange(min=0),
+    help='Number of path requests per token network for which the results are cached',
+)
+@click.option(
+    '--path-workers',
+    default=DEFAULT_PATH_WORKERS,
+    type=click.IntRange(min=0),
+    help='Number of worker processes for path searches, 0 searches in the main process',
+)
+@click.option(
+    '--bootstrap-snapshot',
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help='Snapshot of the token networks which is loaded into an empty state db',
+)
+@click.option(
+    '--enable-admin-api',
+    is_flag=True,
+    help='Serve the admin endpoints, e.g. for exporting snapshots of the token networks',
+)
 @common_options('raiden-pathfinding-service')
 def main(
     private_key: str,
@@ -51,8 +120,18 @@ def main(
     contracts: Dict[str, Contract],
     start_block: BlockNumber,
     confirmations: int,
+    eth_ws: Optional[str],
+    sync_prefetch: int,
+    event_store: Optional[str],
+    optimistic_channels: bool,
     host: str,
     service_fee: int,
+    routing_engine: str,
+    graph_backend: str,
+    route_cache_size: int,
+    path_workers: int,
+    bootstrap_snapshot: Optional[str],
+    enable_admin_api: bool,
 ) -> int:
     """ The Pathfinding service for the Raiden Network. """
     log.info("Starting Raiden Pathfinding Service")
@@ -69,9 +148,18 @@ def main(
             poll_interval=DEFAULT_POLL_INTERVALL,
             db_filename=state_db,
             service_fee=service_fee,
+            routing_engine=RoutingEngine(routing_engine),
+            token_network_class=GRAPH_BACKENDS[graph_backend],
+            route_cache_size=route_cache_size,
+            num_path_workers=path_workers,
+            bootstrap_snapshot=bootstrap_snapshot,
+            sync_prefetch_size=sync_prefetch,
+            event_store_filename=event_store,
+            eth_ws_uri=eth_ws,
+            optimistic_channels=optimistic_channels,
         )
 
-        api = ServiceApi(service)
+        api = ServiceApi(service, enable_admin_api=enable_admin_api)
         api.run(host=host)
 
         service.run()
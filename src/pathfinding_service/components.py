@@ -0,0 +1,81 @@
+""" Connected components of a token network graph
+
+Channels always add edges in both directions, so the strongly connected
+components of the graph are its connected components. Two nodes in different
+components can never be connected by a path.
+"""
+from collections import deque
+from typing import Dict, Hashable, List
+
+from networkx import DiGraph
+
+Node = Hashable
+
+
+class ComponentIndex:
+    """ Maps each node to the id of its component
+
+    Opened channels merge components immediately. Closed channels can split a
+    component, which is handled by recomputing all components before the next
+    lookup.
+    """
+
+    def __init__(self) -> None:
+        self.component_of: Dict[Node, int] = {}
+        self.members: Dict[int, List[Node]] = {}
+        self.next_id = 0
+        self.outdated = False
+
+    def __repr__(self) -> str:
+        return f'<ComponentIndex components={len(self.members)} outdated={self.outdated}>'
+
+    def channel_opened(self, node1: Node, node2: Node) -> None:
+        if self.outdated:
+            return
+        component1 = self._component(node1)
+        component2 = self._component(node2)
+        if component1 == component2:
+            return
+        # relabel the smaller component
+        if len(self.members[component1]) < len(self.members[component2]):
+            component1, component2 = component2, component1
+        for node in self.members[component2]:
+            self.component_of[node] = component1
+        self.members[component1].extend(self.members.pop(component2))
+
+    def channel_closed(self) -> None:
+        self.outdated = True
+
+    def _component(self, node: Node) -> int:
+        component = self.component_of.get(node)
+        if component is None:
+            component = self.next_id
+            self.next_id += 1
+            self.component_of[node] = component
+            self.members[component] = [node]
+        return component
+
+    def connected(self, G: DiGraph, node1: Node, node2: Node) -> bool:
+        """ Return whether a path between `node1` and `node2` can exist in `G` """
+        if self.outdated:
+            self.rebuild(G)
+        component = self.component_of.get(node1)
+        return component is not None and component == self.component_of.get(node2)
+
+    def rebuild(self, G: DiGraph) -> None:
+        """ Compute all components of `G` """
+        self.component_of = {}
+        self.members = {}
+        for start in G.succ:
+            if start in self.component_of:
+                continue
+            component = self._component(start)
+            queue = deque([start])
+            while queue:
+                node = queue.popleft()
+                for neighbor in G.succ[node]:
+                    if neighbor not in self.component_of:
+                        self.component_of[neighbor] = component
+                        self.members[component].append(neighbor)
+                        queue.append(neighbor)
+        self.outdated = False
@@ -10,6 +10,27 @@ DIVERSITY_PEN_DEFAULT: int = 5
 FEE_PEN_DEFAULT: int = 100
 MAX_PATHS_PER_REQUEST: int = 25
 DEFAULT_MAX_PATHS: int = 5  # number of paths return when no `max_path` argument is given
+MAX_PATH_REQUESTS_PER_BATCH: int = 100
+# Additional searches per path when the penalized Dijkstra routing engine finds a known path
+PENALIZED_DIJKSTRA_MAX_RETRIES: int = 3
+# Changed edges after which the graph of an `ArrayTokenNetwork` is rebuilt, relative
+# to the number of edges, and the minimum number of changes before a rebuild
+ARRAY_GRAPH_COMPACTION_RATIO: float = 0.25
+ARRAY_GRAPH_MIN_COMPACTION_CHANGES: int = 1000
+# Number of path requests per token network for which the results are cached
+DEFAULT_ROUTE_CACHE_SIZE: int = 1000
+# Number of worker processes for path searches, zero searches in the main process
+DEFAULT_PATH_WORKERS: int = 0
+# Token network updates which are collected before sending them to idle path workers
+PATH_WORKER_UPDATE_BATCH_SIZE: int = 100
+# Seconds to wait for path workers to exit before terminating them
+PATH_WORKER_STOP_TIMEOUT: float = 5
+# Accepted capacity updates which are written to the journal at once
+JOURNAL_FLUSH_SIZE: int = 100
+# Maximum number of seconds before accepted capacity updates are written
+JOURNAL_FLUSH_INTERVAL: float = 1
+# Journal entries after which they are applied to the stored channels
+JOURNAL_CHECKPOINT_SIZE: int = 10000
 
 DEFAULT_REVEAL_TIMEOUT: int = 50
 
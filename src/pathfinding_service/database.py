@@ -1,12 +1,14 @@
 import os
 import sqlite3
-from typing import Iterator, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
 
 import structlog
 
-from pathfinding_service.model import IOU
-from raiden.utils.typing import BlockNumber, TokenAmount
-from raiden_libs.types import Address
+from pathfinding_service.model import IOU, ChannelView
+from raiden.utils.typing import BlockNumber, ChainID, ChannelID, TokenAmount
+from raiden_libs.types import Address, TokenNetworkAddress
+from raiden_libs.utils import hex256
 
 log = structlog.get_logger(__name__)
 SCHEMA_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'schema.sql')
@@ -19,14 +21,32 @@ def convert_hex(raw: bytes) -> int:
 sqlite3.register_converter('HEX_INT', convert_hex)
 
 
-def hex256(x: int) -> str:
-    """Hex encodes values up to 256 bits into a fixed length
+def channel_view_rows(
+    participants: Tuple[Address, Address], views: Tuple[ChannelView, ChannelView]
+) -> List[Dict[str, Any]]:
+    """ Return the rows of the `channel_view` table for the views of a channel
 
-    By including this amount of leading zeros in the hex string, lexicographic
-    and numeric ordering are identical. This facilitates working with these
-    numbers in the database without native uint256 support.
+    The row of participant1 is first.
     """
-    return '0x{:064x}'.format(x)
+    participant1, participant2 = participants
+    return [
+        dict(
+            channel_id=view.channel_id,
+            participant1=participant,
+            participant2=partner,
+            settle_timeout=view.settle_timeout,
+            capacity=view.capacity,
+            deposit=view.deposit,
+            reveal_timeout=view.reveal_timeout,
+            update_nonce=view.update_nonce,
+            absolute_fee=view.absolute_fee,
+            relative_fee=view.relative_fee,
+        )
+        for participant, partner, view in (
+            (participant1, participant2, views[0]),
+            (participant2, participant1, views[1]),
+        )
+    ]
 
 
 class PFSDatabase:
@@ -48,8 +68,9 @@ class PFSDatabase:
 
     def _setup(self) -> None:
         """ Make sure that the db is initialized """
+        # Databases of older versions only contain the `iou` table
         initialized = self.conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='iou'"
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='blockchain'"
         ).fetchone()
 
         if not initialized:
@@ -58,6 +79,107 @@ class PFSDatabase:
                 with open(SCHEMA_FILENAME) as schema_file:
                     self.conn.executescript(schema_file.read())
 
+    @contextmanager
+    def transaction(self) -> Generator[None, None, None]:
+        """ Commit all changes made within the context at once
+
+        Nested transactions are part of the outer transaction.
+        """
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def get_latest_known_block(self) -> Optional[BlockNumber]:
+        return self.conn.execute("SELECT latest_known_block FROM blockchain").fetchone()[0]
+
+    def update_latest_known_block(self, latest_known_block: BlockNumber) -> None:
+        self.conn.execute("UPDATE blockchain SET latest_known_block = ?", [latest_known_block])
+
+    def get_chain(self) -> Tuple[Optional[ChainID], Optional[Address]]:
+        """ Return the chain id and token network registry of the stored state """
+        row = self.conn.execute(
+            "SELECT chain_id, token_network_registry_address FROM blockchain"
+        ).fetchone()
+        return row['chain_id'], row['token_network_registry_address']
+
+    def update_chain(self, chain_id: ChainID, registry_address: Address) -> None:
+        self.conn.execute(
+            "UPDATE blockchain SET chain_id = ?, token_network_registry_address = ?",
+            [chain_id, registry_address],
+        )
+
+    def upsert_token_network(self, token_network_address: TokenNetworkAddress) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO token_network VALUES (?)", [token_network_address]
+        )
+
+    def get_token_network_addresses(self) -> List[TokenNetworkAddress]:
+        return [row[0] for row in self.conn.execute("SELECT address FROM token_network")]
+
+    def upsert_channel(
+        self,
+        token_network_address: TokenNetworkAddress,
+        participants: Tuple[Address, Address],
+        views: Tuple[ChannelView, ChannelView],
+    ) -> None:
+        """ Store the views of a channel from participant1 and participant2 """
+        self.insert_channel_views(token_network_address, channel_view_rows(participants, views))
+
+    def insert_channel_views(
+        self, token_network_address: TokenNetworkAddress, rows: List[Dict[str, Any]]
+    ) -> None:
+        """ Store channel views given as rows of the `channel_view` table
+
+        Existing views of the same channel and participant are replaced.
+        """
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO channel_view VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                [
+                    token_network_address,
+                    hex256(row['channel_id']),
+                    row['participant1'],
+                    row['participant2'],
+                    hex256(row['settle_timeout']),
+                    hex256(row['capacity']),
+                    hex256(row['deposit']),
+                    hex256(row['reveal_timeout']),
+                    hex256(row['update_nonce']),
+                    hex256(row['absolute_fee']),
+                    row['relative_fee'],
+                ]
+                for row in rows
+            ],
+        )
+
+    def delete_channel(
+        self, token_network_address: TokenNetworkAddress, channel_id: ChannelID
+    ) -> None:
+        self.conn.execute(
+            "DELETE FROM channel_view WHERE token_network_address = ? AND channel_id = ?",
+            [token_network_address, hex256(channel_id)],
+        )
+
+    def get_channel_views(self, token_network_address: TokenNetworkAddress) -> List[sqlite3.Row]:
+        """ Return the stored channel views in the order in which channels were opened """
+        # Channel ids are increasing and `hex256` keeps their order. The views
+        # of a channel are always stored together, participant1 first.
+        return self.conn.execute(
+            """
+            SELECT * FROM channel_view
+            WHERE token_network_address = ?
+            ORDER BY channel_id, rowid
+        """,
+            [token_network_address],
+        ).fetchall()
+
     def upsert_iou(self, iou: IOU) -> None:
         iou_dict = IOU.Schema(strict=True).dump(iou)[0]
         self.conn.execute(
@@ -110,3 +232,37 @@ class PFSDatabase:
             return next(self.get_ious(sender, expiration_block, claimed))
         except StopIteration:
             return None
+
+    def append_capacity_updates(self, updates: List[Dict[str, Any]]) -> None:
+        """ Add capacity updates to the journal
+
+        Each update contains the `token_network_address` and the arguments of
+        `TokenNetwork.handle_channel_balance_update_message`.
+        """
+        self.conn.executemany(
+            "INSERT INTO capacity_update VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                [
+                    update['token_network_address'],
+                    hex256(update['channel_identifier']),
+                    update['updating_participant'],
+                    update['other_participant'],
+                    hex256(update['updating_nonce']),
+                    hex256(update['other_nonce']),
+                    hex256(update['updating_capacity']),
+                    hex256(update['other_capacity']),
+                    hex256(update['reveal_timeout']),
+                    hex256(update['mediation_fee']),
+                ]
+                for update in updates
+            ],
+        )
+
+    def get_capacity_updates(self) -> List[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM capacity_update ORDER BY rowid").fetchall()
+
+    def capacity_update_count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM capacity_update").fetchone()[0]
+
+    def delete_capacity_updates(self) -> None:
+        self.conn.execute("DELETE FROM capacity_update")
@@ -5,6 +5,10 @@ class InvalidCapacityUpdate(Exception):
     """Exception for incoming messages"""
 
 
+class InvalidSnapshot(Exception):
+    """The snapshot file can't be read"""
+
+
 class ApiException(Exception):
     """An exception that can be returned via the REST API"""
 
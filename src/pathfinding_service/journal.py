@@ -0,0 +1,140 @@
+""" Journal of accepted capacity updates
+
+Capacity updates arrive far more often than channel events. Instead of
+rewriting the channel views for every `UpdatePFS` message, accepted updates
+are appended to a journal in the database. Appends are buffered and written
+in one transaction per group (group commit), so the database doesn't sync to
+disk for each message.
+
+At a checkpoint, the current views of all channels in the journal are
+written to the `channel_view` table and the journal is emptied. After a
+restart, the stored views are loaded and the journal is replayed on top of
+them.
+"""
+import time
+from typing import Any, Dict, List
+
+import structlog
+
+from pathfinding_service.config import (
+    JOURNAL_CHECKPOINT_SIZE,
+    JOURNAL_FLUSH_INTERVAL,
+    JOURNAL_FLUSH_SIZE,
+)
+from pathfinding_service.database import PFSDatabase
+from pathfinding_service.model import TokenNetwork
+from raiden_libs.types import TokenNetworkAddress
+
+log = structlog.get_logger(__name__)
+
+
+class CapacityUpdateJournal:
+    def __init__(
+        self,
+        database: PFSDatabase,
+        flush_size: int = JOURNAL_FLUSH_SIZE,
+        flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+        checkpoint_size: int = JOURNAL_CHECKPOINT_SIZE,
+    ):
+        """
+        flush_size: Number of buffered updates which are written at once
+        flush_interval: Maximum number of seconds an update is buffered
+        checkpoint_size: Number of journal entries after which a checkpoint is made
+        """
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.checkpoint_size = checkpoint_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.last_flush = time.monotonic()
+        self.num_entries = database.capacity_update_count()
+
+    def __repr__(self) -> str:
+        return f'<CapacityUpdateJournal entries={self.num_entries} buffered={len(self.buffer)}>'
+
+    def append(self, token_network_address: TokenNetworkAddress, update: Dict[str, Any]) -> None:
+        """ Add an accepted capacity update
+
+        `update` contains the arguments of `handle_channel_balance_update_message`.
+        """
+        self.buffer.append(dict(update, token_network_address=token_network_address))
+        if (
+            len(self.buffer) >= self.flush_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """ Write all buffered updates """
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        with self.database.transaction():
+            self.database.append_capacity_updates(self.buffer)
+        self.num_entries += len(self.buffer)
+        self.buffer = []
+
+    def is_checkpoint_needed(self) -> bool:
+        return self.num_entries + len(self.buffer) >= self.checkpoint_size
+
+    def checkpoint(self, token_networks: Dict[TokenNetworkAddress, TokenNetwork]) -> None:
+        """ Store the views of all channels in the journal and empty it
+
+        `token_networks` must contain all updates in the journal and buffer.
+        """
+        self.flush()
+        with self.database.transaction():
+            channels = {
+                (row['token_network_address'], row['channel_identifier'])
+                for row in self.database.get_capacity_updates()
+            }
+            for token_network_address, channel_identifier in channels:
+                token_network = token_networks.get(token_network_address)
+                if token_network is None:
+                    continue
+                participants = token_network.channel_id_to_addresses.get(channel_identifier)
+                # closed channels have already been deleted
+                if participants is None:
+                    continue
+                self.database.upsert_channel(
+                    token_network_address,
+                    participants,
+                    token_network.get_channel_views_for_partner(channel_identifier, *participants),
+                )
+            self.database.delete_capacity_updates()
+        log.info('Created capacity update checkpoint', num_entries=self.num_entries)
+        self.num_entries = 0
+
+    def replay(self, token_networks: Dict[TokenNetworkAddress, TokenNetwork]) -> int:
+        """ Apply the updates in the journal to `token_networks`
+
+        Updates which are already included in the loaded channel views, or
+        which are for channels closed in the meantime, are skipped. Returns
+        the number of applied updates.
+        """
+        applied = 0
+        for row in self.database.get_capacity_updates():
+            token_network = token_networks.get(row['token_network_address'])
+            if token_network is None:
+                continue
+            if row['channel_identifier'] not in token_network.channel_id_to_addresses:
+                continue
+
+            view_to_partner, view_from_partner = token_network.get_channel_views_for_partner(
+                channel_identifier=row['channel_identifier'],
+                updating_participant=row['updating_participant'],
+                other_participant=row['other_participant'],
+            )
+            is_nonce_pair_known = (
+                row['updating_nonce'] <= view_to_partner.update_nonce
+                and row['other_nonce'] <= view_from_partner.update_nonce
+            )
+            if is_nonce_pair_known:
+                continue
+
+            update = {key: row[key] for key in row.keys() if key != 'token_network_address'}
+            token_network.handle_channel_balance_update_message(**update)
+            applied += 1
+
+        log.info('Replayed capacity update journal', num_entries=self.num_entries, applied=applied)
+        return applied
@@ -1,5 +1,6 @@
+from .array_token_network import ArrayTokenNetwork
 from .channel_view import ChannelView
 from .iou import IOU
 from .token_network import TokenNetwork
 
-__all__ = ['ChannelView', 'TokenNetwork', 'IOU']
+__all__ = ['ArrayTokenNetwork', 'ChannelView', 'TokenNetwork', 'IOU']
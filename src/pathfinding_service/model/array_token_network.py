@@ -0,0 +1,618 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, ItemsView, Iterator, List, Mapping, Optional, Set, Tuple, cast
+
+import structlog
+from eth_utils import is_checksum_address
+from networkx import NodeNotFound
+
+from pathfinding_service.config import (
+    ARRAY_GRAPH_COMPACTION_RATIO,
+    ARRAY_GRAPH_MIN_COMPACTION_CHANGES,
+    DEFAULT_REVEAL_TIMEOUT,
+    DEFAULT_ROUTE_CACHE_SIZE,
+    DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO,
+    DIVERSITY_PEN_DEFAULT,
+    FEE_PEN_DEFAULT,
+)
+from pathfinding_service.exceptions import InvalidCapacityUpdate
+from pathfinding_service.model.channel_view import ChannelView
+from pathfinding_service.model.token_network import TokenNetwork
+from pathfinding_service.routing import CapacityFunction, RoutingEngine, WeightFunction
+from raiden.constants import UINT64_MAX
+from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_libs.types import Address, TokenNetworkAddress
+
+log = structlog.get_logger(__name__)
+
+# Marks unused edges in `ArrayTokenNetwork.edge_source`
+NO_NODE = -1
+
+
+def _edge_attribute(name: str) -> property:
+    """ Property accessing the value for the view's edge in the network's array `name` """
+
+    def getter(view: 'ArrayChannelView') -> Any:
+        return getattr(view.network, name)[view.edge]
+
+    def setter(view: 'ArrayChannelView', value: Any) -> None:
+        getattr(view.network, name)[view.edge] = value
+
+    return property(getter, setter)
+
+
+def _channel_attribute(name: str) -> property:
+    """ Property accessing the value for the view's channel in the network's array `name` """
+
+    def getter(view: 'ArrayChannelView') -> Any:
+        return getattr(view.network, name)[view.edge // 2]
+
+    return property(getter)
+
+
+class ArrayChannelView(ChannelView):
+    """ `ChannelView` for one edge of an `ArrayTokenNetwork`
+
+    The view does not hold any state itself, all reads and writes go to the
+    arrays of the token network. Views are cheap and created on demand.
+    """
+
+    state = ChannelView.State.OPEN  # closed channels are removed from the network
+    channel_id = _channel_attribute('channel_ids')
+    settle_timeout = _channel_attribute('settle_timeouts')
+    reveal_timeout = _edge_attribute('reveal_timeouts')
+    update_nonce = _edge_attribute('update_nonces')
+    absolute_fee = _edge_attribute('absolute_fees')
+    relative_fee = _edge_attribute('relative_fees')
+    _capacity = _edge_attribute('capacities')
+    _deposit = _edge_attribute('deposits')
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, network: 'ArrayTokenNetwork', edge: int
+    ):
+        self.network = network
+        self.edge = edge
+
+    @property
+    def self(self) -> Address:  # type: ignore
+        return self.network.node_to_address[self.network.edge_source[self.edge]]
+
+    @property
+    def partner(self) -> Address:  # type: ignore
+        return self.network.node_to_address[self.network.edge_source[self.edge ^ 1]]
+
+
+class _Neighbors:
+    """ Neighbors of a single node and the ids of the edges connecting them
+
+    A view of the node's row in an `_Adjacency`, the arrays are not copied.
+    The row is sorted by neighbor, so single edges are found by bisection.
+    """
+
+    def __init__(
+        self,
+        nodes: memoryview,
+        edges: memoryview,
+        added: Optional[Dict[int, int]] = None,
+        removed: Optional[Set[int]] = None,
+    ):
+        self.nodes = nodes
+        self.edges = edges
+        self.added = added
+        self.removed = removed
+
+    def items(self) -> ItemsView:
+        if self.added is None and self.removed is None:
+            return cast(ItemsView, zip(self.nodes, self.edges))
+        return cast(ItemsView, self._iter_items())
+
+    def _iter_items(self) -> Iterator[Tuple[int, int]]:
+        removed = self.removed or ()
+        for neighbor, edge in zip(self.nodes, self.edges):
+            if edge not in removed:
+                yield neighbor, edge
+        if self.added is not None:
+            yield from self.added.items()
+
+    def __iter__(self) -> Iterator[int]:
+        if self.added is None and self.removed is None:
+            return iter(self.nodes)
+        return (neighbor for neighbor, _ in self._iter_items())
+
+    def __len__(self) -> int:
+        return (
+            len(self.nodes)
+            - (len(self.removed) if self.removed is not None else 0)
+            + (len(self.added) if self.added is not None else 0)
+        )
+
+    def __getitem__(self, node: int) -> int:
+        if self.added is not None and node in self.added:
+            return self.added[node]
+        index = bisect_left(self.nodes, node)  # type: ignore
+        if index < len(self.nodes) and self.nodes[index] == node:
+            edge = self.edges[index]
+            if self.removed is None or edge not in self.removed:
+                return edge
+        raise KeyError(node)
+
+
+class _Adjacency:
+    """ Compressed sparse row adjacency, the neighbors of node `n` are stored
+    at `nodes[offsets[n]:offsets[n + 1]]`, sorted by node
+
+    Later changes are stored separately, in `added` per node and as the ids
+    of the edges removed from the arrays in `removed`.
+    """
+
+    def __init__(self, offsets: array, nodes: array, edges: array):
+        self.offsets = offsets
+        self.nodes = nodes
+        self.edges = edges
+        # Slicing these doesn't copy the rows
+        self.nodes_view = memoryview(nodes)
+        self.edges_view = memoryview(edges)
+        self.num_nodes = len(offsets) - 1
+        self.added: Dict[int, Dict[int, int]] = {}
+        self.removed: Dict[int, Set[int]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Token networks are pickled for the path workers, views can't be pickled
+        state = dict(self.__dict__)
+        del state['nodes_view'], state['edges_view']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.nodes_view = memoryview(self.nodes)
+        self.edges_view = memoryview(self.edges)
+
+    def __getitem__(self, node: int) -> _Neighbors:
+        if node < len(self.offsets) - 1:
+            start, end = self.offsets[node], self.offsets[node + 1]
+        else:
+            start = end = 0
+        return _Neighbors(
+            self.nodes_view[start:end],
+            self.edges_view[start:end],
+            self.added.get(node),
+            self.removed.get(node),
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.num_nodes))
+
+    def add(self, node: int, neighbor: int, edge: int) -> None:
+        self.num_nodes = max(self.num_nodes, node + 1, neighbor + 1)
+        self.added.setdefault(node, {})[neighbor] = edge
+
+    def remove(self, node: int, neighbor: int, edge: int) -> None:
+        added = self.added.get(node)
+        if added is not None and added.get(neighbor) == edge:
+            del added[neighbor]
+            if not added:
+                del self.added[node]
+        else:
+            self.removed.setdefault(node, set()).add(edge)
+
+
+class CSRGraph:
+    """ Directed graph on integer node ids, searchable by `pathfinding_service.routing`
+
+    `G[node1][node2]` returns the id of the edge from `node1` to `node2`.
+    The graph is stored in compact arrays, which are built at once. Edges
+    can be added and removed afterwards, but every change makes accessing
+    the neighbors of its nodes slower. Count the changes in `num_changes`
+    and build a new graph when there are too many.
+    """
+
+    def __init__(self, num_nodes: int, edges: List[Tuple[int, int, int]]):
+        """ Build the graph from a list of `(source, target, edge_id)` tuples """
+        self.num_nodes = num_nodes
+        self.num_changes = 0
+        self.succ = self._build_adjacency(num_nodes, edges)
+        self.pred = self._build_adjacency(
+            num_nodes, [(target, source, edge) for source, target, edge in edges]
+        )
+
+    def add_edge(self, source: int, target: int, edge: int) -> None:
+        self.num_nodes = max(self.num_nodes, source + 1, target + 1)
+        self.num_changes += 1
+        self.succ.add(source, target, edge)
+        self.pred.add(target, source, edge)
+        self.succ.num_nodes = self.pred.num_nodes = self.num_nodes
+
+    def remove_edge(self, source: int, target: int, edge: int) -> None:
+        self.num_changes += 1
+        self.succ.remove(source, target, edge)
+        self.pred.remove(target, source, edge)
+
+    @staticmethod
+    def _build_adjacency(num_nodes: int, edges: List[Tuple[int, int, int]]) -> _Adjacency:
+        offsets = array('q', [0] * (num_nodes + 1))
+        for source, _, _ in edges:
+            offsets[source + 1] += 1
+        for node in range(num_nodes):
+            offsets[node + 1] += offsets[node]
+        edges = sorted(edges)
+        return _Adjacency(
+            offsets=offsets,
+            nodes=array('q', (target for _, target, _ in edges)),
+            edges=array('q', (edge for _, _, edge in edges)),
+        )
+
+    def __getitem__(self, node: int) -> _Neighbors:
+        return self.succ[node]
+
+    def __contains__(self, node: Any) -> bool:
+        return isinstance(node, int) and 0 <= node < self.num_nodes
+
+
+class _ChannelAddresses(Mapping[ChannelID, Tuple[Address, Address]]):
+    """ Read only `channel_id_to_addresses` for an `ArrayTokenNetwork` """
+
+    def __init__(self, network: 'ArrayTokenNetwork'):
+        self.network = network
+
+    def __getitem__(self, channel_id: ChannelID) -> Tuple[Address, Address]:
+        slot = self.network.channel_id_to_slot[channel_id]
+        return (
+            self.network.node_to_address[self.network.edge_source[2 * slot]],
+            self.network.node_to_address[self.network.edge_source[2 * slot + 1]],
+        )
+
+    def __iter__(self) -> Iterator[ChannelID]:
+        return iter(self.network.channel_id_to_slot)
+
+    def __len__(self) -> int:
+        return len(self.network.channel_id_to_slot)
+
+
+class ArrayTokenNetwork(TokenNetwork):
+    """ Token network which stores its channels in flat arrays
+
+    This keeps the memory usage per channel low for large token networks.
+    Participants are mapped to integer node ids. Each channel occupies a slot
+    with two directed edges: `2 * slot` from participant1 to participant2 and
+    `2 * slot + 1` in the opposite direction. All channel properties are stored
+    in arrays indexed by slot or edge id. Path searches run on a `CSRGraph` of
+    the edges. Opened and closed channels are added to and removed from the
+    graph, which is rebuilt after many changes.
+    """
+
+    def __init__(
+        self,
+        token_network_address: TokenNetworkAddress,
+        routing_engine: RoutingEngine = RoutingEngine.YEN,
+        route_cache_size: int = DEFAULT_ROUTE_CACHE_SIZE,
+    ):
+        super().__init__(token_network_address, routing_engine, route_cache_size)
+
+        self.address_to_node: Dict[Address, int] = {}
+        self.node_to_address: List[Address] = []
+        self.channel_id_to_slot: Dict[ChannelID, int] = {}
+        self.free_slots: List[int] = []
+        self.open_count = 0
+
+        # indexed by channel slot
+        self.channel_ids: List[ChannelID] = []
+        self.settle_timeouts = array('Q')
+        self.open_order = array('Q')
+
+        # indexed by edge id
+        self.edge_source = array('q')
+        self.capacities: List[TokenAmount] = []
+        self.deposits: List[TokenAmount] = []
+        self.absolute_fees: List[FeeAmount] = []
+        self.relative_fees = array('d')
+        self.reveal_timeouts = array('Q')
+        self.update_nonces = array('Q')
+
+        self.channel_id_to_addresses = _ChannelAddresses(self)  # type: ignore
+        self.G = CSRGraph(0, [])
+        # The edge in `G` and the number of open channels for each pair of nodes
+        self.latest_edges: Dict[Tuple[int, int], int] = {}
+        self.num_channels: Dict[Tuple[int, int], int] = {}
+        self.graph_outdated = False
+
+    def _node(self, address: Address) -> int:
+        node = self.address_to_node.get(address)
+        if node is None:
+            node = len(self.node_to_address)
+            self.address_to_node[address] = node
+            self.node_to_address.append(address)
+        return node
+
+    def _update_graph(self) -> None:
+        # Like the networkx based token network, only use the latest channel if
+        # two participants have more than one channel.
+        latest_edges: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for edge, source in enumerate(self.edge_source):
+            if source == NO_NODE:
+                continue
+            target = self.edge_source[edge ^ 1]
+            order = self.open_order[edge // 2]
+            if latest_edges.get((source, target), (-1, -1))[0] < order:
+                latest_edges[(source, target)] = (order, edge)
+
+        self.G = CSRGraph(
+            num_nodes=len(self.node_to_address),
+            edges=[(source, target, edge) for (source, target), (_, edge) in latest_edges.items()],
+        )
+        self.latest_edges = {nodes: edge for nodes, (_, edge) in latest_edges.items()}
+        self.graph_outdated = False
+
+    def _add_edge(self, edge: int) -> None:
+        """ Add the edge of a new channel to the graph """
+        nodes = (self.edge_source[edge], self.edge_source[edge ^ 1])
+        self.num_channels[nodes] = self.num_channels.get(nodes, 0) + 1
+        # The new channel is the latest one of the nodes
+        previous_edge = self.latest_edges.get(nodes)
+        if previous_edge is not None:
+            self.G.remove_edge(*nodes, previous_edge)
+        self.G.add_edge(*nodes, edge)
+        self.latest_edges[nodes] = edge
+        self._compact_graph_if_needed()
+
+    def _remove_edge(self, edge: int) -> None:
+        """ Remove the edge of a closed channel from the graph """
+        nodes = (self.edge_source[edge], self.edge_source[edge ^ 1])
+        self.num_channels[nodes] -= 1
+        if self.num_channels[nodes] == 0:
+            del self.num_channels[nodes]
+        if self.latest_edges.get(nodes) != edge:
+            return
+        del self.latest_edges[nodes]
+        self.G.remove_edge(*nodes, edge)
+        if nodes in self.num_channels:
+            # An older channel of the same nodes has to be found
+            self.graph_outdated = True
+        self._compact_graph_if_needed()
+
+    def _compact_graph_if_needed(self) -> None:
+        max_changes = max(
+            ARRAY_GRAPH_MIN_COMPACTION_CHANGES,
+            ARRAY_GRAPH_COMPACTION_RATIO * len(self.latest_edges),
+        )
+        if self.G.num_changes > max_changes:
+            self.graph_outdated = True
+
+    #
+    # Contract event listener functions
+    #
+
+    def handle_channel_opened_event(
+        self,
+        channel_identifier: ChannelID,
+        participant1: Address,
+        participant2: Address,
+        settle_timeout: int,
+    ) -> None:
+        assert is_checksum_address(participant1)
+        assert is_checksum_address(participant2)
+
+        self._channel_changed(channel_identifier)
+        slot = self.channel_id_to_slot.get(channel_identifier)
+        if slot is not None:
+            # Opened again, the channel is reset
+            self._remove_edge(2 * slot)
+            self._remove_edge(2 * slot + 1)
+        else:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.channel_ids)
+                self.channel_ids.append(channel_identifier)
+                self.settle_timeouts.append(0)
+                self.open_order.append(0)
+                for _ in range(2):
+                    self.edge_source.append(NO_NODE)
+                    self.capacities.append(TokenAmount(0))
+                    self.deposits.append(TokenAmount(0))
+                    self.absolute_fees.append(FeeAmount(0))
+                    self.relative_fees.append(0)
+                    self.reveal_timeouts.append(0)
+                    self.update_nonces.append(0)
+            self.channel_id_to_slot[channel_identifier] = slot
+
+        self.open_count += 1
+        self.channel_ids[slot] = channel_identifier
+        self.settle_timeouts[slot] = settle_timeout
+        self.open_order[slot] = self.open_count
+        for edge, participant in ((2 * slot, participant1), (2 * slot + 1, participant2)):
+            self.edge_source[edge] = self._node(participant)
+            self.capacities[edge] = TokenAmount(0)
+            self.deposits[edge] = TokenAmount(0)
+            self.absolute_fees[edge] = FeeAmount(0)
+            self.relative_fees[edge] = 0
+            self.reveal_timeouts[edge] = DEFAULT_REVEAL_TIMEOUT
+            self.update_nonces[edge] = 0
+        self._add_edge(2 * slot)
+        self._add_edge(2 * slot + 1)
+        self.components.channel_opened(self.edge_source[2 * slot], self.edge_source[2 * slot + 1])
+
+    def handle_channel_new_deposit_event(
+        self, channel_identifier: ChannelID, receiver: Address, total_deposit: int
+    ) -> None:
+        assert is_checksum_address(receiver)
+        self._channel_changed(channel_identifier)
+
+        try:
+            participant1, participant2 = self.channel_id_to_addresses[channel_identifier]
+        except KeyError:
+            log.error(
+                "Received ChannelNewDeposit event for unknown channel",
+                channel_identifier=channel_identifier,
+            )
+            return
+
+        slot = self.channel_id_to_slot[channel_identifier]
+        if receiver == participant1:
+            ArrayChannelView(self, 2 * slot).update_capacity(deposit=TokenAmount(total_deposit))
+        elif receiver == participant2:
+            ArrayChannelView(self, 2 * slot + 1).update_capacity(
+                deposit=TokenAmount(total_deposit)
+            )
+        else:
+            log.error("Receiver in ChannelNewDeposit does not fit the internal channel")
+
+    def handle_channel_closed_event(self, channel_identifier: ChannelID) -> None:
+        self._channel_changed(channel_identifier)
+        try:
+            slot = self.channel_id_to_slot.pop(channel_identifier)
+        except KeyError:
+            log.error(
+                "Received ChannelClosed event for unknown channel",
+                channel_identifier=channel_identifier,
+            )
+            return
+
+        self._remove_edge(2 * slot)
+        self._remove_edge(2 * slot + 1)
+        self.edge_source[2 * slot] = NO_NODE
+        self.edge_source[2 * slot + 1] = NO_NODE
+        self.free_slots.append(slot)
+        self.components.channel_closed()
+
+    def get_channel_views_for_partner(
+        self,
+        channel_identifier: ChannelID,
+        updating_participant: Address,
+        other_participant: Address,
+    ) -> Tuple[ChannelView, ChannelView]:
+        edge = 2 * self.channel_id_to_slot[channel_identifier]
+        participants = (
+            self.node_to_address[self.edge_source[edge]],
+            self.node_to_address[self.edge_source[edge + 1]],
+        )
+        if participants == (other_participant, updating_participant):
+            edge += 1
+        elif participants != (updating_participant, other_participant):
+            # Like the edge lookup in the networkx graph of `TokenNetwork`
+            raise KeyError(updating_participant)
+        return ArrayChannelView(self, edge), ArrayChannelView(self, edge ^ 1)
+
+    def handle_channel_balance_update_message(
+        self,
+        channel_identifier: ChannelID,
+        updating_participant: Address,
+        other_participant: Address,
+        updating_nonce: Nonce,
+        other_nonce: Nonce,
+        updating_capacity: TokenAmount,
+        other_capacity: TokenAmount,
+        reveal_timeout: int,
+        mediation_fee: FeeAmount,
+    ) -> None:
+        # Nonces and timeouts are stored as unsigned 64 bit integers
+        if max(updating_nonce, other_nonce, reveal_timeout) > UINT64_MAX:
+            raise InvalidCapacityUpdate('Received Capacity Update with impossible values')
+
+        super().handle_channel_balance_update_message(
+            channel_identifier=channel_identifier,
+            updating_participant=updating_participant,
+            other_participant=other_participant,
+            updating_nonce=updating_nonce,
+            other_nonce=other_nonce,
+            updating_capacity=updating_capacity,
+            other_capacity=other_capacity,
+            reveal_timeout=reveal_timeout,
+            mediation_fee=mediation_fee,
+        )
+
+    #
+    # Path search on the arrays
+    #
+
+    def _edge_view(self, edge: Any) -> ChannelView:
+        return ArrayChannelView(self, edge)
+
+    def _weight_function(
+        self, visited: Dict[ChannelID, float], value: TokenAmount, fee_penalty: float
+    ) -> WeightFunction:
+        # Same as `TokenNetwork.edge_weight` and `check_channel_constraints`,
+        # but reading the arrays directly.
+        capacities = self.capacities
+        settle_timeouts = self.settle_timeouts
+        reveal_timeouts = self.reveal_timeouts
+        absolute_fees = self.absolute_fees
+        relative_fees = self.relative_fees
+        channel_ids = self.channel_ids
+
+        def weight(_node1: Address, _node2: Address, edge: int) -> Optional[float]:
+            if value > capacities[edge]:
+                return None
+            ratio = settle_timeouts[edge // 2] / reveal_timeouts[edge]
+            if ratio < DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO:
+                return None
+            diversity_weight = visited.get(channel_ids[edge // 2], 0)
+            fee = int(absolute_fees[edge] + value * relative_fees[edge])
+            return 1 + diversity_weight + fee / 1e18 * fee_penalty
+
+        return weight
+
+    def is_path_possible(self, source: Address, target: Address, value: TokenAmount) -> bool:
+        if self.graph_outdated:
+            self._update_graph()
+        if source not in self.address_to_node or target not in self.address_to_node:
+            return False
+        return super().is_path_possible(
+            source=cast(Address, self.address_to_node[source]),
+            target=cast(Address, self.address_to_node[target]),
+            value=value,
+        )
+
+    def get_max_capacities(self, source: Address) -> Dict[Address, float]:
+        if self.graph_outdated:
+            self._update_graph()
+        if source not in self.address_to_node:
+            raise NodeNotFound(f'source node {source} not in graph')
+        max_capacities = super().get_max_capacities(cast(Address, self.address_to_node[source]))
+        return {
+            self.node_to_address[cast(int, node)]: capacity
+            for node, capacity in max_capacities.items()
+        }
+
+    def _capacity_function(self) -> CapacityFunction:
+        capacities = self.capacities
+        settle_timeouts = self.settle_timeouts
+        reveal_timeouts = self.reveal_timeouts
+
+        def capacity(_node1: Address, _node2: Address, edge: int) -> Optional[int]:
+            ratio = settle_timeouts[edge // 2] / reveal_timeouts[edge]
+            if ratio < DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO:
+                return None
+            return capacities[edge]
+
+        return capacity
+
+    def get_paths(
+        self,
+        source: Address,
+        target: Address,
+        value: TokenAmount,
+        max_paths: int,
+        diversity_penalty: float = DIVERSITY_PEN_DEFAULT,
+        fee_penalty: float = FEE_PEN_DEFAULT,
+        **kwargs: Any,
+    ) -> List[dict]:
+        if self.graph_outdated:
+            self._update_graph()
+        if source not in self.address_to_node:
+            raise NodeNotFound(f'source node {source} not in graph')
+        if target not in self.address_to_node:
+            raise NodeNotFound(f'target node {target} not in graph')
+
+        # The search runs on node ids, translate them back for the result
+        result = super().get_paths(
+            source=cast(Address, self.address_to_node[source]),
+            target=cast(Address, self.address_to_node[target]),
+            value=value,
+            max_paths=max_paths,
+            diversity_penalty=diversity_penalty,
+            fee_penalty=fee_penalty,
+            **kwargs,
+        )
+        for path in result:
+            path['path'] = [self.node_to_address[node] for node in path['path']]
+        return result
@@ -63,6 +63,23 @@ class ChannelView:
 
         self.absolute_fee = mediation_fee
 
+    def restore(
+        self,
+        capacity: TokenAmount,
+        deposit: TokenAmount,
+        reveal_timeout: int,
+        update_nonce: Nonce,
+        absolute_fee: FeeAmount,
+        relative_fee: float,
+    ) -> None:
+        """ Set the state of a view loaded from the database """
+        self._capacity = capacity
+        self._deposit = deposit
+        self.reveal_timeout = reveal_timeout
+        self.update_nonce = update_nonce
+        self.absolute_fee = absolute_fee
+        self.relative_fee = relative_fee
+
     @property
     def deposit(self) -> TokenAmount:
         return self._deposit
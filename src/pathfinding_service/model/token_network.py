@@ -1,16 +1,28 @@
-from typing import Any, Dict, List, Tuple
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import networkx as nx
 import structlog
 from eth_utils import is_checksum_address
-from networkx import DiGraph
+from networkx import DiGraph, NetworkXNoPath, NodeNotFound
 
+from pathfinding_service.components import ComponentIndex
 from pathfinding_service.config import (
+    DEFAULT_ROUTE_CACHE_SIZE,
     DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO,
     DIVERSITY_PEN_DEFAULT,
     FEE_PEN_DEFAULT,
+    PENALIZED_DIJKSTRA_MAX_RETRIES,
 )
 from pathfinding_service.model.channel_view import ChannelView
+from pathfinding_service.route_cache import RouteCache
+from pathfinding_service.routing import (
+    CapacityFunction,
+    RoutingEngine,
+    WeightFunction,
+    shortest_path,
+    shortest_simple_paths,
+    widest_paths,
+)
 from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
 from raiden_libs.types import Address, TokenNetworkAddress
 
@@ -20,13 +32,24 @@ log = structlog.get_logger(__name__)
 class TokenNetwork:
     """ Manages a token network for pathfinding. """
 
-    def __init__(self, token_network_address: TokenNetworkAddress):
+    def __init__(
+        self,
+        token_network_address: TokenNetworkAddress,
+        routing_engine: RoutingEngine = RoutingEngine.YEN,
+        route_cache_size: int = DEFAULT_ROUTE_CACHE_SIZE,
+    ):
         """ Initializes a new TokenNetwork. """
 
         self.address = token_network_address
         self.channel_id_to_addresses: Dict[ChannelID, Tuple[Address, Address]] = dict()
         self.G = DiGraph()
         self.max_relative_fee = 0
+        self.routing_engine = routing_engine
+        self.route_cache = RouteCache(maxsize=route_cache_size)
+        self.components = ComponentIndex()
+        # Incremented when changes are published, see `publish_version`
+        self.version = 0
+        self.has_unpublished_changes = False
 
     def __repr__(self) -> str:
         return (
@@ -34,6 +57,21 @@ class TokenNetwork:
             f'num_channels = {len(self.channel_id_to_addresses)}>'
         )
 
+    def _channel_changed(self, channel_identifier: ChannelID) -> None:
+        """ Must be called before each change of a channel """
+        self.has_unpublished_changes = True
+        self.route_cache.invalidate(channel_identifier)
+
+    def publish_version(self) -> None:
+        """ Start a new version if the graph has changed
+
+        Must only be called after a complete set of changes, e.g. a whole
+        block range, so that each version is a consistent state.
+        """
+        if self.has_unpublished_changes:
+            self.version += 1
+            self.has_unpublished_changes = False
+
     #
     # Contract event listener functions
     #
@@ -52,6 +90,7 @@ class TokenNetwork:
         assert is_checksum_address(participant1)
         assert is_checksum_address(participant2)
 
+        self._channel_changed(channel_identifier)
         self.channel_id_to_addresses[channel_identifier] = (participant1, participant2)
 
         view1 = ChannelView(
@@ -72,6 +111,7 @@ class TokenNetwork:
 
         self.G.add_edge(participant1, participant2, view=view1)
         self.G.add_edge(participant2, participant1, view=view2)
+        self.components.channel_opened(participant1, participant2)
 
     def handle_channel_new_deposit_event(
         self, channel_identifier: ChannelID, receiver: Address, total_deposit: int
@@ -81,6 +121,7 @@ class TokenNetwork:
         Corresponds to the ChannelNewDeposit event. Called by the contract event listener. """
 
         assert is_checksum_address(receiver)
+        self._channel_changed(channel_identifier)
 
         try:
             participant1, participant2 = self.channel_id_to_addresses[channel_identifier]
@@ -103,12 +144,14 @@ class TokenNetwork:
 
         Corresponds to the ChannelClosed event. Called by the contract event listener. """
 
+        self._channel_changed(channel_identifier)
         try:
             # we need to unregister the channel_id here
             participant1, participant2 = self.channel_id_to_addresses.pop(channel_identifier)
 
             self.G.remove_edge(participant1, participant2)
             self.G.remove_edge(participant2, participant1)
+            self.components.channel_closed()
         except KeyError:
             log.error(
                 "Received ChannelClosed event for unknown channel",
@@ -141,6 +184,7 @@ class TokenNetwork:
         mediation_fee: FeeAmount,
     ) -> None:
         """ Sends Capacity Update to PFS including the reveal timeout """
+        self._channel_changed(channel_identifier)
         channel_view_to_partner, channel_view_from_partner = self.get_channel_views_for_partner(
             channel_identifier=channel_identifier,
             updating_participant=updating_participant,
@@ -155,6 +199,33 @@ class TokenNetwork:
         )
         channel_view_from_partner.update_capacity(nonce=other_nonce, capacity=other_capacity)
 
+    def restore_channel_view(
+        self,
+        channel_identifier: ChannelID,
+        participant: Address,
+        partner: Address,
+        capacity: TokenAmount,
+        deposit: TokenAmount,
+        reveal_timeout: int,
+        update_nonce: Nonce,
+        absolute_fee: FeeAmount,
+        relative_fee: float,
+    ) -> None:
+        """ Set the state of the view from `participant` to `partner`
+
+        Used to undo changes which have not been confirmed, see `ChannelView.restore`.
+        """
+        self._channel_changed(channel_identifier)
+        view, _ = self.get_channel_views_for_partner(channel_identifier, participant, partner)
+        view.restore(
+            capacity=capacity,
+            deposit=deposit,
+            reveal_timeout=reveal_timeout,
+            update_nonce=update_nonce,
+            absolute_fee=absolute_fee,
+            relative_fee=relative_fee,
+        )
+
     @staticmethod
     def edge_weight(
         visited: Dict[ChannelID, float],
@@ -167,18 +238,118 @@ class TokenNetwork:
         fee_weight = view.fee(amount) / 1e18 * fee_penalty
         return 1 + diversity_weight + fee_weight
 
-    def check_path_constraints(self, value: int, path: List) -> bool:
-        for node1, node2 in zip(path[:-1], path[1:]):
-            channel: ChannelView = self.G[node1][node2]['view']
-            # check if available balance > value
-            if value > channel.capacity:
-                return False
-            # check if settle_timeout / reveal_timeout >= default ratio
-            ratio = channel.settle_timeout / channel.reveal_timeout
-            if ratio < DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO:
-                return False
+    @staticmethod
+    def check_channel_constraints(value: int, channel: ChannelView) -> bool:
+        # check if available balance > value
+        if value > channel.capacity:
+            return False
+        # check if settle_timeout / reveal_timeout >= default ratio
+        ratio = channel.settle_timeout / channel.reveal_timeout
+        if ratio < DEFAULT_SETTLE_TO_REVEAL_TIMEOUT_RATIO:
+            return False
         return True
 
+    def check_path_constraints(self, value: int, path: List) -> bool:
+        return all(
+            self.check_channel_constraints(value, self._channel_view(node1, node2))
+            for node1, node2 in zip(path[:-1], path[1:])
+        )
+
+    def is_path_possible(self, source: Address, target: Address, value: TokenAmount) -> bool:
+        """ Quickly check whether `get_paths` can find any path
+
+        A result of False means that no path exists. This is the case if source
+        and target are not connected or if no usable channel leaving the source or
+        reaching the target has enough capacity for `value`.
+        """
+        if source not in self.G or target not in self.G:
+            return False
+        if source == target:
+            return True
+        if not self.components.connected(self.G, source, target):
+            return False
+        # Every path leaves the source and reaches the target through one of these
+        # channels, so their capacities are upper bounds for the bottleneck capacity.
+        capacity_out = self._max_capacity(
+            self._edge_view(edge) for _, edge in self.G.succ[source].items()
+        )
+        capacity_in = self._max_capacity(
+            self._edge_view(edge) for _, edge in self.G.pred[target].items()
+        )
+        return value <= min(capacity_out, capacity_in)
+
+    def _max_capacity(self, views: Iterable[ChannelView]) -> int:
+        return max(
+            (view.capacity for view in views if self.check_channel_constraints(0, view)), default=0
+        )
+
+    def get_max_capacities(self, source: Address) -> Dict[Address, float]:
+        """ Return the largest amount which can be transferred from `source` to each node """
+        return widest_paths(self.G, source, self._capacity_function())
+
+    def _capacity_function(self) -> CapacityFunction:
+        def capacity(_node1: Address, _node2: Address, attr: Dict[str, Any]) -> Optional[int]:
+            view: ChannelView = attr['view']
+            if not self.check_channel_constraints(0, view):
+                return None
+            return view.capacity
+
+        return capacity
+
+    def _channel_view(self, node1: Address, node2: Address) -> ChannelView:
+        """ Return the view for the edge from `node1` to `node2` in `self.G` """
+        return self._edge_view(self.G[node1][node2])
+
+    def _edge_view(self, edge: Any) -> ChannelView:
+        """ Return the view for the data of an edge in `self.G` """
+        return edge['view']
+
+    def _weight_function(
+        self, visited: Dict[ChannelID, float], value: TokenAmount, fee_penalty: float
+    ) -> WeightFunction:
+        def weight(_node1: Address, _node2: Address, attr: Dict[str, Any]) -> Optional[float]:
+            # Computed on demand for the edges the search relaxes, the graph itself
+            # is not modified and can be shared between concurrent requests.
+            # Channels which can't be used for this payment are hidden from the search.
+            if not self.check_channel_constraints(value, attr['view']):
+                return None
+            return self.edge_weight(visited, attr, value, fee_penalty)
+
+        return weight
+
+    def _next_path_yen(
+        self, source: Address, target: Address, weight: WeightFunction, paths: List[List[Address]]
+    ) -> Optional[List[Address]]:
+        all_paths = shortest_simple_paths(self.G, source, target, weight=weight)
+        # skip duplicates
+        return next((path for path in all_paths if path not in paths), None)
+
+    def _next_path_penalized_dijkstra(
+        self,
+        source: Address,
+        target: Address,
+        weight: WeightFunction,
+        paths: List[List[Address]],
+        visited: Dict[ChannelID, float],
+    ) -> Optional[List[Address]]:
+        # Known paths are made more expensive until a new path is found. These
+        # penalties only apply while searching for this path.
+        penalties = dict(visited)
+        retry_penalty = 1.0  # one hop, doubled on each retry
+        try:
+            for _ in range(1 + PENALIZED_DIJKSTRA_MAX_RETRIES):
+                path = shortest_path(self.G, source, target, weight=weight)
+                if path not in paths:
+                    return path
+                for node1, node2 in zip(path[:-1], path[1:]):
+                    channel_id = self._channel_view(node1, node2).channel_id
+                    visited[channel_id] = visited.get(channel_id, 0) + retry_penalty
+                retry_penalty *= 2
+            return None
+        finally:
+            visited.clear()
+            visited.update(penalties)
+
     def get_paths(
         self,
         source: Address,
@@ -194,41 +365,111 @@ class TokenNetwork:
         value: Amount of transferred tokens. Used for capacity checks
         diversity_penalty: One previously used channel is as bad as X more hops
         fee_penalty: One RDN in fees is as bad as X more hops
+
+        Results are cached for identical requests. Cached paths are removed
+        when one of their channels changes. Only complete results are cached,
+        since a new channel or capacity anywhere in the network can add paths
+        to a result with fewer than `max_paths` paths.
+        """
+        cache_key = (
+            source,
+            target,
+            value,
+            max_paths,
+            diversity_penalty,
+            fee_penalty,
+            self.routing_engine,
+        )
+        paths = self.route_cache.get(cache_key)
+        if paths is None:
+            paths = self._find_paths(
+                source, target, value, max_paths, diversity_penalty, fee_penalty
+            )
+            if len(paths) == max_paths:
+                channel_ids = {
+                    self._channel_view(node1, node2).channel_id
+                    for path in paths
+                    for node1, node2 in zip(path[:-1], path[1:])
+                }
+                self.route_cache.put(cache_key, paths, channel_ids)
+
+        result = []
+        for path in paths:
+            fee = 0
+            for node1, node2 in zip(path[:-1], path[1:]):
+                fee += self._channel_view(node1, node2).fee(value)
+
+            result.append(dict(path=path, estimated_fee=fee))
+        return result
+
+    def get_paths_batch(self, requests: List[Dict[str, Any]]) -> List[Optional[List[dict]]]:
+        """ Find paths for several requests at once
+
+        Each request is a dict of keyword arguments for `get_paths`. The results
+        are returned in the same order, `None` meaning that no path was found.
+        Identical requests are only searched once. Sources with multiple
+        requests share a single widest path search, which rejects requests for
+        more than any path can carry without a path search. The path searches
+        themselves are run per request, since their edge weights and bounds
+        depend on the amount and the target.
         """
+        requests_per_source = Counter(request['source'] for request in requests)
+        max_capacities: Dict[Address, Dict[Address, float]] = {}
+        results_by_request: Dict[Tuple, Optional[List[dict]]] = {}
+        results: List[Optional[List[dict]]] = []
+        for request in requests:
+            request_key = tuple(sorted(request.items()))
+            if request_key not in results_by_request:
+                results_by_request[request_key] = self._get_paths_in_batch(
+                    request, max_capacities, requests_per_source[request['source']] > 1
+                )
+            results.append(results_by_request[request_key])
+        return results
+
+    def _get_paths_in_batch(
+        self,
+        request: Dict[str, Any],
+        max_capacities: Dict[Address, Dict[Address, float]],
+        share_max_capacities: bool,
+    ) -> Optional[List[dict]]:
+        source, target, value = request['source'], request['target'], request['value']
+        if not self.is_path_possible(source, target, value):
+            return None
+        if share_max_capacities:
+            if source not in max_capacities:
+                max_capacities[source] = self.get_max_capacities(source)
+            if value > max_capacities[source].get(target, 0):
+                return None
+        try:
+            return self.get_paths(**request)
+        except (NetworkXNoPath, NodeNotFound):
+            return None
+
+    def _find_paths(
+        self,
+        source: Address,
+        target: Address,
+        value: TokenAmount,
+        max_paths: int,
+        diversity_penalty: float,
+        fee_penalty: float,
+    ) -> List[List[Address]]:
         visited: Dict[ChannelID, float] = {}
         paths: List[List[Address]] = []
+        weight = self._weight_function(visited, value, fee_penalty)
 
         for _ in range(max_paths):
-            # update edge weights
-            for node1, node2 in self.G.edges():
-                edge = self.G[node1][node2]
-                edge['weight'] = self.edge_weight(visited, edge, value, fee_penalty)
-
             # find next path
-            all_paths = nx.shortest_simple_paths(self.G, source, target, weight='weight')
-            try:
-                # skip duplicates and invalid paths
-                path = next(
-                    path
-                    for path in all_paths
-                    if self.check_path_constraints(value, path) and path not in paths
-                )
-            except StopIteration:
+            if self.routing_engine == RoutingEngine.PENALIZED_DIJKSTRA:
+                path = self._next_path_penalized_dijkstra(source, target, weight, paths, visited)
+            else:
+                path = self._next_path_yen(source, target, weight, paths)
+            if path is None:
                 break
             # update visited penalty dict
             for node1, node2 in zip(path[:-1], path[1:]):
-                channel_id = self.G[node1][node2]['view'].channel_id
+                channel_id = self._channel_view(node1, node2).channel_id
                 visited[channel_id] = visited.get(channel_id, 0) + diversity_penalty
 
             paths.append(path)
-            if len(paths) >= max_paths:
-                break
-        result = []
-
-        for path in paths:
-            fee = 0
-            for node1, node2 in zip(path[:-1], path[1:]):
-                fee += self.G[node1][node2]['view'].fee(value)
-
-            result.append(dict(path=path, estimated_fee=fee))
-        return result
+        return paths
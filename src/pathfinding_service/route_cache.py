@@ -0,0 +1,80 @@
+""" Cache for the results of `TokenNetwork.get_paths` """
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+from raiden.utils.typing import ChannelID
+from raiden_libs.types import Address
+
+Path = List[Address]
+
+
+class RouteCache:
+    """ Bounded LRU cache of found paths
+
+    Each entry remembers the channels used by its paths. When one of those
+    channels changes, `invalidate` removes all entries using it.
+    """
+
+    def __init__(self, maxsize: int):
+        """ maxsize: Maximum number of cached requests, zero disables the cache """
+        self.maxsize = maxsize
+        self.entries: 'OrderedDict[Hashable, List[Path]]' = OrderedDict()
+        self.keys_by_channel: Dict[ChannelID, Set[Hashable]] = {}
+        self.channels_by_key: Dict[Hashable, Set[ChannelID]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f'<RouteCache size={len(self)}/{self.maxsize} hit_rate={self.hit_rate:.2f}>'
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return dict(
+            size=len(self), hits=self.hits, misses=self.misses, hit_rate=round(self.hit_rate, 4)
+        )
+
+    def get(self, key: Hashable) -> Optional[List[Path]]:
+        """ Return the cached paths for `key` """
+        if self.maxsize == 0:
+            return None
+        paths = self.entries.get(key)
+        if paths is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return paths
+
+    def put(self, key: Hashable, paths: List[Path], channel_ids: Iterable[ChannelID]) -> None:
+        """ Store `paths` for `key`, `channel_ids` are the channels used by the paths """
+        if self.maxsize == 0:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = paths
+        self.channels_by_key[key] = set(channel_ids)
+        for channel_id in self.channels_by_key[key]:
+            self.keys_by_channel.setdefault(channel_id, set()).add(key)
+        while len(self.entries) > self.maxsize:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, channel_id: ChannelID) -> None:
+        """ Remove all entries with paths through the given channel """
+        for key in self.keys_by_channel.pop(channel_id, ()):
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        del self.entries[key]
+        for channel_id in self.channels_by_key.pop(key):
+            keys = self.keys_by_channel.get(channel_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_channel[channel_id]
@@ -0,0 +1,233 @@
+""" Path search algorithms used by `TokenNetwork`
+
+The functions in this module work like their networkx counterparts, but take
+the edge weight as a callable instead of an edge attribute name. This allows
+computing weights per request without writing to the shared graph and only
+for the edges that are actually relaxed by the search. Edges for which the
+weight function returns `None` are hidden from the search.
+
+Besides a networkx `DiGraph`, any graph providing `succ`, `pred`, `__getitem__`
+and `__contains__` with the same semantics can be searched. The data passed to
+the weight function is whatever the graph stores for an edge.
+"""
+from enum import Enum
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Set, Tuple, cast
+
+import networkx as nx
+from networkx import DiGraph
+
+from raiden_libs.types import Address
+
+Path = List[Address]
+Edge = Tuple[Address, Address]
+WeightFunction = Callable[[Address, Address, Any], Optional[float]]
+CapacityFunction = Callable[[Address, Address, Any], Optional[int]]
+
+
+class RoutingEngine(Enum):
+    """ Strategies to find multiple diverse paths, see `TokenNetwork.get_paths` """
+
+    # Take the best new path from Yen's k shortest simple paths in every iteration
+    YEN = 'yen'
+    # Run a single Dijkstra search per path, penalizing previously used channels
+    PENALIZED_DIJKSTRA = 'penalized-dijkstra'
+
+
+def _check_nodes(G: DiGraph, source: Address, target: Address) -> None:
+    if source not in G:
+        raise nx.NodeNotFound(f'source node {source} not in graph')
+    if target not in G:
+        raise nx.NodeNotFound(f'target node {target} not in graph')
+
+
+def bidirectional_dijkstra(
+    G: DiGraph,
+    source: Address,
+    target: Address,
+    weight: WeightFunction,
+    ignore_nodes: Collection[Address] = None,
+    ignore_edges: Collection[Edge] = None,
+) -> Tuple[float, Path]:
+    """ Return the length and nodes of the shortest path from `source` to `target`
+
+    Nodes in `ignore_nodes` and edges in `ignore_edges` are treated as if they
+    were not part of the graph. Raises `NetworkXNoPath` if no path exists.
+    """
+    if ignore_nodes and (source in ignore_nodes or target in ignore_nodes):
+        raise nx.NetworkXNoPath(f'No path between {source} and {target}.')
+    if source == target:
+        return 0, [source]
+
+    def successors(v: Address) -> Iterator[Tuple[Address, Any]]:
+        for w, edge in G.succ[v].items():
+            if ignore_nodes and w in ignore_nodes:
+                continue
+            if ignore_edges and (v, w) in ignore_edges:
+                continue
+            yield w, edge
+
+    def predecessors(v: Address) -> Iterator[Tuple[Address, Any]]:
+        for w, edge in G.pred[v].items():
+            if ignore_nodes and w in ignore_nodes:
+                continue
+            if ignore_edges and (w, v) in ignore_edges:
+                continue
+            yield w, edge
+
+    # index 0 is the forward search from source, index 1 the backward one from target
+    dists: List[Dict[Address, float]] = [{}, {}]
+    paths: List[Dict[Address, Path]] = [{source: [source]}, {target: [target]}]
+    fringe: List[List[Tuple[float, int, Address]]] = [[], []]
+    seen: List[Dict[Address, float]] = [{source: 0}, {target: 0}]
+    neighbors = [successors, predecessors]
+    c = count()
+    heappush(fringe[0], (0, next(c), source))
+    heappush(fringe[1], (0, next(c), target))
+
+    final_dist: float = 0
+    final_path: Path = []
+    direction = 1
+    while fringe[0] and fringe[1]:
+        direction = 1 - direction
+        dist, _, v = heappop(fringe[direction])
+        if v in dists[direction]:
+            # Shortest path to v has already been found
+            continue
+        dists[direction][v] = dist
+        if v in dists[1 - direction]:
+            # v has been scanned in both directions, so the shortest path is known
+            return final_dist, final_path
+
+        for w, edge in neighbors[direction](v):
+            if direction == 0:
+                cost = weight(v, w, edge)
+            else:
+                cost = weight(w, v, edge)
+            if cost is None:
+                continue
+            vw_length = dist + cost
+
+            if w in dists[direction]:
+                if vw_length < dists[direction][w]:
+                    raise ValueError('Contradictory paths found: negative weights?')
+            elif w not in seen[direction] or vw_length < seen[direction][w]:
+                seen[direction][w] = vw_length
+                heappush(fringe[direction], (vw_length, next(c), w))
+                paths[direction][w] = paths[direction][v] + [w]
+                if w in seen[0] and w in seen[1]:
+                    total_dist = seen[0][w] + seen[1][w]
+                    if not final_path or final_dist > total_dist:
+                        final_dist = total_dist
+                        final_path = paths[0][w] + list(reversed(paths[1][w]))[1:]
+
+    raise nx.NetworkXNoPath(f'No path between {source} and {target}.')
+
+
+def shortest_path(G: DiGraph, source: Address, target: Address, weight: WeightFunction) -> Path:
+    """ Return the shortest path from `source` to `target` """
+    _check_nodes(G, source, target)
+    _, path = bidirectional_dijkstra(G, source, target, weight=weight)
+    return path
+
+
+class _PathBuffer:
+    """ Candidate paths ordered by cost, without duplicates """
+
+    def __init__(self) -> None:
+        self.paths: Set[Tuple[Address, ...]] = set()
+        self.sorted_paths: List[Tuple[float, int, Path]] = []
+        self.counter = count()
+
+    def __len__(self) -> int:
+        return len(self.sorted_paths)
+
+    def push(self, cost: float, path: Path) -> None:
+        hashable_path = tuple(path)
+        if hashable_path not in self.paths:
+            heappush(self.sorted_paths, (cost, next(self.counter), path))
+            self.paths.add(hashable_path)
+
+    def pop(self) -> Path:
+        _, _, path = heappop(self.sorted_paths)
+        self.paths.remove(tuple(path))
+        return path
+
+
+def shortest_simple_paths(
+    G: DiGraph, source: Address, target: Address, weight: WeightFunction
+) -> Iterator[Path]:
+    """ Generate simple paths from `source` to `target`, starting with the shortest
+
+    This is Yen's algorithm as implemented by `networkx.shortest_simple_paths`.
+    `weight` is called for every relaxed edge with `(node1, node2, edge_attributes)`
+    and has to return a non-negative number, or `None` to hide the edge.
+    """
+    _check_nodes(G, source, target)
+
+    def length_func(path: Path) -> float:
+        # Only used on prefixes of found paths, so none of the edges are hidden
+        return sum(cast(float, weight(u, v, G[u][v])) for u, v in zip(path, path[1:]))
+
+    list_a: List[Path] = []
+    list_b = _PathBuffer()
+    prev_path: Optional[Path] = None
+    while True:
+        if not prev_path:
+            length, path = bidirectional_dijkstra(G, source, target, weight=weight)
+            list_b.push(length, path)
+        else:
+            ignore_nodes: Set[Address] = set()
+            ignore_edges: Set[Edge] = set()
+            for i in range(1, len(prev_path)):
+                root = prev_path[:i]
+                root_length = length_func(root)
+                for path in list_a:
+                    if path[:i] == root:
+                        ignore_edges.add((path[i - 1], path[i]))
+                try:
+                    length, spur = bidirectional_dijkstra(
+                        G,
+                        root[-1],
+                        target,
+                        weight=weight,
+                        ignore_nodes=ignore_nodes,
+                        ignore_edges=ignore_edges,
+                    )
+                    list_b.push(root_length + length, root[:-1] + spur)
+                except nx.NetworkXNoPath:
+                    pass
+                ignore_nodes.add(root[-1])
+
+        if not list_b:
+            break
+        path = list_b.pop()
+        yield path
+        list_a.append(path)
+        prev_path = path
+
+
+def widest_paths(G: DiGraph, source: Address, capacity: CapacityFunction) -> Dict[Address, float]:
+    """ Return the largest bottleneck capacity of any path from `source` to each node
+
+    `capacity` is called like the weight functions and can hide edges by
+    returning `None`. Nodes which can't be reached are not included.
+    """
+    _check_nodes(G, source, source)
+    widest: Dict[Address, float] = {}
+    c = count()
+    fringe: List[Tuple[float, int, Address]] = [(-float('inf'), next(c), source)]
+    while fringe:
+        negative_width, _, v = heappop(fringe)
+        if v in widest:
+            continue
+        widest[v] = -negative_width
+        for w, edge in G.succ[v].items():
+            if w in widest:
+                continue
+            edge_capacity = capacity(v, w, edge)
+            if edge_capacity is None:
+                continue
+            heappush(fringe, (-min(widest[v], edge_capacity), next(c), w))
+    return widest
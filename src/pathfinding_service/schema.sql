@@ -1,4 +1,4 @@
-CREATE TABLE iou (
+CREATE TABLE IF NOT EXISTS iou (
     sender TEXT NOT NULL,
     amount HEX_INT NOT NULL,
     expiration_block HEX_INT NOT NULL,
@@ -6,5 +6,48 @@ CREATE TABLE iou (
     claimed BOOL NOT NULL,
     PRIMARY KEY (sender, expiration_block)
 );
-CREATE UNIQUE INDEX one_active_session_per_sender
+CREATE UNIQUE INDEX IF NOT EXISTS one_active_session_per_sender
     ON iou(sender) WHERE NOT claimed;
+
+-- NULL until the first block range has been processed
+CREATE TABLE blockchain (
+    chain_id INT,
+    token_network_registry_address CHAR(42),
+    latest_known_block INT
+);
+INSERT INTO blockchain DEFAULT VALUES;
+
+CREATE TABLE token_network (
+    address CHAR(42) PRIMARY KEY
+);
+
+-- Two rows per open channel, one for each direction
+CREATE TABLE channel_view (
+    token_network_address CHAR(42) NOT NULL,
+    channel_id HEX_INT NOT NULL,
+    participant1 CHAR(42) NOT NULL,
+    participant2 CHAR(42) NOT NULL,
+    settle_timeout HEX_INT NOT NULL,
+    capacity HEX_INT NOT NULL,
+    deposit HEX_INT NOT NULL,
+    reveal_timeout HEX_INT NOT NULL,
+    update_nonce HEX_INT NOT NULL,
+    absolute_fee HEX_INT NOT NULL,
+    relative_fee FLOAT NOT NULL,
+    PRIMARY KEY (token_network_address, channel_id, participant1)
+);
+
+-- Journal of accepted capacity updates, in the order of acceptance. It is
+-- applied to `channel_view` and emptied at each checkpoint.
+CREATE TABLE capacity_update (
+    token_network_address CHAR(42) NOT NULL,
+    channel_identifier HEX_INT NOT NULL,
+    updating_participant CHAR(42) NOT NULL,
+    other_participant CHAR(42) NOT NULL,
+    updating_nonce HEX_INT NOT NULL,
+    other_nonce HEX_INT NOT NULL,
+    updating_capacity HEX_INT NOT NULL,
+    other_capacity HEX_INT NOT NULL,
+    reveal_timeout HEX_INT NOT NULL,
+    mediation_fee HEX_INT NOT NULL
+);
@@ -1,7 +1,8 @@
 import sys
 import traceback
-from dataclasses import asdict
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
 
 import gevent
 import structlog
@@ -10,17 +11,22 @@ from eth_utils import to_checksum_address
 from web3 import Web3
 from web3.contract import Contract
 
-from monitoring_service.constants import MAX_FILTER_INTERVAL
+from pathfinding_service.config import DEFAULT_PATH_WORKERS, DEFAULT_ROUTE_CACHE_SIZE
 from pathfinding_service.database import PFSDatabase
 from pathfinding_service.exceptions import InvalidCapacityUpdate
-from pathfinding_service.model import TokenNetwork
+from pathfinding_service.journal import CapacityUpdateJournal
+from pathfinding_service.model import ChannelView, TokenNetwork
+from pathfinding_service.routing import RoutingEngine
+from pathfinding_service.snapshot import import_snapshot, restore_channel_views
+from pathfinding_service.workers import PathWorkerPool
 from raiden.constants import PATH_FINDING_BROADCASTING_ROOM, UINT256_MAX
 from raiden.messages import SignedMessage, UpdatePFS
 from raiden.utils.signer import recover
-from raiden.utils.typing import BlockNumber, ChainID
+from raiden.utils.typing import BlockNumber, ChainID, ChannelID
 from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, CONTRACT_USER_DEPOSIT
-from raiden_libs.blockchain import get_blockchain_events
+from raiden_libs.blockchain import get_unconfirmed_token_network_events, stream_blockchain_events
 from raiden_libs.contract_info import CONTRACT_MANAGER
+from raiden_libs.event_store import EventStore
 from raiden_libs.events import (
     Event,
     ReceiveChannelClosedEvent,
@@ -30,12 +36,53 @@ from raiden_libs.events import (
 )
 from raiden_libs.gevent_error_handler import register_error_handler
 from raiden_libs.matrix import MatrixListener
+from raiden_libs.new_heads import NewHeadsSubscription, get_head_block_number
 from raiden_libs.states import BlockchainState
+from raiden_libs.sync import SyncPipeline, read_block_range
 from raiden_libs.types import Address, TokenNetworkAddress
 from raiden_libs.utils import private_key_to_address
 
 log = structlog.get_logger(__name__)
 
+# The contract events used by `handle_channel_event`, no other events are requested
+HANDLED_EVENT_TYPES = (
+    ReceiveChannelOpenedEvent,
+    ReceiveChannelNewDepositEvent,
+    ReceiveChannelClosedEvent,
+)
+# The events which are applied before they are confirmed, if enabled
+OPTIMISTIC_EVENT_TYPES = (ReceiveChannelOpenedEvent, ReceiveChannelNewDepositEvent)
+
+
+@dataclass
+class OptimisticEvent:
+    """ An event of an unconfirmed block which has been applied to a token network """
+
+    block_hash: bytes
+    event: Event
+    # The arguments of `TokenNetwork.restore_channel_view` to revert a
+    # `ReceiveChannelNewDepositEvent`
+    previous_view: Dict[str, Any] = field(default_factory=dict)
+
+
+def event_channel(event: Event) -> Optional[Tuple[TokenNetworkAddress, ChannelID]]:
+    """ Return the token network and id of the channel `event` belongs to, if any """
+    if not hasattr(event, 'channel_identifier'):
+        return None
+    return event.token_network_address, event.channel_identifier  # type: ignore
+
+
+def view_state(view: ChannelView) -> Dict[str, Any]:
+    """ Return the state of `view` as arguments for `ChannelView.restore` """
+    return dict(
+        capacity=view.capacity,
+        deposit=view.deposit,
+        reveal_timeout=view.reveal_timeout,
+        update_nonce=view.update_nonce,
+        absolute_fee=view.absolute_fee,
+        relative_fee=view.relative_fee,
+    )
+
 
 def error_handler(context: Any, exc_info: tuple) -> None:
     log.critical(
@@ -65,6 +112,15 @@ class PathfindingService(gevent.Greenlet):
         required_confirmations: int = 8,
         poll_interval: float = 10,
         service_fee: int = 0,
+        routing_engine: RoutingEngine = RoutingEngine.YEN,
+        token_network_class: Type[TokenNetwork] = TokenNetwork,
+        route_cache_size: int = DEFAULT_ROUTE_CACHE_SIZE,
+        num_path_workers: int = DEFAULT_PATH_WORKERS,
+        bootstrap_snapshot: Optional[str] = None,
+        sync_prefetch_size: int = 0,
+        event_store_filename: Optional[str] = None,
+        eth_ws_uri: Optional[str] = None,
+        optimistic_channels: bool = False,
     ):
         super().__init__()
 
@@ -73,28 +129,73 @@ class PathfindingService(gevent.Greenlet):
         self.sync_start_block = sync_start_block
         self.required_confirmations = required_confirmations
         self.poll_interval = poll_interval
+        self.sync_prefetch_size = sync_prefetch_size
+        self.event_store: Optional[EventStore] = None
+        if event_store_filename is not None:
+            self.event_store = EventStore(event_store_filename)
+            self.event_store.check_required_confirmations(required_confirmations)
+        # The confirmed blocks of the event store are not announced by the node
+        self.new_heads: Optional[NewHeadsSubscription] = None
+        if eth_ws_uri is not None and self.event_store is None:
+            self.new_heads = NewHeadsSubscription(eth_ws_uri)
+        self.sync_pipeline: Optional[SyncPipeline] = None
+        # New channels and deposits of unconfirmed blocks, see `_apply_optimistic_events`
+        self.optimistic_channels = optimistic_channels
+        self.optimistic_events: List[OptimisticEvent] = []
+        # All processed `(block_hash, event)` pairs, including the skipped events
+        self.unconfirmed_events: List[Tuple[bytes, Event]] = []
         self.chain_id = ChainID(int(web3.net.version))
         self.private_key = private_key
         self.address = private_key_to_address(private_key)
         self.service_fee = service_fee
+        self.routing_engine = routing_engine
+        self.token_network_class = token_network_class
+        self.route_cache_size = route_cache_size
 
         self.is_running = gevent.event.Event()
         self.token_networks: Dict[TokenNetworkAddress, TokenNetwork] = {}
         self.database = PFSDatabase(filename=db_filename, pfs_address=self.address)
+        self.database.update_chain(self.chain_id, self.registry_address)
         self.user_deposit_contract = contracts[CONTRACT_USER_DEPOSIT]
 
+        # Resume from the state stored in the database, if there is one
+        latest_known_block = self.database.get_latest_known_block()
+        if bootstrap_snapshot is not None:
+            if latest_known_block is None:
+                latest_known_block = import_snapshot(
+                    self.database, bootstrap_snapshot, self.chain_id, self.registry_address
+                )
+            else:
+                log.warning(
+                    'Ignoring bootstrap snapshot, the database already contains a synced state',
+                    snapshot=bootstrap_snapshot,
+                    latest_known_block=latest_known_block,
+                )
+        if latest_known_block is None:
+            latest_known_block = self.sync_start_block
+        self.journal = CapacityUpdateJournal(self.database)
+        self._load_token_networks()
+        if self.journal.replay(self.token_networks) > 0:
+            self.journal.checkpoint(self.token_networks)
+
+        self.worker_pool: Optional[PathWorkerPool] = None
+        if num_path_workers > 0:
+            self.worker_pool = PathWorkerPool(num_path_workers)
+            self.worker_pool.start(self.token_networks)
+        self._publish_changes()
+
         self.last_known_block = 0
         self.blockchain_state = BlockchainState(
             chain_id=self.chain_id,
             token_network_registry_address=self.registry_address,
             monitor_contract_address=Address(''),  # FIXME
-            latest_known_block=self.sync_start_block,
-            token_network_addresses=[],
+            latest_known_block=latest_known_block,
+            token_network_addresses=list(self.token_networks),
         )
         log.info(
             'Listening to token network registry',
             registry_address=self.registry_address,
-            start_block=sync_start_block,
+            start_block=latest_known_block,
         )
 
         try:
@@ -111,57 +212,336 @@ class PathfindingService(gevent.Greenlet):
     def _run(self) -> None:  # pylint: disable=method-hidden
         register_error_handler(error_handler)
         self.matrix_listener.start()
+        if self.new_heads is not None:
+            self.new_heads.start()
+        # Reading the events from the event store doesn't need prefetching
+        if self.sync_prefetch_size > 0 and self.event_store is None:
+            self.sync_pipeline = SyncPipeline(
+                web3=self.web3,
+                contract_manager=CONTRACT_MANAGER,
+                chain_state=self.blockchain_state,
+                required_confirmations=self.required_confirmations,
+                poll_interval=self.poll_interval,
+                prefetch_size=self.sync_prefetch_size,
+                query_ms=False,
+                event_types=HANDLED_EVENT_TYPES,
+                new_heads=self.new_heads,
+            )
+            self.sync_pipeline.start()
+
         while not self.is_running.is_set():
-            last_confirmed_block = self.web3.eth.blockNumber - self.required_confirmations
+            if self.sync_pipeline is not None:
+                self._handle_next_block_range(self.sync_pipeline)
+                continue
+
+            last_confirmed_block = self._get_last_confirmed_block()
 
             max_query_interval_end_block = (
-                self.blockchain_state.latest_known_block + MAX_FILTER_INTERVAL
+                self.blockchain_state.latest_known_block + self.blockchain_state.filter_interval
             )
             # Limit the max number of blocks that is processed per iteration
-            last_block = min(last_confirmed_block, max_query_interval_end_block)
+            last_block = BlockNumber(min(last_confirmed_block, max_query_interval_end_block))
 
             self._process_new_blocks(last_block)
+            self._after_new_blocks()
 
             try:
-                gevent.sleep(self.poll_interval)
+                self._wait_for_new_blocks()
             except KeyboardInterrupt:
                 log.info('Shutting down')
                 sys.exit(0)
 
+    def _handle_next_block_range(self, sync_pipeline: SyncPipeline) -> None:
+        try:
+            # The next range is fetched while the current one is handled
+            block_range = sync_pipeline.get(timeout=self.poll_interval)
+        except KeyboardInterrupt:
+            log.info('Shutting down')
+            sys.exit(0)
+
+        if block_range is not None:
+            self._handle_new_blocks(
+                block_range.last_block, block_range.chain_state, block_range.events
+            )
+        self._after_new_blocks()
+
+    def _after_new_blocks(self) -> None:
+        self.journal.flush()
+        if self.journal.is_checkpoint_needed():
+            with self.confirmed_token_networks() as token_networks:
+                self.journal.checkpoint(token_networks)
+        if self.optimistic_channels:
+            self._apply_optimistic_events()
+        self._publish_changes()
+        self._log_route_cache_stats()
+
+    def _wait_for_new_blocks(self) -> None:
+        """ Wake up when the next block is confirmed, poll while there is no subscription """
+        next_block = BlockNumber(
+            self.blockchain_state.latest_known_block + self.required_confirmations + 1
+        )
+        if self.new_heads is None or not self.new_heads.wait_for_block(
+            next_block, timeout=self.poll_interval
+        ):
+            gevent.sleep(self.poll_interval)
+
+    def _get_last_confirmed_block(self) -> BlockNumber:
+        last_confirmed_block = BlockNumber(
+            get_head_block_number(self.web3, self.new_heads) - self.required_confirmations
+        )
+        if self.event_store is not None:
+            # The indexer may wait for fewer confirmations than this service
+            return min(last_confirmed_block, self.event_store.get_confirmed_block())
+        return last_confirmed_block
+
     def _process_new_blocks(self, last_block: BlockNumber) -> None:
+        # BCL return a new state and events related to channel lifecycle
+        if self.event_store is None:
+            new_chain_state, events = stream_blockchain_events(
+                web3=self.web3,
+                contract_manager=CONTRACT_MANAGER,
+                chain_state=self.blockchain_state,
+                to_block=last_block,
+                query_ms=False,
+                event_types=HANDLED_EVENT_TYPES,
+            )
+        else:
+            new_chain_state, events = self.event_store.stream_blockchain_events(
+                chain_state=self.blockchain_state,
+                to_block=last_block,
+                query_ms=False,
+                event_types=HANDLED_EVENT_TYPES,
+            )
+        # Fetch the range before the transaction starts, so the database isn't
+        # locked during the RPC calls and a failing call doesn't leave a
+        # partially applied range behind. Large ranges are ended early.
+        block_range = read_block_range(
+            chain_state=self.blockchain_state,
+            new_chain_state=new_chain_state,
+            last_block=last_block,
+            events=events,
+        )
+        self._handle_new_blocks(
+            block_range.last_block, block_range.chain_state, block_range.events
+        )
+
+    def _handle_new_blocks(
+        self, last_block: BlockNumber, new_chain_state: BlockchainState, events: List[Event]
+    ) -> None:
+        if last_block > self.blockchain_state.latest_known_block:
+            self._revert_confirmed_optimistic_events(last_block, events)
         self.last_known_block = last_block
 
-        # BCL return a new state and events related to channel lifecycle
-        new_chain_state, events = get_blockchain_events(
+        # Store the changes and the new sync position at once, so that the
+        # service can resume from a consistent state after a restart
+        with self.database.transaction():
+            for event in events:
+                self.handle_channel_event(event)
+            self.database.update_latest_known_block(last_block)
+
+        # Only set the updated chain state, including new token networks, after
+        # the changes are stored
+        self.blockchain_state = new_chain_state
+        self.blockchain_state.latest_known_block = last_block
+        self._publish_changes()
+
+    def _apply_optimistic_events(self) -> None:
+        """ Apply the new channels and deposits of unconfirmed blocks
+
+        The changes are only made in memory and tagged with the hash of their
+        block. They are reverted before their blocks are confirmed, or when
+        the block is no longer part of the chain after a reorg.
+        """
+        head_block_number = get_head_block_number(self.web3, self.new_heads)
+        last_confirmed_block = head_block_number - self.required_confirmations
+        # Don't query all blocks which are not synced yet
+        if self.blockchain_state.latest_known_block < last_confirmed_block:
+            return
+
+        unconfirmed_events = get_unconfirmed_token_network_events(
             web3=self.web3,
             contract_manager=CONTRACT_MANAGER,
-            chain_state=self.blockchain_state,
-            to_block=last_block,
-            query_ms=False,
+            token_network_addresses=list(self.token_networks),
+            from_block=BlockNumber(self.blockchain_state.latest_known_block + 1),
+            to_block=head_block_number,
+            event_types=OPTIMISTIC_EVENT_TYPES,
         )
+        # Compare with all processed events, not only the applied ones, since
+        # events of unknown channels are skipped
+        num_unchanged = 0
+        for known_event, unconfirmed_event in zip(self.unconfirmed_events, unconfirmed_events):
+            if known_event != unconfirmed_event:
+                break
+            num_unchanged += 1
+        if num_unchanged < len(self.unconfirmed_events):
+            log.warning(
+                'Chain reorg detected, reverting unconfirmed events',
+                num_events=len(self.unconfirmed_events) - num_unchanged,
+                head_block_number=head_block_number,
+            )
+            self._revert_optimistic_events(num_kept=num_unchanged)
 
-        # If a new token network was found we need to write it to the DB, otherwise
-        # the constraints for new channels will not be constrained. But only update
-        # the network addresses here, all else is done later.
-        token_networks_changed = (
-            self.blockchain_state.token_network_addresses
-            != new_chain_state.token_network_addresses
-        )
-        if token_networks_changed:
-            self.blockchain_state.token_network_addresses = new_chain_state.token_network_addresses
-        #     self.context.db.update_state(self.context.ms_state)
+        self._apply_unconfirmed_events(unconfirmed_events[len(self.unconfirmed_events) :])
 
-        # Now set the updated chain state to the context, will be stored later
-        self.blockchain_state = new_chain_state
-        for event in events:
-            self.handle_channel_event(event)
+    def _apply_unconfirmed_events(self, unconfirmed_events: List[Tuple[bytes, Event]]) -> None:
+        for block_hash, event in unconfirmed_events:
+            self.unconfirmed_events.append((block_hash, event))
+            optimistic_event = self._apply_optimistic_event(block_hash, event)
+            if optimistic_event is not None:
+                self.optimistic_events.append(optimistic_event)
 
-        self.blockchain_state.latest_known_block = last_block
+    def _apply_optimistic_event(
+        self, block_hash: bytes, event: Event
+    ) -> Optional[OptimisticEvent]:
+        token_network = self.get_token_network(event.token_network_address)  # type: ignore
+        if token_network is None:
+            return None
+
+        log.info('Applying unconfirmed event', block_hash=block_hash.hex(), **asdict(event))
+        if isinstance(event, ReceiveChannelOpenedEvent):
+            self._update_token_network(
+                token_network,
+                'handle_channel_opened_event',
+                persist=False,
+                channel_identifier=event.channel_identifier,
+                participant1=event.participant1,
+                participant2=event.participant2,
+                settle_timeout=event.settle_timeout,
+            )
+            return OptimisticEvent(block_hash=block_hash, event=event)
+
+        assert isinstance(event, ReceiveChannelNewDepositEvent)
+        participants = token_network.channel_id_to_addresses.get(event.channel_identifier)
+        if participants is None or event.participant_address not in participants:
+            return None
+        partner = (
+            participants[1] if participants[0] == event.participant_address else participants[0]
+        )
+        view, _ = token_network.get_channel_views_for_partner(
+            event.channel_identifier, event.participant_address, partner
+        )
+        # The deposit handler resets the capacity update, keep the whole view
+        previous_view = dict(
+            channel_identifier=event.channel_identifier,
+            participant=event.participant_address,
+            partner=partner,
+            **view_state(view),
+        )
+        self._update_token_network(
+            token_network,
+            'handle_channel_new_deposit_event',
+            persist=False,
+            channel_identifier=event.channel_identifier,
+            receiver=event.participant_address,
+            total_deposit=event.total_deposit,
+        )
+        return OptimisticEvent(block_hash=block_hash, event=event, previous_view=previous_view)
+
+    def _revert_confirmed_optimistic_events(
+        self, last_block: BlockNumber, events: List[Event]
+    ) -> None:
+        """ Revert the unconfirmed events before the blocks up to `last_block` are handled
+
+        The confirmed events are handled like all others. If one of the
+        unconfirmed events is confirmed, all of them are reverted, since the
+        changes can only be undone from the latest event backwards. Otherwise
+        they stay applied, unless a confirmed event concerns one of their
+        channels, which is only possible after a reorg.
+        """
+        optimistic_channels = {
+            event_channel(optimistic_event.event) for optimistic_event in self.optimistic_events
+        }
+        confirmed = any(
+            event.block_number <= last_block  # type: ignore
+            for _, event in self.unconfirmed_events
+        )
+        if confirmed or any(event_channel(event) in optimistic_channels for event in events):
+            self._revert_optimistic_events()
+
+    def _revert_optimistic_events(self, num_kept: int = 0) -> None:
+        """ Undo the changes of the unconfirmed events, the latest first
+
+        The first `num_kept` of the processed unconfirmed events stay applied.
+        """
+        kept_events = self.unconfirmed_events[:num_kept]
+        while self.optimistic_events:
+            optimistic_event = self.optimistic_events[-1]
+            if (optimistic_event.block_hash, optimistic_event.event) in kept_events:
+                break
+            self.optimistic_events.pop()
+            event = optimistic_event.event
+            token_network = self.token_networks[event.token_network_address]  # type: ignore
+            if isinstance(event, ReceiveChannelOpenedEvent):
+                self._update_token_network(
+                    token_network,
+                    'handle_channel_closed_event',
+                    persist=False,
+                    channel_identifier=event.channel_identifier,
+                )
+            elif isinstance(event, ReceiveChannelNewDepositEvent):
+                previous_view = optimistic_event.previous_view
+                view, _ = token_network.get_channel_views_for_partner(
+                    previous_view['channel_identifier'],
+                    previous_view['participant'],
+                    previous_view['partner'],
+                )
+                # Keep the capacity updates accepted after the deposit was applied
+                if view.update_nonce > previous_view['update_nonce']:
+                    state = dict(view_state(view), deposit=previous_view['deposit'])
+                    previous_view = dict(previous_view, **state)
+                self._update_token_network(
+                    token_network, 'restore_channel_view', persist=False, **previous_view
+                )
+        # A new list, `confirmed_token_networks` applies the previous one again
+        self.unconfirmed_events = kept_events
+
+    @contextmanager
+    def confirmed_token_networks(self) -> Iterator[Dict[TokenNetworkAddress, TokenNetwork]]:
+        """ Revert the unconfirmed events while the token networks are used
+
+        Must be used when the token networks are stored or exported, so that
+        unconfirmed state is never loaded as confirmed state.
+        """
+        unconfirmed_events = self.unconfirmed_events
+        self._revert_optimistic_events()
+        try:
+            yield self.token_networks
+        finally:
+            self._apply_unconfirmed_events(unconfirmed_events)
+
+    def is_unconfirmed_channel(
+        self, token_network_address: TokenNetworkAddress, channel_identifier: ChannelID
+    ) -> bool:
+        """ Checks if the channel has only been opened in an unconfirmed block """
+        return any(
+            isinstance(optimistic_event.event, ReceiveChannelOpenedEvent)
+            and optimistic_event.event.token_network_address == token_network_address
+            and optimistic_event.event.channel_identifier == channel_identifier
+            for optimistic_event in self.optimistic_events
+        )
+
+    def _log_route_cache_stats(self) -> None:
+        for token_network in self.token_networks.values():
+            route_cache = token_network.route_cache
+            if route_cache.hits + route_cache.misses > 0:
+                log.debug(
+                    'Route cache statistics',
+                    token_network=token_network.address,
+                    **route_cache.stats(),
+                )
 
     def stop(self) -> None:
         self.matrix_listener.stop()
         self.is_running.set()
         self.matrix_listener.join()
+        if self.sync_pipeline is not None:
+            self.sync_pipeline.stop()
+        if self.new_heads is not None:
+            self.new_heads.stop()
+        with self.confirmed_token_networks() as token_networks:
+            self.journal.checkpoint(token_networks)
+        if self.worker_pool is not None:
+            self.worker_pool.stop()
 
     def follows_token_network(self, token_network_address: TokenNetworkAddress) -> bool:
         """ Checks if a token network is followed by the pathfinding service. """
@@ -190,7 +570,73 @@ class PathfindingService(gevent.Greenlet):
         if not self.follows_token_network(network_address):
             log.info('Found new token network', **asdict(event))
 
-            self.token_networks[network_address] = TokenNetwork(network_address)
+            token_network = self._create_token_network(network_address)
+            self.database.upsert_token_network(network_address)
+            if self.worker_pool is not None:
+                self.worker_pool.add_token_network(token_network)
+
+    def _create_token_network(self, network_address: TokenNetworkAddress) -> TokenNetwork:
+        token_network = self.token_network_class(
+            network_address,
+            routing_engine=self.routing_engine,
+            route_cache_size=self.route_cache_size,
+        )
+        self.token_networks[network_address] = token_network
+        return token_network
+
+    def _load_token_networks(self) -> None:
+        """ Restore the token networks stored in the database """
+        for network_address in self.database.get_token_network_addresses():
+            token_network = self._create_token_network(network_address)
+            restore_channel_views(token_network, self.database.get_channel_views(network_address))
+            log.info(
+                'Loaded token network',
+                token_network_address=network_address,
+                num_channels=len(token_network.channel_id_to_addresses),
+            )
+
+    def _publish_changes(self) -> None:
+        """ Make the changes since the last call visible to path searches
+
+        Starts new versions of the changed token networks and sends the
+        changes to the path workers. Must only be called at the end of a
+        complete set of changes, so searches never run on half of a block range.
+        """
+        for token_network in self.token_networks.values():
+            token_network.publish_version()
+        if self.worker_pool is not None:
+            self.worker_pool.publish()
+
+    def _update_token_network(
+        self, token_network: TokenNetwork, method_name: str, persist: bool = True, **kwargs: Any
+    ) -> None:
+        """ Call the event handler `method_name` of `token_network`
+
+        The change is also recorded for the copies of the token network in the
+        path workers and, if `persist` is set, stored in the database. See
+        `_publish_changes`.
+        """
+        getattr(token_network, method_name)(**kwargs)
+        if self.worker_pool is not None:
+            self.worker_pool.record_update(token_network.address, method_name, kwargs)
+        if not persist:
+            return
+
+        # Capacity updates are frequent, they are stored in the journal
+        if method_name == 'handle_channel_balance_update_message':
+            self.journal.append(token_network.address, kwargs)
+            return
+
+        channel_identifier = kwargs['channel_identifier']
+        participants = token_network.channel_id_to_addresses.get(channel_identifier)
+        if participants is None:
+            self.database.delete_channel(token_network.address, channel_identifier)
+        else:
+            self.database.upsert_channel(
+                token_network.address,
+                participants,
+                token_network.get_channel_views_for_partner(channel_identifier, *participants),
+            )
 
     def handle_channel_opened(self, event: ReceiveChannelOpenedEvent) -> None:
         token_network = self.get_token_network(event.token_network_address)
@@ -199,7 +645,9 @@ class PathfindingService(gevent.Greenlet):
 
         log.info('Received ChannelOpened event', **asdict(event))
 
-        token_network.handle_channel_opened_event(
+        self._update_token_network(
+            token_network,
+            'handle_channel_opened_event',
             channel_identifier=event.channel_identifier,
             participant1=event.participant1,
             participant2=event.participant2,
@@ -213,7 +661,9 @@ class PathfindingService(gevent.Greenlet):
 
         log.info('Received ChannelNewDeposit event', **asdict(event))
 
-        token_network.handle_channel_new_deposit_event(
+        self._update_token_network(
+            token_network,
+            'handle_channel_new_deposit_event',
             channel_identifier=event.channel_identifier,
             receiver=event.participant_address,
             total_deposit=event.total_deposit,
@@ -226,7 +676,11 @@ class PathfindingService(gevent.Greenlet):
 
         log.info('Received ChannelClosed event', **asdict(event))
 
-        token_network.handle_channel_closed_event(channel_identifier=event.channel_identifier)
+        self._update_token_network(
+            token_network,
+            'handle_channel_closed_event',
+            channel_identifier=event.channel_identifier,
+        )
 
     def handle_message(self, message: SignedMessage) -> None:
         if isinstance(message, UpdatePFS):
@@ -260,6 +714,9 @@ class PathfindingService(gevent.Greenlet):
             raise InvalidCapacityUpdate(
                 'Received Capacity Update with unknown channel identifier in token network'
             )
+        # The update would be stored, but the channel can still be removed by a reorg
+        if self.is_unconfirmed_channel(token_network_address, channel_identifier):
+            raise InvalidCapacityUpdate('Received Capacity Update for an unconfirmed channel')
 
         # check values < max int 256
         if message.updating_capacity > UINT256_MAX:
@@ -301,7 +758,9 @@ class PathfindingService(gevent.Greenlet):
 
         log.info('Received Capacity Update', **message.to_dict())
 
-        token_network.handle_channel_balance_update_message(
+        self._update_token_network(
+            token_network,
+            'handle_channel_balance_update_message',
             channel_identifier=message.canonical_identifier.channel_identifier,
             updating_participant=updating_participant,
             other_participant=other_participant,
@@ -312,3 +771,4 @@ class PathfindingService(gevent.Greenlet):
             reveal_timeout=message.reveal_timeout,
             mediation_fee=message.mediation_fee,
         )
+        self._publish_changes()
@@ -0,0 +1,209 @@
+""" Snapshots of the token networks for bootstrapping new PFS instances
+
+A snapshot contains the channel views of all token networks together with
+the chain, the token network registry and the block up to which the chain
+has been synced. It is a gzip compressed JSON document, so it doesn't depend
+on the graph backend or the Python version of the exporting service. The
+channel views are stored in the same rows as in the `channel_view` table of
+the database.
+
+A new instance started with `--bootstrap-snapshot` writes the snapshot to
+its empty database and continues syncing from the snapshot's block. Snapshots
+of other chains or registries are rejected.
+"""
+import gzip
+import json
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Tuple, Union
+
+import click
+import structlog
+
+from pathfinding_service.database import PFSDatabase, channel_view_rows
+from pathfinding_service.exceptions import InvalidSnapshot
+from pathfinding_service.journal import CapacityUpdateJournal
+from pathfinding_service.model import TokenNetwork
+from raiden.utils.typing import BlockNumber, ChainID
+from raiden_libs.cli import common_options
+from raiden_libs.types import Address, TokenNetworkAddress
+from raiden_libs.utils import private_key_to_address
+
+log = structlog.get_logger(__name__)
+
+SNAPSHOT_VERSION = 1
+CHANNEL_VIEW_FIELDS = [
+    'channel_id',
+    'participant1',
+    'participant2',
+    'settle_timeout',
+    'capacity',
+    'deposit',
+    'reveal_timeout',
+    'update_nonce',
+    'absolute_fee',
+    'relative_fee',
+]
+
+
+def token_network_rows(token_network: TokenNetwork) -> List[Dict[str, Any]]:
+    """ Return the channel view rows of all channels, ordered by channel id """
+    rows = []
+    for channel_id in sorted(token_network.channel_id_to_addresses):
+        participants = token_network.channel_id_to_addresses[channel_id]
+        views = token_network.get_channel_views_for_partner(channel_id, *participants)
+        rows.extend(channel_view_rows(participants, views))
+    return rows
+
+
+def restore_channel_views(
+    token_network: TokenNetwork, rows: Iterable[Union[Mapping[str, Any], sqlite3.Row]]
+) -> None:
+    """ Open the channels of `rows` and set the state of their views
+
+    The rows of a channel must be in the order returned by `token_network_rows`.
+    """
+    for row in rows:
+        if row['channel_id'] not in token_network.channel_id_to_addresses:
+            token_network.handle_channel_opened_event(
+                channel_identifier=row['channel_id'],
+                participant1=row['participant1'],
+                participant2=row['participant2'],
+                settle_timeout=row['settle_timeout'],
+            )
+        view, _ = token_network.get_channel_views_for_partner(
+            channel_identifier=row['channel_id'],
+            updating_participant=row['participant1'],
+            other_participant=row['participant2'],
+        )
+        view.restore(
+            capacity=row['capacity'],
+            deposit=row['deposit'],
+            reveal_timeout=row['reveal_timeout'],
+            update_nonce=row['update_nonce'],
+            absolute_fee=row['absolute_fee'],
+            relative_fee=row['relative_fee'],
+        )
+
+
+def encode_snapshot(
+    token_networks: Mapping[TokenNetworkAddress, TokenNetwork],
+    chain_id: ChainID,
+    registry_address: Address,
+    block: BlockNumber,
+) -> bytes:
+    snapshot = dict(
+        version=SNAPSHOT_VERSION,
+        chain_id=chain_id,
+        token_network_registry_address=registry_address,
+        block=block,
+        fields=CHANNEL_VIEW_FIELDS,
+        token_networks={
+            address: [
+                [row[field] for field in CHANNEL_VIEW_FIELDS]
+                for row in token_network_rows(token_network)
+            ]
+            for address, token_network in token_networks.items()
+        },
+    )
+    return gzip.compress(json.dumps(snapshot, separators=(',', ':')).encode())
+
+
+def decode_snapshot(
+    data: bytes, chain_id: ChainID, registry_address: Address
+) -> Tuple[BlockNumber, Dict[TokenNetworkAddress, List[Dict[str, Any]]]]:
+    """ Return the block and the channel view rows per token network of a snapshot
+
+    Raises `InvalidSnapshot` if the snapshot doesn't belong to the given chain
+    and token network registry.
+    """
+    try:
+        snapshot = json.loads(gzip.decompress(data))
+    except (OSError, ValueError) as exc:
+        raise InvalidSnapshot(f'Snapshot is not a compressed JSON document: {exc}')
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise InvalidSnapshot(f'Unsupported snapshot version: {snapshot.get("version")}')
+    if snapshot['chain_id'] != chain_id:
+        raise InvalidSnapshot(
+            f'The snapshot contains the token networks of chain {snapshot["chain_id"]}'
+        )
+    if snapshot['token_network_registry_address'] != registry_address:
+        raise InvalidSnapshot(
+            'The snapshot contains the token networks of the token network registry '
+            f'{snapshot["token_network_registry_address"]}'
+        )
+
+    fields = snapshot['fields']
+    token_networks = {
+        TokenNetworkAddress(address): [dict(zip(fields, values)) for values in rows]
+        for address, rows in snapshot['token_networks'].items()
+    }
+    return BlockNumber(snapshot['block']), token_networks
+
+
+def write_snapshot(
+    filename: str,
+    token_networks: Mapping[TokenNetworkAddress, TokenNetwork],
+    chain_id: ChainID,
+    registry_address: Address,
+    block: BlockNumber,
+) -> None:
+    with open(filename, 'wb') as snapshot_file:
+        snapshot_file.write(encode_snapshot(token_networks, chain_id, registry_address, block))
+
+
+def import_snapshot(
+    database: PFSDatabase, filename: str, chain_id: ChainID, registry_address: Address
+) -> BlockNumber:
+    """ Store the token networks of a snapshot in `database` and return its block """
+    with open(filename, 'rb') as snapshot_file:
+        block, token_networks = decode_snapshot(snapshot_file.read(), chain_id, registry_address)
+
+    with database.transaction():
+        database.update_chain(chain_id, registry_address)
+        for token_network_address, rows in token_networks.items():
+            database.upsert_token_network(token_network_address)
+            database.insert_channel_views(token_network_address, rows)
+        database.update_latest_known_block(block)
+
+    log.info(
+        'Imported snapshot',
+        filename=filename,
+        block=block,
+        num_token_networks=len(token_networks),
+        num_channel_views=sum(len(rows) for rows in token_networks.values()),
+    )
+    return block
+
+
+@click.command()
+@click.option(
+    '--output',
+    required=True,
+    type=click.Path(dir_okay=False, writable=True),
+    help='Path of the snapshot file',
+)
+@common_options('raiden-pathfinding-service')
+def main(private_key: str, state_db: str, output: str) -> None:
+    """ Export the token networks stored by a pathfinding service into a snapshot """
+    database = PFSDatabase(filename=state_db, pfs_address=private_key_to_address(private_key))
+    block = database.get_latest_known_block()
+    chain_id, registry_address = database.get_chain()
+    if block is None or chain_id is None or registry_address is None:
+        log.error('Database contains no synced state', state_db=state_db)
+        sys.exit(1)
+
+    token_networks = {}
+    for token_network_address in database.get_token_network_addresses():
+        token_network = TokenNetwork(token_network_address)
+        restore_channel_views(token_network, database.get_channel_views(token_network_address))
+        token_networks[token_network_address] = token_network
+    # Include the capacity updates which have not been checkpointed yet
+    CapacityUpdateJournal(database).replay(token_networks)
+
+    write_snapshot(output, token_networks, chain_id, registry_address, block)
+    log.info('Exported snapshot', filename=output, block=block)
+
+
+if __name__ == '__main__':
+    main(auto_envvar_prefix='PFS')  # pragma: no cover
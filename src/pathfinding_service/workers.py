@@ -0,0 +1,232 @@
+""" Path searches in worker processes
+
+Each worker process holds its own copy of the token networks. Workers start
+with a snapshot of the token networks of the main process. Afterwards, every
+change applied to a token network in the main process is recorded as an
+update `(token_network_address, method_name, kwargs)` and replayed by the
+workers. Recorded updates are only sent when they are published after a
+complete set of changes, like a whole block range. They are sent to a worker
+in batches, at the latest together with its next request, so each request
+sees all changes published before it was sent.
+
+Only the main process ingests events and messages. Waiting for the workers
+does not block the gevent loop, so ingestion and other requests continue
+while paths are searched. A worker which terminates is replaced by a new one,
+which starts with a snapshot of the current token networks.
+"""
+import multiprocessing
+import pickle
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from gevent.queue import Queue
+from gevent.socket import wait_read
+
+from pathfinding_service.config import PATH_WORKER_STOP_TIMEOUT, PATH_WORKER_UPDATE_BATCH_SIZE
+from pathfinding_service.model import TokenNetwork
+from raiden_libs.types import TokenNetworkAddress
+
+log = structlog.get_logger(__name__)
+
+Update = Tuple[TokenNetworkAddress, str, Dict[str, Any]]
+Request = Tuple[TokenNetworkAddress, str, Dict[str, Any]]
+
+# Method name of the update which adds a token network to the workers
+NEW_TOKEN_NETWORK = 'new_token_network'
+
+
+class PathWorkerError(Exception):
+    """ A worker process terminated unexpectedly """
+
+
+def apply_update(token_networks: Dict[TokenNetworkAddress, TokenNetwork], update: Update) -> None:
+    token_network_address, method_name, kwargs = update
+    if method_name == NEW_TOKEN_NETWORK:
+        token_networks[token_network_address] = pickle.loads(kwargs['snapshot'])
+    else:
+        getattr(token_networks[token_network_address], method_name)(**kwargs)
+
+
+def snapshot_update(token_network: TokenNetwork) -> Update:
+    """ Return the update which adds a copy of `token_network` to the workers """
+    snapshot = pickle.dumps(token_network, protocol=pickle.HIGHEST_PROTOCOL)
+    return (token_network.address, NEW_TOKEN_NETWORK, dict(snapshot=snapshot))
+
+
+def worker_main(connection: Connection) -> None:
+    """ Main loop of a worker process
+
+    Receives `(updates, request)` pairs. Requests are answered with
+    `(result, exception)`, a `None` request only applies the updates.
+    """
+    token_networks: Dict[TokenNetworkAddress, TokenNetwork] = {}
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        updates, request = message
+        for update in updates:
+            apply_update(token_networks, update)
+        if request is None:
+            continue
+
+        token_network_address, method_name, kwargs = request
+        try:
+            result = getattr(token_networks[token_network_address], method_name)(**kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            connection.send((None, exc))
+        else:
+            connection.send((result, None))
+
+
+class PathWorker:
+    def __init__(self, context: Any, index: int):
+        self.connection, self.child_connection = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(self.child_connection,),
+            name=f'pfs-path-worker-{index}',
+            daemon=True,
+        )
+        self.pending_updates: List[Update] = []
+        # Number of unpublished updates already contained in the initial snapshot
+        self.skipped_updates = 0
+        self.busy = False
+
+    def start(self) -> None:
+        self.process.start()
+        # Only the worker uses its end, so its termination is noticed here
+        self.child_connection.close()
+
+    def send(self, request: Optional[Request]) -> None:
+        try:
+            self.connection.send((self.pending_updates, request))
+        except OSError:
+            raise PathWorkerError(f'{self.process.name} terminated')
+        self.pending_updates = []
+
+    def receive(self) -> Tuple[Any, Optional[Exception]]:
+        # wait without blocking other greenlets
+        wait_read(self.connection.fileno())
+        try:
+            return self.connection.recv()
+        except EOFError:
+            raise PathWorkerError(f'{self.process.name} terminated')
+
+
+class PathWorkerPool:
+    """ Runs methods of token networks in a pool of worker processes """
+
+    def __init__(self, num_workers: int):
+        # Don't fork the gevent process, the workers start with a fresh interpreter
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = [PathWorker(self.context, index) for index in range(num_workers)]
+        self.idle_workers: Queue = Queue()
+        self.token_networks: Dict[TokenNetworkAddress, TokenNetwork] = {}
+        self.is_running = False
+        # Recorded updates which are not sent to the workers yet, see `publish`
+        self.unpublished_updates: List[Update] = []
+
+    def __repr__(self) -> str:
+        return f'<PathWorkerPool workers={len(self.workers)} idle={self.idle_workers.qsize()}>'
+
+    def start(self, token_networks: Dict[TokenNetworkAddress, TokenNetwork]) -> None:
+        """ Start the workers with a snapshot of `token_networks`
+
+        The dict is kept to start replacements of terminated workers, it must
+        contain the token networks added later.
+        """
+        self.token_networks = token_networks
+        for token_network in token_networks.values():
+            self.add_token_network(token_network)
+        self.publish()
+        for worker in self.workers:
+            worker.start()
+            self.idle_workers.put(worker)
+        self.is_running = True
+        log.info('Started path workers', num_workers=len(self.workers))
+
+    def stop(self) -> None:
+        self.is_running = False
+        for worker in self.workers:
+            if not worker.process.is_alive():
+                continue
+            worker.connection.send(None)
+            worker.process.join(PATH_WORKER_STOP_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def add_token_network(self, token_network: TokenNetwork) -> None:
+        # Take the snapshot now, later changes are replayed as updates
+        self._record(snapshot_update(token_network))
+
+    def record_update(
+        self, token_network_address: TokenNetworkAddress, method_name: str, kwargs: Dict[str, Any]
+    ) -> None:
+        """ Replay a change to a token network of the main process in all workers """
+        self._record((token_network_address, method_name, kwargs))
+
+    def _record(self, update: Update) -> None:
+        self.unpublished_updates.append(update)
+
+    def publish(self) -> None:
+        """ Send the updates recorded since the last call to the workers """
+        for worker in self.workers:
+            for update in self.unpublished_updates[worker.skipped_updates :]:
+                worker.pending_updates.append(update)
+                # Busy workers get the updates with their next request
+                if (
+                    self.is_running
+                    and not worker.busy
+                    and len(worker.pending_updates) >= PATH_WORKER_UPDATE_BATCH_SIZE
+                ):
+                    try:
+                        worker.send(None)
+                    except PathWorkerError:
+                        # Replaced when it is called next
+                        pass
+            worker.skipped_updates = 0
+        self.unpublished_updates = []
+
+    def _replace_worker(self, worker: PathWorker) -> PathWorker:
+        """ Terminate `worker` and start a new one with a snapshot of the token networks """
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.connection.close()
+
+        index = self.workers.index(worker)
+        replacement = PathWorker(self.context, index)
+        replacement.pending_updates = [
+            snapshot_update(token_network) for token_network in self.token_networks.values()
+        ]
+        # The snapshot already contains the changes which are not published yet
+        replacement.skipped_updates = len(self.unpublished_updates)
+        replacement.start()
+        self.workers[index] = replacement
+        return replacement
+
+    def call(
+        self, token_network_address: TokenNetworkAddress, method_name: str, kwargs: Dict[str, Any]
+    ) -> Any:
+        """ Call a method of the token network in a worker and return its result
+
+        Exceptions raised by the method are raised again in the caller.
+        """
+        worker = self.idle_workers.get()
+        worker.busy = True
+        try:
+            worker.send((token_network_address, method_name, kwargs))
+            result, exception = worker.receive()
+        except BaseException as exc:
+            # Also when the waiting greenlet is killed, since the worker's answer
+            # to this request would be received by the next one
+            log.error('Replacing path worker', worker=worker.process.name, error=repr(exc))
+            self.idle_workers.put(self._replace_worker(worker))
+            raise
+        worker.busy = False
+        self.idle_workers.put(worker)
+
+        if exception is not None:
+            raise exception
+        return result
@@ -1,12 +1,25 @@
+import heapq
+from collections import deque
 from copy import deepcopy
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
 
 import structlog
+from eth_abi import decode_abi, decode_single
 from eth_utils import decode_hex, encode_hex, to_checksum_address
 from eth_utils.abi import event_abi_to_log_topic
+from requests.exceptions import Timeout
 from web3 import Web3
 from web3.contract import get_event_data
-from web3.utils.abi import filter_by_type
+from web3.datastructures import AttributeDict
+from web3.utils.abi import (
+    exclude_indexed_event_inputs,
+    filter_by_type,
+    get_abi_input_names,
+    get_indexed_event_inputs,
+    normalize_event_input_types,
+)
+from web3.utils.events import get_event_abi_types_for_decoding
 
 from raiden.utils.typing import ABI, BlockNumber
 from raiden_contracts.constants import (
@@ -18,6 +31,12 @@ from raiden_contracts.constants import (
     MonitoringServiceEvent,
 )
 from raiden_contracts.contract_manager import ContractManager
+from raiden_libs.constants import (
+    DEFAULT_FILTER_INTERVAL,
+    MAX_EVENTS_PER_FILTER,
+    MAX_FILTER_INTERVAL,
+    MIN_FILTER_INTERVAL,
+)
 from raiden_libs.events import (
     Event,
     ReceiveChannelClosedEvent,
@@ -31,10 +50,36 @@ from raiden_libs.events import (
     UpdatedHeadBlockEvent,
 )
 from raiden_libs.states import BlockchainState
-from raiden_libs.types import Address
+from raiden_libs.types import Address, TokenNetworkAddress
 
 log = structlog.get_logger(__name__)
 
+# Number of contracts whose events are queried with one `eth_getLogs` call
+MAX_ADDRESSES_PER_FILTER = 100
+
+# Creates an event from the event name, the decoded arguments and the raw log
+EventParser = Callable[[str, Dict[str, Any], Dict], Optional[Event]]
+
+# The contract events from which the events are created, by contract and event name
+CONTRACT_EVENTS: Dict[Type[Event], Tuple[str, str]] = {
+    ReceiveChannelOpenedEvent: (CONTRACT_TOKEN_NETWORK, ChannelEvent.OPENED),
+    ReceiveChannelNewDepositEvent: (CONTRACT_TOKEN_NETWORK, ChannelEvent.DEPOSIT),
+    ReceiveChannelClosedEvent: (CONTRACT_TOKEN_NETWORK, ChannelEvent.CLOSED),
+    ReceiveNonClosingBalanceProofUpdatedEvent: (
+        CONTRACT_TOKEN_NETWORK,
+        ChannelEvent.BALANCE_PROOF_UPDATED,
+    ),
+    ReceiveChannelSettledEvent: (CONTRACT_TOKEN_NETWORK, ChannelEvent.SETTLED),
+    ReceiveMonitoringNewBalanceProofEvent: (
+        CONTRACT_MONITORING_SERVICE,
+        MonitoringServiceEvent.NEW_BALANCE_PROOF_RECEIVED,
+    ),
+    ReceiveMonitoringRewardClaimedEvent: (
+        CONTRACT_MONITORING_SERVICE,
+        MonitoringServiceEvent.REWARD_CLAIMED,
+    ),
+}
+
 
 def create_registry_event_topics(contract_manager: ContractManager) -> List:
     new_network_abi = contract_manager.get_event_abi(
@@ -43,6 +88,24 @@ def create_registry_event_topics(contract_manager: ContractManager) -> List:
     return [encode_hex(event_abi_to_log_topic(new_network_abi))]
 
 
+def create_event_topics(
+    contract_manager: ContractManager, event_types: Optional[Iterable[Type[Event]]]
+) -> List:
+    """ Return the topics matching the contract events of the given event types
+
+    The event topics are combined with OR, so that the node only returns the
+    logs of these events. Without `event_types`, all logs are matched.
+    """
+    if event_types is None:
+        return [None]
+    event_topics = {
+        encode_hex(event_abi_to_log_topic(contract_manager.get_event_abi(*CONTRACT_EVENTS[type_])))
+        for type_ in event_types
+        if type_ in CONTRACT_EVENTS
+    }
+    return [sorted(event_topics)]
+
+
 def decode_event(abi: ABI, log_: Dict) -> Dict:
     """ Helper function to unpack event data using a provided ABI
 
@@ -64,6 +127,95 @@ def decode_event(abi: ABI, log_: Dict) -> Dict:
     return get_event_data(event_abi, log_)
 
 
+def log_topic(log_: Dict) -> bytes:
+    """ Return the first topic of a raw log, which identifies the event """
+    topic = log_['topics'][0]
+    if isinstance(topic, str):
+        return decode_hex(topic)
+    if isinstance(topic, int):
+        return decode_hex(hex(topic))
+    return bytes(topic)
+
+
+class EventDecoder:
+    """ Decodes the arguments of one event from raw logs
+
+    The names and types of the arguments are prepared once from the event ABI.
+    """
+
+    def __init__(self, event_abi: Dict):
+        self.event_name = event_abi['name']
+        topic_inputs = get_indexed_event_inputs(event_abi)
+        data_inputs = exclude_indexed_event_inputs(event_abi)
+        self.topic_names = get_abi_input_names({'inputs': topic_inputs})
+        self.topic_types = get_event_abi_types_for_decoding(
+            normalize_event_input_types(topic_inputs)
+        )
+        self.data_names = get_abi_input_names({'inputs': data_inputs})
+        self.data_types = get_event_abi_types_for_decoding(
+            normalize_event_input_types(data_inputs)
+        )
+        self.address_names = [
+            name
+            for name, type_ in zip(
+                self.topic_names + self.data_names, self.topic_types + self.data_types
+            )
+            if type_ == 'address'
+        ]
+
+    def __repr__(self) -> str:
+        return f'<EventDecoder event={self.event_name}>'
+
+    def decode_args(self, log_: Dict) -> Dict[str, Any]:
+        topics = log_['topics'][1:]
+        if len(topics) != len(self.topic_types):
+            raise ValueError(f'Expected {len(self.topic_types)} log topics, got {len(topics)}')
+
+        args = {
+            name: decode_single(type_, decode_hex(topic) if isinstance(topic, str) else topic)
+            for name, type_, topic in zip(self.topic_names, self.topic_types, topics)
+        }
+        data = log_['data']
+        args.update(
+            zip(
+                self.data_names,
+                decode_abi(self.data_types, decode_hex(data) if isinstance(data, str) else data),
+            )
+        )
+        for name in self.address_names:
+            args[name] = to_checksum_address(args[name])
+        return args
+
+    def decode(self, log_: Dict) -> Dict:
+        """ Decode the log in the format of `web3.contract.get_event_data` """
+        return AttributeDict(
+            {
+                'args': self.decode_args(log_),
+                'event': self.event_name,
+                'logIndex': log_['logIndex'],
+                'transactionIndex': log_['transactionIndex'],
+                'transactionHash': log_['transactionHash'],
+                'address': log_['address'],
+                'blockHash': log_['blockHash'],
+                'blockNumber': log_['blockNumber'],
+            }
+        )
+
+
+@lru_cache(maxsize=None)
+def get_event_decoders(
+    contract_manager: ContractManager, contract_name: str
+) -> Dict[bytes, EventDecoder]:
+    """ Return the decoders for the events of a contract by their topic
+
+    The decoders are only built once per contract.
+    """
+    return {
+        event_abi_to_log_topic(event_abi): EventDecoder(event_abi)
+        for event_abi in filter_by_type('event', contract_manager.get_contract_abi(contract_name))
+    }
+
+
 def query_blockchain_events(
     web3: Web3,
     contract_manager: ContractManager,
@@ -87,19 +239,249 @@ def query_blockchain_events(
     Returns:
         All matching events
     """
-    filter_params = {
-        'fromBlock': from_block,
-        'toBlock': to_block,
-        'address': to_checksum_address(contract_address),
-        'topics': topics,
-    }
+    checksum_address = Address(to_checksum_address(contract_address))
+    logs, _ = query_contracts_logs(
+        web3=web3,
+        addresses=[checksum_address],
+        topics=topics,
+        from_block=from_block,
+        to_block=to_block,
+    )
+    decoders = get_event_decoders(contract_manager, contract_name)
+    return [decoders[log_topic(log_)].decode(log_) for log_ in logs[checksum_address]]
+
+
+class LogQuery:
+    """ Iterates over the raw logs emitted by multiple contracts within a certain range
+
+    The contracts are queried together, with one `eth_getLogs` call per
+    `MAX_ADDRESSES_PER_FILTER` contracts. The range is queried in parts of
+    `filter_interval` blocks, which is halved when the node fails to answer
+    or returns many logs, and doubled when it returns few logs. Only the logs
+    of the current part are held in memory.
+    """
+
+    def __init__(
+        self,
+        web3: Web3,
+        addresses: List[Address],
+        topics: List,
+        from_block: BlockNumber,
+        to_block: BlockNumber,
+        filter_interval: int = DEFAULT_FILTER_INTERVAL,
+    ):
+        """
+        addresses: The checksummed addresses of the contracts
+        filter_interval: The number of blocks to query at once, the adjusted
+            value can be read after iterating
+        """
+        self.web3 = web3
+        self.addresses = addresses
+        self.topics = topics
+        self.from_block = from_block
+        self.to_block = to_block
+        self.filter_interval = filter_interval
+
+    def __repr__(self) -> str:
+        return (
+            f'<LogQuery from_block={self.from_block} to_block={self.to_block} '
+            f'filter_interval={self.filter_interval}>'
+        )
+
+    def __iter__(self) -> Iterator[Dict]:
+        """ Yield the logs in the order of the chain """
+        range_start = self.from_block
+        while range_start <= self.to_block:
+            range_end = BlockNumber(min(self.to_block, range_start + self.filter_interval - 1))
+            try:
+                logs = self._get_logs(range_start, range_end)
+            except (ValueError, Timeout) as error:
+                # Nodes time out or refuse to answer when a range contains too many logs
+                if range_end == range_start:
+                    raise
+                self.filter_interval = max(MIN_FILTER_INTERVAL, (range_end - range_start + 1) // 2)
+                log.warning(
+                    'Querying events failed, reducing the block range',
+                    from_block=range_start,
+                    to_block=range_end,
+                    filter_interval=self.filter_interval,
+                    error=str(error),
+                )
+                continue
+
+            is_full_range = range_end - range_start + 1 == self.filter_interval
+            if len(logs) > MAX_EVENTS_PER_FILTER:
+                self.filter_interval = max(MIN_FILTER_INTERVAL, self.filter_interval // 2)
+            elif is_full_range and len(logs) < MAX_EVENTS_PER_FILTER // 4:
+                self.filter_interval = min(MAX_FILTER_INTERVAL, self.filter_interval * 2)
+            range_start = BlockNumber(range_end + 1)
+
+            yield from logs
+
+    def _get_logs(self, from_block: BlockNumber, to_block: BlockNumber) -> List[Dict]:
+        results = []
+        for start in range(0, len(self.addresses), MAX_ADDRESSES_PER_FILTER):
+            filter_params = {
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'address': self.addresses[start : start + MAX_ADDRESSES_PER_FILTER],
+                'topics': self.topics,
+            }
+            results.append(self.web3.eth.getLogs(filter_params))
+        if len(results) == 1:
+            return results[0]
+        # The logs of each query are ordered, merge them into the order of the chain
+        return list(
+            heapq.merge(*results, key=lambda log_: (log_['blockNumber'], log_['logIndex']))
+        )
+
+
+def query_contracts_logs(
+    web3: Web3,
+    addresses: List[Address],
+    topics: List,
+    from_block: BlockNumber,
+    to_block: BlockNumber,
+    filter_interval: int = DEFAULT_FILTER_INTERVAL,
+) -> Tuple[Dict[Address, List[Dict]], int]:
+    """Returns the raw logs emitted by multiple contracts within a certain range.
+
+    Args:
+        web3: A Web3 instance
+        addresses: The checksummed addresses of the contracts
+        topics: The topics to filter for
+        from_block: The block to start search events
+        to_block: The block to stop searching for events
+        filter_interval: The number of blocks to query at once, see `LogQuery`
+
+    Returns:
+        All matching logs by contract address, in the order of the chain,
+        and the adjusted `filter_interval`
+    """
+    query = LogQuery(
+        web3=web3,
+        addresses=addresses,
+        topics=topics,
+        from_block=from_block,
+        to_block=to_block,
+        filter_interval=filter_interval,
+    )
+    logs: Dict[Address, List[Dict]] = {address: [] for address in addresses}
+    for log_ in query:
+        logs[Address(to_checksum_address(log_['address']))].append(log_)
+    return logs, query.filter_interval
+
+
+def decode_log(
+    log_: Dict, decoders: Dict[bytes, EventDecoder], parse_event: EventParser
+) -> Optional[Event]:
+    """ Decode a raw log into an event, `None` for unknown and unhandled events """
+    decoder = decoders.get(log_topic(log_))
+    if decoder is None:
+        return None
+    return parse_event(decoder.event_name, decoder.decode_args(log_), log_)
+
+
+def decode_events(
+    logs: List[Dict], decoders: Dict[bytes, EventDecoder], parse_event: EventParser
+) -> List[Event]:
+    """ Decode raw logs into events, skipping logs of unknown and unhandled events """
+    events = []
+    for log_ in logs:
+        event = decode_log(log_, decoders, parse_event)
+        if event is not None:
+            events.append(event)
+    return events
 
-    events = web3.eth.getLogs(filter_params)
 
-    return [
-        decode_event(ABI(contract_manager.get_contract_abi(contract_name)), raw_event)
-        for raw_event in events
-    ]
+def parse_token_network_event(
+    event_name: str, args: Dict[str, Any], log_: Dict
+) -> Optional[Event]:
+    common_infos = dict(
+        token_network_address=log_['address'],
+        channel_identifier=args['channel_identifier'],
+        block_number=log_['blockNumber'],
+    )
+
+    if event_name == ChannelEvent.OPENED:
+        return ReceiveChannelOpenedEvent(
+            participant1=args['participant1'],
+            participant2=args['participant2'],
+            settle_timeout=args['settle_timeout'],
+            **common_infos,
+        )
+    if event_name == ChannelEvent.DEPOSIT:
+        return ReceiveChannelNewDepositEvent(
+            participant_address=args['participant'],
+            total_deposit=args['total_deposit'],
+            **common_infos,
+        )
+    if event_name == ChannelEvent.CLOSED:
+        return ReceiveChannelClosedEvent(
+            closing_participant=args['closing_participant'], **common_infos
+        )
+    if event_name == ChannelEvent.BALANCE_PROOF_UPDATED:
+        return ReceiveNonClosingBalanceProofUpdatedEvent(
+            closing_participant=args['closing_participant'], nonce=args['nonce'], **common_infos
+        )
+    if event_name == ChannelEvent.SETTLED:
+        return ReceiveChannelSettledEvent(**common_infos)
+    return None
+
+
+def parse_monitoring_event(event_name: str, args: Dict[str, Any], log_: Dict) -> Optional[Event]:
+    if event_name == MonitoringServiceEvent.NEW_BALANCE_PROOF_RECEIVED:
+        return ReceiveMonitoringNewBalanceProofEvent(
+            token_network_address=args['token_network_address'],
+            channel_identifier=args['channel_identifier'],
+            reward_amount=args['reward_amount'],
+            nonce=args['nonce'],
+            ms_address=args['ms_address'],
+            raiden_node_address=args['raiden_node_address'],
+            block_number=log_['blockNumber'],
+        )
+    if event_name == MonitoringServiceEvent.REWARD_CLAIMED:
+        return ReceiveMonitoringRewardClaimedEvent(
+            ms_address=args['ms_address'],
+            amount=args['amount'],
+            reward_identifier=encode_hex(args['reward_identifier']),
+            block_number=log_['blockNumber'],
+        )
+    return None
+
+
+def parse_registry_event(event: Dict) -> Event:
+    return ReceiveTokenNetworkCreatedEvent(
+        token_address=event['args']['token_address'],
+        token_network_address=event['args']['token_network_address'],
+        block_number=event['blockNumber'],
+    )
+
+
+def decode_chain_events(
+    logs: Iterable[Dict],
+    contract_parsers: Dict[Address, Tuple[Dict[bytes, EventDecoder], EventParser]],
+    registry_events: List[Dict],
+) -> Iterator[Event]:
+    """ Decode the logs and yield them together with the registry events in the order of the chain
+
+    `contract_parsers` contains the decoders and the `parse_event` function
+    for the logs of each contract.
+    """
+    pending_registry_events = deque(registry_events)
+    for log_ in logs:
+        while pending_registry_events and (
+            pending_registry_events[0]['blockNumber'],
+            pending_registry_events[0]['logIndex'],
+        ) < (log_['blockNumber'], log_['logIndex']):
+            yield parse_registry_event(pending_registry_events.popleft())
+
+        decoders, parse_event = contract_parsers[Address(to_checksum_address(log_['address']))]
+        event = decode_log(log_, decoders, parse_event)
+        if event is not None:
+            yield event
+    for registry_event in pending_registry_events:
+        yield parse_registry_event(registry_event)
 
 
 def get_blockchain_events(
@@ -108,13 +490,45 @@ def get_blockchain_events(
     chain_state: BlockchainState,
     to_block: BlockNumber,
     query_ms: bool = True,
+    event_types: Optional[Iterable[Type[Event]]] = None,
 ) -> Tuple[BlockchainState, List[Event]]:
+    """ Return the new events of the token networks and the monitoring service contract
+
+    New token networks are always returned. If `event_types` is given, only
+    the contract events of these types are requested from the node.
+    """
+    new_chain_state, events = stream_blockchain_events(
+        web3=web3,
+        contract_manager=contract_manager,
+        chain_state=chain_state,
+        to_block=to_block,
+        query_ms=query_ms,
+        event_types=event_types,
+    )
+    return new_chain_state, list(events)
+
+
+def stream_blockchain_events(
+    web3: Web3,
+    contract_manager: ContractManager,
+    chain_state: BlockchainState,
+    to_block: BlockNumber,
+    query_ms: bool = True,
+    event_types: Optional[Iterable[Type[Event]]] = None,
+) -> Tuple[BlockchainState, Iterator[Event]]:
+    """ Like `get_blockchain_events`, but the events are decoded while iterating
+
+    Only the logs of one `eth_getLogs` query are held in memory, whatever the
+    size of the block range. The events are yielded in the order of the
+    chain. New token networks are added to the returned state right away,
+    its `filter_interval` is adjusted when all events have been consumed.
+    """
     # increment by one, as latest_known_block has been queried last time already
     from_block = BlockNumber(chain_state.latest_known_block + 1)
 
     # Check if the current block was already processed
     if from_block > to_block:
-        return chain_state, []
+        return chain_state, iter([])
 
     new_chain_state = deepcopy(chain_state)
     log.info('Querying new block(s)', from_block=from_block, end_block=to_block)
@@ -129,92 +543,72 @@ def get_blockchain_events(
         from_block=from_block,
         to_block=to_block,
     )
-
-    events: List[Event] = []
     for event in registry_events:
-        token_network_address = event['args']['token_network_address']
-        token_address = event['args']['token_address']
-        block_number = event['blockNumber']
-
-        events.append(
-            ReceiveTokenNetworkCreatedEvent(
-                token_address=token_address,
-                token_network_address=token_network_address,
-                block_number=block_number,
-            )
-        )
         new_chain_state.token_network_addresses.append(event['args']['token_network_address'])
 
-    # then check all token networks
-    for token_network_address in new_chain_state.token_network_addresses:
-        network_events = query_blockchain_events(
-            web3=web3,
-            contract_manager=contract_manager,
-            contract_address=Address(token_network_address),
-            contract_name=CONTRACT_TOKEN_NETWORK,
-            topics=[None],
-            from_block=from_block,
-            to_block=to_block,
+    # then check all token networks and the monitoring service contract at once
+    token_network_decoders = get_event_decoders(contract_manager, CONTRACT_TOKEN_NETWORK)
+    contract_parsers: Dict[Address, Tuple[Dict[bytes, EventDecoder], EventParser]] = {
+        Address(to_checksum_address(address)): (token_network_decoders, parse_token_network_event)
+        for address in new_chain_state.token_network_addresses
+    }
+    if query_ms:
+        monitor_contract_address = Address(
+            to_checksum_address(new_chain_state.monitor_contract_address)
+        )
+        contract_parsers[monitor_contract_address] = (
+            get_event_decoders(contract_manager, CONTRACT_MONITORING_SERVICE),
+            parse_monitoring_event,
         )
+    query = LogQuery(
+        web3=web3,
+        addresses=list(contract_parsers),
+        topics=create_event_topics(contract_manager, event_types),
+        from_block=from_block,
+        to_block=to_block,
+        filter_interval=new_chain_state.filter_interval,
+    )
 
-        for event in network_events:
-            event_name = event['event']
+    def iter_events() -> Iterator[Event]:
+        yield from decode_chain_events(query, contract_parsers, registry_events)
+        new_chain_state.filter_interval = query.filter_interval
+        # commit new block number
+        yield UpdatedHeadBlockEvent(head_block_number=to_block)
 
-            common_infos = dict(
-                token_network_address=event['address'],
-                channel_identifier=event['args']['channel_identifier'],
-                block_number=event['blockNumber'],
-            )
+    return new_chain_state, iter_events()
 
-            if event_name == ChannelEvent.OPENED:
-                events.append(
-                    ReceiveChannelOpenedEvent(
-                        participant1=event['args']['participant1'],
-                        participant2=event['args']['participant2'],
-                        settle_timeout=event['args']['settle_timeout'],
-                        **common_infos,
-                    )
-                )
-            elif event_name == ChannelEvent.DEPOSIT:
-                events.append(
-                    ReceiveChannelNewDepositEvent(
-                        participant_address=event['args']['participant'],
-                        total_deposit=event['args']['total_deposit'],
-                        **common_infos,
-                    )
-                )
-            elif event_name == ChannelEvent.CLOSED:
-                events.append(
-                    ReceiveChannelClosedEvent(
-                        closing_participant=event['args']['closing_participant'], **common_infos
-                    )
-                )
-            elif event_name == ChannelEvent.BALANCE_PROOF_UPDATED:
-                events.append(
-                    ReceiveNonClosingBalanceProofUpdatedEvent(
-                        closing_participant=event['args']['closing_participant'],
-                        nonce=event['args']['nonce'],
-                        **common_infos,
-                    )
-                )
-            elif event_name == ChannelEvent.SETTLED:
-                events.append(ReceiveChannelSettledEvent(**common_infos))
 
-    # get events from monitoring service contract
-    if query_ms:
-        monitoring_events = get_monitoring_blockchain_events(
-            web3=web3,
-            contract_manager=contract_manager,
-            chain_state=new_chain_state,
-            from_block=from_block,
-            to_block=to_block,
-        )
-        events.extend(monitoring_events)
+def get_unconfirmed_token_network_events(
+    web3: Web3,
+    contract_manager: ContractManager,
+    token_network_addresses: List[TokenNetworkAddress],
+    from_block: BlockNumber,
+    to_block: BlockNumber,
+    event_types: Optional[Iterable[Type[Event]]] = None,
+) -> List[Tuple[bytes, Event]]:
+    """ Return the token network events of unconfirmed blocks with the hashes of their blocks
 
-    # commit new block number
-    events.append(UpdatedHeadBlockEvent(head_block_number=to_block))
+    Unconfirmed blocks can still be removed by a reorg. Comparing the block
+    hashes with the ones of a later query shows whether the events are still
+    part of the chain.
+    """
+    if from_block > to_block or not token_network_addresses:
+        return []
 
-    return new_chain_state, events
+    decoders = get_event_decoders(contract_manager, CONTRACT_TOKEN_NETWORK)
+    query = LogQuery(
+        web3=web3,
+        addresses=[Address(to_checksum_address(address)) for address in token_network_addresses],
+        topics=create_event_topics(contract_manager, event_types),
+        from_block=from_block,
+        to_block=to_block,
+    )
+    events = []
+    for log_ in query:
+        event = decode_log(log_, decoders, parse_token_network_event)
+        if event is not None:
+            events.append((bytes(log_['blockHash']), event))
+    return events
 
 
 def get_monitoring_blockchain_events(
@@ -224,41 +618,16 @@ def get_monitoring_blockchain_events(
     from_block: BlockNumber,
     to_block: BlockNumber,
 ) -> List[Event]:
-    monitoring_service_events = query_blockchain_events(
+    monitor_contract_address = Address(to_checksum_address(chain_state.monitor_contract_address))
+    logs, _ = query_contracts_logs(
         web3=web3,
-        contract_manager=contract_manager,
-        contract_address=chain_state.monitor_contract_address,
-        contract_name=CONTRACT_MONITORING_SERVICE,
+        addresses=[monitor_contract_address],
         topics=[None],
         from_block=from_block,
         to_block=to_block,
     )
-
-    events: List[Event] = []
-    for event in monitoring_service_events:
-        event_name = event['event']
-        block_number = event['blockNumber']
-
-        if event_name == MonitoringServiceEvent.NEW_BALANCE_PROOF_RECEIVED:
-            events.append(
-                ReceiveMonitoringNewBalanceProofEvent(
-                    token_network_address=event['args']['token_network_address'],
-                    channel_identifier=event['args']['channel_identifier'],
-                    reward_amount=event['args']['reward_amount'],
-                    nonce=event['args']['nonce'],
-                    ms_address=event['args']['ms_address'],
-                    raiden_node_address=event['args']['raiden_node_address'],
-                    block_number=block_number,
-                )
-            )
-        elif event_name == MonitoringServiceEvent.REWARD_CLAIMED:
-            events.append(
-                ReceiveMonitoringRewardClaimedEvent(
-                    ms_address=event['args']['ms_address'],
-                    amount=event['args']['amount'],
-                    reward_identifier=encode_hex(event['args']['reward_identifier']),
-                    block_number=block_number,
-                )
-            )
-
-    return events
+    return decode_events(
+        logs=logs[monitor_contract_address],
+        decoders=get_event_decoders(contract_manager, CONTRACT_MONITORING_SERVICE),
+        parse_event=parse_monitoring_event,
+    )
@@ -0,0 +1,15 @@
+# Block ranges of log queries start with `DEFAULT_FILTER_INTERVAL` blocks and
+# are adjusted to the number of events between the min and max interval
+DEFAULT_FILTER_INTERVAL: int = 100_000
+MIN_FILTER_INTERVAL: int = 1
+MAX_FILTER_INTERVAL: int = 1_000_000
+# Ranges returning more events are reduced, ranges with few events are grown
+MAX_EVENTS_PER_FILTER: int = 10_000
+# Number of block ranges which are fetched ahead while the services handle events
+DEFAULT_SYNC_PREFETCH_SIZE: int = 2
+# Seconds without a new head after which the websocket connection is pinged
+NEW_HEADS_PING_INTERVAL: float = 60
+# Seconds between attempts to restore a dropped `newHeads` subscription
+NEW_HEADS_RECONNECT_INTERVAL: float = 10
+# Services reading the event store must require at least as many confirmations
+DEFAULT_INDEXER_CONFIRMATIONS: int = 8
@@ -0,0 +1,286 @@
+""" Local store of decoded and confirmed contract events
+
+The chain indexer (see `raiden_libs.indexer`) syncs the token network
+registry, all token networks and the monitoring service contract once and
+appends their events to the store. Services which use the store read the
+events of a block range from local disk instead of querying the Ethereum
+node. The `latest_known_block` of a service is its cursor into the store, so
+it is committed like when the events come from the node.
+"""
+import json
+import os
+import sqlite3
+from copy import deepcopy
+from dataclasses import asdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+import structlog
+
+from raiden.utils.typing import BlockNumber, ChainID
+from raiden_libs.blockchain import CONTRACT_EVENTS
+from raiden_libs.events import (
+    Event,
+    ReceiveMonitoringNewBalanceProofEvent,
+    ReceiveMonitoringRewardClaimedEvent,
+    ReceiveTokenNetworkCreatedEvent,
+    UpdatedHeadBlockEvent,
+)
+from raiden_libs.states import BlockchainState
+from raiden_libs.types import Address, TokenNetworkAddress
+
+log = structlog.get_logger(__name__)
+SCHEMA_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'schema.sql')
+STORED_EVENT_TYPES: Dict[str, Type[Event]] = {
+    event_type.__name__: event_type
+    for event_type in [ReceiveTokenNetworkCreatedEvent] + list(CONTRACT_EVENTS)
+}
+MONITORING_EVENT_TYPES = (
+    ReceiveMonitoringNewBalanceProofEvent,
+    ReceiveMonitoringRewardClaimedEvent,
+)
+
+
+class InvalidEventStore(Exception):
+    """ The event store doesn't contain the events requested by a service """
+
+
+class EventStore:
+    def __init__(self, filename: str, allow_create: bool = False):
+        log.info('Opening event store', filename=filename)
+        if allow_create and filename != ':memory:' and os.path.dirname(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        mode = 'rwc' if allow_create else 'rw'
+        self.conn = sqlite3.connect(
+            f'file:{filename}?mode={mode}',
+            uri=True,
+            isolation_level=None,  # Disable sqlite3 module’s implicit transaction management
+        )
+        self.conn.row_factory = sqlite3.Row
+        # The indexer writes while the services read
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        if allow_create:
+            self._setup()
+
+    def _setup(self) -> None:
+        """ Make sure that the db is initialized """
+        initialized = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='blockchain'"
+        ).fetchone()
+
+        if not initialized:
+            # create db schema
+            with open(SCHEMA_FILENAME) as schema_file:
+                self.conn.executescript(schema_file.read())
+
+    def get_latest_known_block(self) -> Optional[BlockNumber]:
+        """ Return the last block whose events are stored """
+        return self.conn.execute("SELECT latest_known_block FROM blockchain").fetchone()[0]
+
+    def get_confirmed_block(self) -> BlockNumber:
+        """ Return the last block which can be read, all stored blocks are confirmed """
+        latest_known_block = self.get_latest_known_block()
+        if latest_known_block is None:
+            raise InvalidEventStore('The event store has not been synced yet')
+        return latest_known_block
+
+    def get_required_confirmations(self) -> Optional[int]:
+        """ Return the number of confirmations the indexer waits for """
+        return self.conn.execute("SELECT required_confirmations FROM blockchain").fetchone()[0]
+
+    def set_required_confirmations(self, required_confirmations: int) -> None:
+        self.conn.execute(
+            "UPDATE blockchain SET required_confirmations = ?", [required_confirmations]
+        )
+
+    def check_required_confirmations(self, required_confirmations: int) -> None:
+        """ Raise if the stored blocks are less confirmed than required by a service
+
+        Services which require more confirmations than the indexer read the
+        stored blocks up to their own last confirmed block.
+        """
+        store_confirmations = self.get_required_confirmations()
+        if store_confirmations is not None and store_confirmations > required_confirmations:
+            raise InvalidEventStore(
+                f'The event store contains blocks with {store_confirmations} confirmations, '
+                f'but {required_confirmations} are required'
+            )
+
+    def get_chain_state(self) -> Optional[BlockchainState]:
+        """ Return the state of the indexer, `None` if it hasn't synced yet """
+        row = self.conn.execute("SELECT * FROM blockchain").fetchone()
+        if row['latest_known_block'] is None:
+            return None
+        return BlockchainState(
+            chain_id=ChainID(row['chain_id']),
+            token_network_registry_address=row['token_network_registry_address'],
+            monitor_contract_address=row['monitor_contract_address'],
+            latest_known_block=BlockNumber(row['latest_known_block']),
+            token_network_addresses=[
+                address for address, in self.conn.execute("SELECT address FROM token_network")
+            ],
+            filter_interval=row['filter_interval'],
+        )
+
+    def get_sync_start_block(self) -> Optional[BlockNumber]:
+        return self.conn.execute("SELECT sync_start_block FROM blockchain").fetchone()[0]
+
+    def initialize(self, chain_state: BlockchainState) -> None:
+        """ Start syncing after the `latest_known_block` of `chain_state` """
+        self.conn.execute(
+            """
+            UPDATE blockchain SET chain_id = ?, token_network_registry_address = ?,
+                monitor_contract_address = ?, sync_start_block = ?,
+                latest_known_block = ?, filter_interval = ?
+            """,
+            [
+                chain_state.chain_id,
+                chain_state.token_network_registry_address,
+                chain_state.monitor_contract_address,
+                chain_state.latest_known_block + 1,
+                chain_state.latest_known_block,
+                chain_state.filter_interval,
+            ],
+        )
+
+    def append_events(
+        self, chain_state: BlockchainState, last_block: BlockNumber, events: Iterable[Event]
+    ) -> int:
+        """ Store the events up to `last_block` and the new state of the indexer
+
+        Everything is written in one transaction, so readers never see a
+        partially stored block range. Returns the number of stored events.
+        """
+        self.conn.execute("BEGIN")
+        try:
+            num_events = 0
+            for event in events:
+                if isinstance(event, UpdatedHeadBlockEvent):
+                    continue
+                self.conn.execute(
+                    """
+                    INSERT INTO event (block_number, contract_address, event_type, data)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [
+                        event.block_number,  # type: ignore
+                        event_contract_address(event, chain_state),
+                        type(event).__name__,
+                        json.dumps(asdict(event)),
+                    ],
+                )
+                num_events += 1
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO token_network VALUES (?)",
+                [[address] for address in chain_state.token_network_addresses],
+            )
+            self.conn.execute(
+                "UPDATE blockchain SET latest_known_block = ?, filter_interval = ?",
+                [last_block, chain_state.filter_interval],
+            )
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return num_events
+
+    def get_events(
+        self,
+        from_block: BlockNumber,
+        to_block: BlockNumber,
+        event_types: Optional[Iterable[Type[Event]]] = None,
+    ) -> Iterator[Event]:
+        """ Yield the stored events of the block range in the order of the chain """
+        type_names = list(STORED_EVENT_TYPES)
+        if event_types is not None:
+            type_names = [event_type.__name__ for event_type in event_types]
+        query = f"""
+            SELECT event_type, data FROM event
+            WHERE block_number BETWEEN ? AND ?
+                AND event_type IN ({', '.join('?' * len(type_names))})
+            ORDER BY position
+        """
+        for row in self.conn.execute(query, [from_block, to_block, *type_names]):
+            yield STORED_EVENT_TYPES[row['event_type']](**json.loads(row['data']))
+
+    def stream_blockchain_events(
+        self,
+        chain_state: BlockchainState,
+        to_block: BlockNumber,
+        query_ms: bool = True,
+        event_types: Optional[Iterable[Type[Event]]] = None,
+    ) -> Tuple[BlockchainState, Iterator[Event]]:
+        """ Like `raiden_libs.blockchain.stream_blockchain_events`, but reads the store """
+        from_block = BlockNumber(chain_state.latest_known_block + 1)
+        self._check_contains(chain_state, from_block, to_block, query_ms)
+        if from_block > to_block:
+            return chain_state, iter([])
+
+        new_chain_state = deepcopy(chain_state)
+        for event in self.get_events(from_block, to_block, [ReceiveTokenNetworkCreatedEvent]):
+            assert isinstance(event, ReceiveTokenNetworkCreatedEvent)
+            new_chain_state.token_network_addresses.append(
+                TokenNetworkAddress(event.token_network_address)
+            )
+
+        # New token networks are always returned, like from the node
+        selected_types: List[Type[Event]] = [ReceiveTokenNetworkCreatedEvent]
+        selected_types.extend(
+            event_type
+            for event_type in (CONTRACT_EVENTS if event_types is None else event_types)
+            if event_type in CONTRACT_EVENTS
+            and (query_ms or event_type not in MONITORING_EVENT_TYPES)
+        )
+
+        def iter_events() -> Iterator[Event]:
+            yield from self.get_events(from_block, to_block, selected_types)
+            # commit new block number
+            yield UpdatedHeadBlockEvent(head_block_number=to_block)
+
+        return new_chain_state, iter_events()
+
+    def _check_contains(
+        self,
+        chain_state: BlockchainState,
+        from_block: BlockNumber,
+        to_block: BlockNumber,
+        query_ms: bool,
+    ) -> None:
+        store_state = self.get_chain_state()
+        if store_state is None:
+            raise InvalidEventStore('The event store has not been synced yet')
+        if store_state.chain_id != chain_state.chain_id:
+            raise InvalidEventStore(
+                f'The event store contains the events of chain {store_state.chain_id}'
+            )
+        if (
+            store_state.token_network_registry_address
+            != chain_state.token_network_registry_address
+        ):
+            raise InvalidEventStore(
+                'The event store contains the events of the token network registry '
+                f'{store_state.token_network_registry_address}'
+            )
+        if query_ms and (
+            store_state.monitor_contract_address != chain_state.monitor_contract_address
+        ):
+            raise InvalidEventStore(
+                'The event store contains the events of the monitoring service contract '
+                f'{store_state.monitor_contract_address}'
+            )
+        sync_start_block = self.get_sync_start_block()
+        assert sync_start_block is not None
+        if from_block < sync_start_block:
+            raise InvalidEventStore(f'The event store starts at block {sync_start_block}')
+        if to_block > store_state.latest_known_block:
+            raise InvalidEventStore(
+                f'The event store has only been synced up to {store_state.latest_known_block}'
+            )
+
+
+def event_contract_address(event: Event, chain_state: BlockchainState) -> Address:
+    """ Return the address of the contract which emitted the event """
+    if isinstance(event, ReceiveTokenNetworkCreatedEvent):
+        return chain_state.token_network_registry_address
+    if isinstance(event, MONITORING_EVENT_TYPES):
+        return chain_state.monitor_contract_address
+    return event.token_network_address  # type: ignore
@@ -0,0 +1,167 @@
+""" Daemon which indexes the contract events used by the services
+
+The indexer syncs the token network registry, all token networks and the
+monitoring service contract from the Ethereum node and stores the decoded
+events of confirmed blocks in an `EventStore`. Monitoring and pathfinding
+services started with `--event-store` read their events from the store
+instead of querying the node themselves.
+"""
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+import click
+import structlog
+from web3 import Web3
+from web3.contract import Contract
+
+from raiden.utils.typing import BlockNumber, ChainID
+from raiden_contracts.constants import CONTRACT_MONITORING_SERVICE, CONTRACT_TOKEN_NETWORK_REGISTRY
+from raiden_libs.blockchain import stream_blockchain_events
+from raiden_libs.cli import blockchain_options
+from raiden_libs.constants import DEFAULT_INDEXER_CONFIRMATIONS
+from raiden_libs.contract_info import CONTRACT_MANAGER
+from raiden_libs.event_store import EventStore
+from raiden_libs.logging import setup_logging
+from raiden_libs.new_heads import NewHeadsSubscription, get_head_block_number
+from raiden_libs.states import BlockchainState
+
+log = structlog.get_logger(__name__)
+
+
+class ChainIndexer:
+    def __init__(
+        self,
+        web3: Web3,
+        contracts: Dict[str, Contract],
+        db_filename: str,
+        sync_start_block: BlockNumber = BlockNumber(0),
+        required_confirmations: int = DEFAULT_INDEXER_CONFIRMATIONS,
+        poll_interval: float = 1,
+        eth_ws_uri: Optional[str] = None,
+    ):
+        self.web3 = web3
+        self.required_confirmations = required_confirmations
+        self.poll_interval = poll_interval
+        self.new_heads: Optional[NewHeadsSubscription] = None
+        if eth_ws_uri is not None:
+            self.new_heads = NewHeadsSubscription(eth_ws_uri)
+        self.store = EventStore(db_filename, allow_create=True)
+
+        chain_state = self.store.get_chain_state()
+        if chain_state is None:
+            chain_state = BlockchainState(
+                chain_id=ChainID(int(web3.net.version)),
+                token_network_registry_address=contracts[CONTRACT_TOKEN_NETWORK_REGISTRY].address,
+                monitor_contract_address=contracts[CONTRACT_MONITORING_SERVICE].address,
+                latest_known_block=sync_start_block,
+            )
+            self.store.initialize(chain_state)
+        self.store.set_required_confirmations(required_confirmations)
+        self.chain_state = chain_state
+        log.info(
+            'Indexing contract events',
+            registry_address=chain_state.token_network_registry_address,
+            monitor_contract_address=chain_state.monitor_contract_address,
+            latest_known_block=chain_state.latest_known_block,
+            required_confirmations=required_confirmations,
+        )
+
+    def start(self, wait_function: Callable = time.sleep) -> None:
+        if self.new_heads is not None:
+            self.new_heads.start()
+        while True:
+            last_confirmed_block = (
+                get_head_block_number(self.web3, self.new_heads) - self.required_confirmations
+            )
+
+            max_query_interval_end_block = (
+                self.chain_state.latest_known_block + self.chain_state.filter_interval
+            )
+            # Limit the max number of blocks that is processed per iteration
+            last_block = BlockNumber(min(last_confirmed_block, max_query_interval_end_block))
+            if last_block > self.chain_state.latest_known_block:
+                self._process_new_blocks(last_block)
+
+            try:
+                self._wait_for_new_blocks(wait_function)
+            except KeyboardInterrupt:
+                log.info('Shutting down')
+                sys.exit(0)
+
+    def _wait_for_new_blocks(self, wait_function: Callable) -> None:
+        """ Wake up when the next block is confirmed, poll while there is no subscription """
+        next_block = BlockNumber(
+            self.chain_state.latest_known_block + self.required_confirmations + 1
+        )
+        if self.new_heads is None or not self.new_heads.wait_for_block(
+            next_block, timeout=self.poll_interval
+        ):
+            wait_function(self.poll_interval)
+
+    def _process_new_blocks(self, last_block: BlockNumber) -> None:
+        new_chain_state, events = stream_blockchain_events(
+            web3=self.web3,
+            contract_manager=CONTRACT_MANAGER,
+            chain_state=self.chain_state,
+            to_block=last_block,
+        )
+        num_events = self.store.append_events(new_chain_state, last_block, events)
+        new_chain_state.latest_known_block = last_block
+        self.chain_state = new_chain_state
+        log.info('Indexed new blocks', last_block=last_block, num_events=num_events)
+
+
+@blockchain_options(contracts=[CONTRACT_TOKEN_NETWORK_REGISTRY, CONTRACT_MONITORING_SERVICE])
+@click.command()
+@click.option(
+    '--event-store',
+    required=True,
+    type=click.Path(dir_okay=False, writable=True),
+    help='Path to the SQLite3 db which stores the events',
+)
+@click.option(
+    '--eth-ws',
+    type=str,
+    help='Ethereum node websocket URI, new blocks are handled when the node announces them',
+)
+@click.option(
+    '--confirmations',
+    default=DEFAULT_INDEXER_CONFIRMATIONS,
+    type=click.IntRange(min=0),
+    help='Number of block confirmations to wait for',
+)
+@click.option(
+    '--log-level',
+    default='INFO',
+    type=click.Choice(['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG']),
+    help='Print log messages of this level and more important ones',
+    callback=lambda ctx, param, value: setup_logging(str(value)),
+    expose_value=False,
+)
+def main(
+    web3: Web3,
+    contracts: Dict[str, Contract],
+    start_block: BlockNumber,
+    event_store: str,
+    eth_ws: Optional[str],
+    confirmations: int,
+) -> int:
+    """ Index the contract events used by the Raiden services. """
+    log.info("Starting Raiden Chain Indexer")
+
+    indexer = ChainIndexer(
+        web3=web3,
+        contracts=contracts,
+        db_filename=event_store,
+        sync_start_block=start_block,
+        required_confirmations=confirmations,
+        eth_ws_uri=eth_ws,
+    )
+    indexer.start()
+
+    return 0
+
+
+if __name__ == '__main__':
+    main(auto_envvar_prefix='INDEXER')  # pragma: no cover
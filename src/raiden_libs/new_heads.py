@@ -0,0 +1,150 @@
+""" Push notifications about new blocks
+
+With an `eth_subscribe('newHeads')` subscription over a websocket, the node
+announces every new block and the services don't have to poll
+`eth.blockNumber`. The subscription runs in a background thread and is
+restored when the connection drops. While it is down, `head_block_number` is
+`None` and the services fall back to polling.
+"""
+import json
+import threading
+from typing import Any, Dict, Optional
+
+import structlog
+import websocket
+from web3 import Web3
+
+from raiden.utils.typing import BlockNumber
+from raiden_libs.constants import NEW_HEADS_PING_INTERVAL, NEW_HEADS_RECONNECT_INTERVAL
+
+log = structlog.get_logger(__name__)
+
+SUBSCRIBE_REQUEST_ID = 1
+BLOCK_NUMBER_REQUEST_ID = 2
+
+
+class NewHeadsSubscription:
+    def __init__(
+        self,
+        ws_uri: str,
+        ping_interval: float = NEW_HEADS_PING_INTERVAL,
+        reconnect_interval: float = NEW_HEADS_RECONNECT_INTERVAL,
+    ):
+        """
+        ping_interval: Seconds without a message after which the node is asked
+            for the current block. The connection is dropped if it doesn't answer
+            within the same time.
+        """
+        self.ws_uri = ws_uri
+        self.ping_interval = ping_interval
+        self.reconnect_interval = reconnect_interval
+        self.head_block_number: Optional[BlockNumber] = None
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.websocket: Optional[websocket.WebSocket] = None
+        self.thread = threading.Thread(target=self._run, name='NewHeadsSubscription', daemon=True)
+
+    def __repr__(self) -> str:
+        return f'<NewHeadsSubscription ws_uri={self.ws_uri} head={self.head_block_number}>'
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.websocket is not None:
+            # Wakes up the thread waiting for the next message
+            self.websocket.abort()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def wait_for_block(self, block_number: BlockNumber, timeout: float) -> bool:
+        """ Wait until the head reaches `block_number`, at most `timeout` seconds
+
+        Returns `False` while the subscription is down, callers have to poll
+        the node for new blocks then.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.head_block_number is None or self.head_block_number >= block_number,
+                timeout=timeout,
+            )
+            return self.head_block_number is not None
+
+    def _set_head(self, block_number: Optional[BlockNumber]) -> None:
+        with self.condition:
+            self.head_block_number = block_number
+            self.condition.notify_all()
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                self._follow_heads()
+            except Exception as exc:  # pylint: disable=broad-except
+                if not self.stop_event.is_set():
+                    log.warning(
+                        'New heads subscription dropped, polling for new blocks',
+                        ws_uri=self.ws_uri,
+                        error=str(exc),
+                    )
+            self._set_head(None)
+            self.stop_event.wait(self.reconnect_interval)
+
+    def _follow_heads(self) -> None:
+        self.websocket = websocket.create_connection(self.ws_uri, timeout=self.ping_interval)
+        try:
+            if self.stop_event.is_set():
+                return
+            self._send_request(SUBSCRIBE_REQUEST_ID, 'eth_subscribe', ['newHeads'])
+            response = json.loads(self.websocket.recv())
+            if 'result' not in response:
+                raise ValueError(f'Subscription failed: {response.get("error")}')
+            subscription_id = response['result']
+            log.info('Subscribed to new heads', ws_uri=self.ws_uri)
+
+            # Don't wait for the next block to know the current head
+            self._send_request(BLOCK_NUMBER_REQUEST_ID, 'eth_blockNumber')
+            waiting_for_block_number = True
+            while not self.stop_event.is_set():
+                try:
+                    data = self.websocket.recv()
+                except websocket.WebSocketTimeoutException:
+                    if waiting_for_block_number:
+                        raise
+                    # No new block for a while, make sure that the connection is alive
+                    self._send_request(BLOCK_NUMBER_REQUEST_ID, 'eth_blockNumber')
+                    waiting_for_block_number = True
+                    continue
+                if not data:
+                    raise websocket.WebSocketConnectionClosedException('Closed by the node')
+
+                message = json.loads(data)
+                params = message.get('params', {})
+                if params.get('subscription') == subscription_id:
+                    # Also lower block numbers are announced after reorgs
+                    self._set_head(BlockNumber(int(params['result']['number'], 16)))
+                elif message.get('id') == BLOCK_NUMBER_REQUEST_ID:
+                    waiting_for_block_number = False
+                    block_number = BlockNumber(int(message['result'], 16))
+                    if self.head_block_number is None or block_number > self.head_block_number:
+                        self._set_head(block_number)
+        finally:
+            self.websocket.shutdown()
+
+    def _send_request(self, request_id: int, method: str, params: Any = None) -> None:
+        request: Dict[str, Any] = dict(jsonrpc='2.0', id=request_id, method=method)
+        if params is not None:
+            request['params'] = params
+        assert self.websocket is not None
+        self.websocket.send(json.dumps(request))
+
+
+def get_head_block_number(
+    web3: Web3, new_heads: Optional[NewHeadsSubscription] = None
+) -> BlockNumber:
+    """ Return the latest announced head, query the node while there is none """
+    if new_heads is not None:
+        head_block_number = new_heads.head_block_number
+        if head_block_number is not None:
+            return head_block_number
+    return BlockNumber(web3.eth.blockNumber)
@@ -0,0 +1,27 @@
+CREATE TABLE blockchain (
+    chain_id                        INTEGER,
+    token_network_registry_address  CHAR(42),
+    monitor_contract_address        CHAR(42),
+    sync_start_block                INT,
+    latest_known_block              INT,
+    filter_interval                 INT,
+    required_confirmations          INT
+);
+INSERT INTO blockchain DEFAULT VALUES;
+
+
+CREATE TABLE token_network (
+    address                 CHAR(42) PRIMARY KEY
+);
+
+
+-- Decoded and confirmed contract events in the order of the chain
+CREATE TABLE event (
+    position                INTEGER PRIMARY KEY AUTOINCREMENT,
+    block_number            INT NOT NULL,
+    contract_address        CHAR(42) NOT NULL,
+    event_type              TEXT NOT NULL,
+    data                    JSON NOT NULL
+);
+CREATE INDEX event_block_number ON event(block_number);
+CREATE INDEX event_contract_address ON event(contract_address, block_number);
@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from typing import List
 
 from raiden.utils.typing import BlockNumber, ChainID
+from raiden_libs.constants import DEFAULT_FILTER_INTERVAL
 from raiden_libs.types import Address, TokenNetworkAddress
 
 
@@ -12,3 +13,5 @@ class BlockchainState:
     monitor_contract_address: Address
     latest_known_block: BlockNumber
     token_network_addresses: List[TokenNetworkAddress] = field(default_factory=list)
+    # Number of blocks queried at once, adjusted by `get_blockchain_events`
+    filter_interval: int = DEFAULT_FILTER_INTERVAL
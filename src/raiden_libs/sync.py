@@ -0,0 +1,227 @@
+""" Pipelined synchronization with the blockchain
+
+While a service handles the events of one block range, the `SyncPipeline`
+already fetches and decodes the events of the next ranges in a background
+thread. At most `prefetch_size` ranges are kept in a queue, so the fetching
+stops when the handling falls behind.
+
+The ranges are returned in order and are chosen like in the sequential sync
+loops. A range is ended early at a block boundary once it holds
+`max_events_per_range` events, which bounds the memory used by the queued
+ranges, see `read_block_range`. The pipeline doesn't touch the
+`latest_known_block` of the service, which is still set after the events of a
+range have been handled.
+"""
+import threading
+from copy import deepcopy
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from typing import Iterable, List, Optional, Type, Union
+
+import structlog
+from web3 import Web3
+
+from raiden.utils.typing import BlockNumber
+from raiden_contracts.contract_manager import ContractManager
+from raiden_libs.blockchain import stream_blockchain_events
+from raiden_libs.constants import (
+    DEFAULT_SYNC_PREFETCH_SIZE,
+    MAX_EVENTS_PER_FILTER,
+    MIN_FILTER_INTERVAL,
+)
+from raiden_libs.events import Event, ReceiveTokenNetworkCreatedEvent, UpdatedHeadBlockEvent
+from raiden_libs.new_heads import NewHeadsSubscription, get_head_block_number
+from raiden_libs.states import BlockchainState
+
+log = structlog.get_logger(__name__)
+
+
+@dataclass
+class BlockRange:
+    """ The events up to `last_block` and the chain state after handling them """
+
+    last_block: BlockNumber
+    chain_state: BlockchainState
+    events: List[Event]
+
+
+def read_block_range(
+    chain_state: BlockchainState,
+    new_chain_state: BlockchainState,
+    last_block: BlockNumber,
+    events: Iterable[Event],
+    max_events: int = MAX_EVENTS_PER_FILTER,
+) -> BlockRange:
+    """ Read the streamed events of a block range into memory
+
+    The range is ended early at a block boundary once it holds `max_events`
+    events, so the memory doesn't depend on the size of the range. The
+    remaining blocks are read again as part of the next range.
+
+    chain_state: The state before the range
+    new_chain_state: The state after the whole range, as returned with `events`
+    """
+    range_events: List[Event] = []
+    for event in events:
+        is_next_block = (
+            len(range_events) >= max_events
+            and not isinstance(event, UpdatedHeadBlockEvent)
+            and event.block_number > range_events[-1].block_number  # type: ignore
+        )
+        if is_next_block:
+            last_block = range_events[-1].block_number  # type: ignore
+            new_chain_state = _partial_chain_state(chain_state, range_events, last_block)
+            range_events.append(UpdatedHeadBlockEvent(head_block_number=last_block))
+            break
+        range_events.append(event)
+    return BlockRange(last_block=last_block, chain_state=new_chain_state, events=range_events)
+
+
+def _partial_chain_state(
+    chain_state: BlockchainState, events: List[Event], last_block: BlockNumber
+) -> BlockchainState:
+    """ Return the state after the `events` of a range ended at `last_block`
+
+    The state returned by the event query already contains the token
+    networks created after `last_block`, so it can't be used.
+    """
+    partial_chain_state = deepcopy(chain_state)
+    partial_chain_state.token_network_addresses.extend(
+        event.token_network_address
+        for event in events
+        if isinstance(event, ReceiveTokenNetworkCreatedEvent)
+    )
+    # Continue with the number of blocks which contained enough events
+    partial_chain_state.filter_interval = max(
+        MIN_FILTER_INTERVAL, last_block - chain_state.latest_known_block
+    )
+    return partial_chain_state
+
+
+class SyncPipeline:
+    def __init__(
+        self,
+        web3: Web3,
+        contract_manager: ContractManager,
+        chain_state: BlockchainState,
+        required_confirmations: int,
+        poll_interval: float,
+        prefetch_size: int = DEFAULT_SYNC_PREFETCH_SIZE,
+        query_ms: bool = True,
+        event_types: Optional[Iterable[Type[Event]]] = None,
+        new_heads: Optional[NewHeadsSubscription] = None,
+        max_events_per_range: int = MAX_EVENTS_PER_FILTER,
+    ):
+        """
+        chain_state: The state of the service, the first range starts after its
+            `latest_known_block`
+        prefetch_size: Maximum number of fetched ranges which have not been handled yet
+        new_heads: Fetch the next range when the node announces a new head,
+            instead of polling it every `poll_interval` seconds
+        max_events_per_range: Number of events after which a range is ended
+            at the next block
+        """
+        self.web3 = web3
+        self.contract_manager = contract_manager
+        self.chain_state = deepcopy(chain_state)
+        self.required_confirmations = required_confirmations
+        self.poll_interval = poll_interval
+        self.query_ms = query_ms
+        self.event_types = event_types
+        self.new_heads = new_heads
+        self.max_events_per_range = max_events_per_range
+        self.queue: Queue = Queue(maxsize=prefetch_size)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='SyncPipeline', daemon=True)
+
+    def __repr__(self) -> str:
+        return (
+            f'<SyncPipeline latest_fetched_block={self.chain_state.latest_known_block} '
+            f'prefetched={self.queue.qsize()}>'
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.thread.join()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[BlockRange]:
+        """ Return the next block range, or `None` if no new block is confirmed in time
+
+        Errors of the background thread are raised here, after the ranges
+        fetched before the error.
+        """
+        try:
+            item: Union[BlockRange, Exception] = self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _run(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                block_range = self._fetch_next_range()
+                if block_range is None:
+                    self._wait_for_new_blocks()
+                    continue
+                self._put(block_range)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error('Fetching block range failed', error=str(exc))
+            self._put(exc)
+
+    def _wait_for_new_blocks(self) -> None:
+        next_block = BlockNumber(
+            self.chain_state.latest_known_block + self.required_confirmations + 1
+        )
+        if self.new_heads is None or not self.new_heads.wait_for_block(
+            next_block, timeout=self.poll_interval
+        ):
+            self.stop_event.wait(self.poll_interval)
+
+    def _fetch_next_range(self) -> Optional[BlockRange]:
+        last_confirmed_block = (
+            get_head_block_number(self.web3, self.new_heads) - self.required_confirmations
+        )
+        # Limit the max number of blocks that is processed per iteration
+        last_block = BlockNumber(
+            min(
+                last_confirmed_block,
+                self.chain_state.latest_known_block + self.chain_state.filter_interval,
+            )
+        )
+        if last_block <= self.chain_state.latest_known_block:
+            return None
+
+        new_chain_state, events = stream_blockchain_events(
+            web3=self.web3,
+            contract_manager=self.contract_manager,
+            chain_state=self.chain_state,
+            to_block=last_block,
+            query_ms=self.query_ms,
+            event_types=self.event_types,
+        )
+        block_range = read_block_range(
+            chain_state=self.chain_state,
+            new_chain_state=new_chain_state,
+            last_block=last_block,
+            events=events,
+            max_events=self.max_events_per_range,
+        )
+
+        # The services modify their chain state, so continue with a copy
+        self.chain_state = deepcopy(block_range.chain_state)
+        self.chain_state.latest_known_block = block_range.last_block
+        return block_range
+
+    def _put(self, item: Union[BlockRange, Exception]) -> None:
+        """ Wait until there is space in the queue, unless the pipeline is stopped """
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=self.poll_interval)
+                return
+            except Full:
+                continue
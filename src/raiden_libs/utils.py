@@ -13,6 +13,16 @@ def is_channel_identifier(channel_identifier: ChannelID) -> bool:
     return 0 < channel_identifier <= UINT256_MAX
 
 
+def hex256(x: int) -> str:
+    """Hex encodes values up to 256 bits into a fixed length
+
+    By including this amount of leading zeros in the hex string, lexicographic
+    and numeric ordering are identical. This facilitates working with these
+    numbers in the database without native uint256 support.
+    """
+    return '0x{:064x}'.format(x)
+
+
 def public_key_to_address(public_key: Union[PublicKey, bytes]) -> Address:
     """ Converts a public key to an Ethereum address. """
     if isinstance(public_key, PublicKey):
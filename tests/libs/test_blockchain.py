@@ -1,10 +1,36 @@
+import time
+from typing import Dict
+from unittest.mock import Mock
+
+import pytest
+from eth_abi import encode_abi, encode_single
+from eth_utils import encode_hex, to_checksum_address
+from eth_utils.abi import event_abi_to_log_topic
 from web3 import Web3
 
-from raiden.utils.typing import BlockNumber
-from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, EVENT_TOKEN_NETWORK_CREATED
+from raiden.utils.typing import BlockNumber, ChainID
+from raiden_contracts.constants import (
+    CONTRACT_TOKEN_NETWORK,
+    CONTRACT_TOKEN_NETWORK_REGISTRY,
+    EVENT_TOKEN_NETWORK_CREATED,
+    ChannelEvent,
+)
 from raiden_contracts.contract_manager import ContractManager
-from raiden_libs.blockchain import query_blockchain_events
-from raiden_libs.types import Address
+from raiden_libs.blockchain import (
+    MAX_ADDRESSES_PER_FILTER,
+    decode_event,
+    decode_events,
+    get_blockchain_events,
+    get_event_decoders,
+    parse_token_network_event,
+    query_blockchain_events,
+    query_contracts_logs,
+    stream_blockchain_events,
+)
+from raiden_libs.constants import MAX_EVENTS_PER_FILTER
+from raiden_libs.events import ReceiveChannelNewDepositEvent, ReceiveChannelOpenedEvent
+from raiden_libs.states import BlockchainState
+from raiden_libs.types import Address, TokenNetworkAddress
 
 
 def create_tnr_contract_events_query(
@@ -100,3 +126,302 @@ def test_limit_inclusivity_in_query_blockchain_events(
         to_block=registry_event_block,
     )
     assert len(events) == 1
+
+
+def test_get_blockchain_events_queries_contracts_together(contracts_manager):
+    web3 = Mock()
+    web3.eth.getLogs.return_value = []
+    token_network_addresses = [
+        TokenNetworkAddress(to_checksum_address('0x{:040x}'.format(i)))
+        for i in range(1, MAX_ADDRESSES_PER_FILTER + 10)
+    ]
+    monitor_contract_address = Address('0x' + '2' * 40)
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=Address('0x' + '1' * 40),
+        monitor_contract_address=monitor_contract_address,
+        latest_known_block=BlockNumber(0),
+        token_network_addresses=token_network_addresses,
+    )
+
+    get_blockchain_events(web3, contracts_manager, chain_state, to_block=BlockNumber(10))
+
+    # one query for the registry, the other contracts are split into two filters
+    assert web3.eth.getLogs.call_count == 3
+    filter_addresses = [call[0][0]['address'] for call in web3.eth.getLogs.call_args_list[1:]]
+    assert filter_addresses == [
+        token_network_addresses[:MAX_ADDRESSES_PER_FILTER],
+        token_network_addresses[MAX_ADDRESSES_PER_FILTER:] + [monitor_contract_address],
+    ]
+
+
+def test_get_blockchain_events_filters_event_types(contracts_manager):
+    web3 = Mock()
+    web3.eth.getLogs.return_value = []
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=Address('0x' + '1' * 40),
+        monitor_contract_address=Address('0x' + '2' * 40),
+        latest_known_block=BlockNumber(0),
+        token_network_addresses=[TokenNetworkAddress('0x' + '3' * 40)],
+    )
+
+    def event_topic(event_name: str) -> str:
+        event_abi = contracts_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, event_name)
+        return encode_hex(event_abi_to_log_topic(event_abi))
+
+    get_blockchain_events(
+        web3,
+        contracts_manager,
+        chain_state,
+        to_block=BlockNumber(10),
+        query_ms=False,
+        event_types=[ReceiveChannelOpenedEvent, ReceiveChannelNewDepositEvent, Mock],
+    )
+    topics = web3.eth.getLogs.call_args[0][0]['topics']
+    assert topics == [
+        sorted([event_topic(ChannelEvent.OPENED), event_topic(ChannelEvent.DEPOSIT)])
+    ]
+
+    # without event types, all events are requested
+    get_blockchain_events(web3, contracts_manager, chain_state, to_block=BlockNumber(10))
+    assert web3.eth.getLogs.call_args[0][0]['topics'] == [None]
+
+
+def test_query_contracts_logs_adapts_filter_interval(contracts_manager):
+    contract_address = Address('0x' + '1' * 40)
+    # busy blocks with many events, followed by blocks without events
+    busy_blocks = 2 * MAX_EVENTS_PER_FILTER
+    max_events_answered = 3 * MAX_EVENTS_PER_FILTER // 2
+
+    def get_logs(filter_params):
+        from_block, to_block = filter_params['fromBlock'], filter_params['toBlock']
+        num_events = max(0, min(to_block + 1, busy_blocks) - from_block)
+        if num_events > max_events_answered:
+            raise ValueError('query returned too many results')
+        return [
+            dict(address=contract_address, blockNumber=block_number)
+            for block_number in range(from_block, from_block + num_events)
+        ]
+
+    web3 = Mock()
+    web3.eth.getLogs.side_effect = get_logs
+
+    def query(from_block: int, to_block: int, filter_interval: int):
+        return query_contracts_logs(
+            web3=web3,
+            addresses=[contract_address],
+            topics=[None],
+            from_block=BlockNumber(from_block),
+            to_block=BlockNumber(to_block),
+            filter_interval=filter_interval,
+        )
+
+    # failing ranges are split, all events are returned once and in order
+    events, filter_interval = query(0, busy_blocks - 1, busy_blocks)
+    assert [event['blockNumber'] for event in events[contract_address]] == list(range(busy_blocks))
+    assert filter_interval <= MAX_EVENTS_PER_FILTER
+
+    # ranges with few events are grown
+    num_calls = web3.eth.getLogs.call_count
+    events, new_filter_interval = query(busy_blocks, busy_blocks + 100_000, filter_interval)
+    assert events[contract_address] == []
+    assert new_filter_interval > filter_interval
+    assert web3.eth.getLogs.call_count - num_calls < 100_000 // filter_interval
+
+    # the interval is remembered in the chain state
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=Address('0x' + '2' * 40),
+        monitor_contract_address=Address('0x' + '3' * 40),
+        latest_known_block=BlockNumber(busy_blocks - 1),
+        token_network_addresses=[TokenNetworkAddress(contract_address)],
+        filter_interval=1000,
+    )
+    new_chain_state, _ = get_blockchain_events(
+        web3,
+        contracts_manager,
+        chain_state,
+        to_block=BlockNumber(busy_blocks + 999),
+        query_ms=False,
+    )
+    assert new_chain_state.filter_interval == 2000
+
+    # single blocks which can't be queried raise the error
+    web3.eth.getLogs.side_effect = ValueError('node failure')
+    with pytest.raises(ValueError):
+        query(0, 10, 4)
+
+
+def encode_log(
+    event_abi: Dict,
+    args: Dict,
+    block_number: int,
+    address: str = '0x' + '1' * 40,
+    log_index: int = 0,
+) -> Dict:
+    """ Create a raw log like returned by `eth_getLogs` """
+    topic_inputs = [abi_input for abi_input in event_abi['inputs'] if abi_input['indexed']]
+    data_inputs = [abi_input for abi_input in event_abi['inputs'] if not abi_input['indexed']]
+    return dict(
+        address=address,
+        blockHash=b'\x01' * 32,
+        blockNumber=block_number,
+        logIndex=log_index,
+        transactionHash=b'\x02' * 32,
+        transactionIndex=0,
+        topics=[event_abi_to_log_topic(event_abi)]
+        + [
+            encode_single(abi_input['type'], args[abi_input['name']]) for abi_input in topic_inputs
+        ],
+        data=encode_hex(
+            encode_abi(
+                [abi_input['type'] for abi_input in data_inputs],
+                [args[abi_input['name']] for abi_input in data_inputs],
+            )
+        ),
+    )
+
+
+def test_event_decoders_benchmark(contracts_manager):
+    """ Compare the prepared event decoders with `decode_event` """
+    token_network_abi = contracts_manager.get_contract_abi(CONTRACT_TOKEN_NETWORK)
+    opened_abi = contracts_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.OPENED)
+    deposit_abi = contracts_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.DEPOSIT)
+    participant1 = to_checksum_address('0x' + 'a' * 40)
+    participant2 = to_checksum_address('0x' + 'b' * 40)
+    logs = []
+    for channel_id in range(1, 2001):
+        opened_args = dict(
+            channel_identifier=channel_id,
+            participant1=participant1,
+            participant2=participant2,
+            settle_timeout=500,
+        )
+        deposit_args = dict(
+            channel_identifier=channel_id, participant=participant2, total_deposit=channel_id
+        )
+        logs.append(encode_log(opened_abi, opened_args, block_number=channel_id))
+        logs.append(encode_log(deposit_abi, deposit_args, block_number=channel_id))
+
+    decoders = get_event_decoders(contracts_manager, CONTRACT_TOKEN_NETWORK)
+    assert get_event_decoders(contracts_manager, CONTRACT_TOKEN_NETWORK) is decoders
+    start = time.time()
+    expected = [decode_event(token_network_abi, dict(log_)) for log_ in logs]
+    decode_event_runtime = time.time() - start
+    start = time.time()
+    decoded = [decoders[log_['topics'][0]].decode(log_) for log_ in logs]
+    decoders_runtime = time.time() - start
+    assert decoded == expected
+
+    start = time.time()
+    events = decode_events(logs, decoders, parse_token_network_event)
+    events_runtime = time.time() - start
+    assert events[:2] == [
+        ReceiveChannelOpenedEvent(
+            token_network_address='0x' + '1' * 40,
+            channel_identifier=1,
+            participant1=participant1,
+            participant2=participant2,
+            settle_timeout=500,
+            block_number=1,
+        ),
+        ReceiveChannelNewDepositEvent(
+            token_network_address='0x' + '1' * 40,
+            channel_identifier=1,
+            participant_address=participant2,
+            total_deposit=1,
+            block_number=1,
+        ),
+    ]
+    assert len(events) == len(logs)
+
+    print('decode_event: ', len(logs) / decode_event_runtime, 'events/s')
+    print('Event decoders: ', len(logs) / decoders_runtime, 'events/s')
+    print('Decoded into events: ', len(logs) / events_runtime, 'events/s')
+
+
+def test_stream_blockchain_events(contracts_manager):
+    registry_address = to_checksum_address('0x' + 'f' * 40)
+    old_network = to_checksum_address('0x' + '1' * 40)
+    new_network = to_checksum_address('0x' + '2' * 40)
+    participant = to_checksum_address('0x' + 'a' * 40)
+    created_abi = contracts_manager.get_event_abi(
+        CONTRACT_TOKEN_NETWORK_REGISTRY, EVENT_TOKEN_NETWORK_CREATED
+    )
+    opened_abi = contracts_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.OPENED)
+    deposit_abi = contracts_manager.get_event_abi(CONTRACT_TOKEN_NETWORK, ChannelEvent.DEPOSIT)
+
+    def opened_log(address: str, block_number: int, log_index: int) -> Dict:
+        args = dict(
+            channel_identifier=block_number,
+            participant1=participant,
+            participant2=participant,
+            settle_timeout=500,
+        )
+        return encode_log(opened_abi, args, block_number, address, log_index)
+
+    def deposit_log(address: str, block_number: int, log_index: int) -> Dict:
+        args = dict(channel_identifier=1, participant=participant, total_deposit=10)
+        return encode_log(deposit_abi, args, block_number, address, log_index)
+
+    created_args = dict(token_address=participant, token_network_address=new_network)
+    chain_logs = [
+        opened_log(old_network, block_number=3, log_index=0),
+        encode_log(created_abi, created_args, 5, registry_address, log_index=0),
+        opened_log(new_network, block_number=5, log_index=1),
+        deposit_log(old_network, block_number=5, log_index=2),
+        deposit_log(new_network, block_number=8, log_index=0),
+    ]
+
+    def get_logs(filter_params):
+        return [
+            log_
+            for log_ in chain_logs
+            if filter_params['fromBlock'] <= log_['blockNumber'] <= filter_params['toBlock']
+            and log_['address'] in filter_params['address']
+        ]
+
+    web3 = Mock()
+    web3.eth.getLogs.side_effect = get_logs
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=registry_address,
+        monitor_contract_address=Address('0x' + '3' * 40),
+        latest_known_block=BlockNumber(0),
+        token_network_addresses=[TokenNetworkAddress(old_network)],
+        filter_interval=2,
+    )
+    new_chain_state, events = stream_blockchain_events(
+        web3, contracts_manager, chain_state, to_block=BlockNumber(10), query_ms=False
+    )
+    # new token networks are known before the events are consumed
+    assert new_chain_state.token_network_addresses == [old_network, new_network]
+    assert web3.eth.getLogs.call_count == 1
+
+    # the logs are only requested while iterating
+    first_event = next(events)
+    assert first_event == ReceiveChannelOpenedEvent(
+        token_network_address=old_network,
+        channel_identifier=3,
+        participant1=participant,
+        participant2=participant,
+        settle_timeout=500,
+        block_number=3,
+    )
+    assert web3.eth.getLogs.call_count == 3
+
+    # all events are in the order of the chain
+    events_order = [
+        (type(event).__name__, getattr(event, 'token_network_address', None))
+        for event in [first_event] + list(events)
+    ]
+    assert events_order == [
+        ('ReceiveChannelOpenedEvent', old_network),
+        ('ReceiveTokenNetworkCreatedEvent', new_network),
+        ('ReceiveChannelOpenedEvent', new_network),
+        ('ReceiveChannelNewDepositEvent', old_network),
+        ('ReceiveChannelNewDepositEvent', new_network),
+        ('UpdatedHeadBlockEvent', None),
+    ]
+    assert new_chain_state.filter_interval > 2
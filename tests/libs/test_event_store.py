@@ -0,0 +1,141 @@
+from copy import deepcopy
+from typing import List
+from unittest.mock import Mock
+
+import pytest
+
+from raiden.utils.typing import BlockNumber, ChainID, ChannelID, Nonce, TokenAmount
+from raiden_contracts.constants import CONTRACT_MONITORING_SERVICE, CONTRACT_TOKEN_NETWORK_REGISTRY
+from raiden_libs.constants import DEFAULT_INDEXER_CONFIRMATIONS
+from raiden_libs.event_store import EventStore, InvalidEventStore
+from raiden_libs.events import (
+    Event,
+    ReceiveChannelNewDepositEvent,
+    ReceiveChannelOpenedEvent,
+    ReceiveMonitoringNewBalanceProofEvent,
+    ReceiveTokenNetworkCreatedEvent,
+    UpdatedHeadBlockEvent,
+)
+from raiden_libs.indexer import ChainIndexer
+from raiden_libs.states import BlockchainState
+from raiden_libs.types import Address, TokenNetworkAddress
+
+REGISTRY_ADDRESS = Address('0x' + '1' * 40)
+MONITOR_CONTRACT_ADDRESS = Address('0x' + '2' * 40)
+TOKEN_NETWORK_ADDRESS = TokenNetworkAddress('0x' + '3' * 40)
+PARTICIPANT = Address('0x' + '4' * 40)
+
+CHAIN_EVENTS: List[Event] = [
+    ReceiveTokenNetworkCreatedEvent(
+        token_address=Address('0x' + '5' * 40),
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        block_number=BlockNumber(5),
+    ),
+    ReceiveChannelOpenedEvent(
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(1),
+        participant1=PARTICIPANT,
+        participant2=PARTICIPANT,
+        settle_timeout=500,
+        block_number=BlockNumber(6),
+    ),
+    ReceiveMonitoringNewBalanceProofEvent(
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(1),
+        reward_amount=TokenAmount(2 ** 200),
+        nonce=Nonce(3),
+        ms_address=PARTICIPANT,
+        raiden_node_address=PARTICIPANT,
+        block_number=BlockNumber(12),
+    ),
+    ReceiveChannelNewDepositEvent(
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(1),
+        participant_address=PARTICIPANT,
+        total_deposit=TokenAmount(10),
+        block_number=BlockNumber(15),
+    ),
+]
+
+
+def stream_blockchain_events(web3, contract_manager, chain_state, to_block):
+    """ Return the events of `CHAIN_EVENTS` like they are read from the node """
+    from_block = chain_state.latest_known_block + 1
+    events = [event for event in CHAIN_EVENTS if from_block <= event.block_number <= to_block] + [
+        UpdatedHeadBlockEvent(head_block_number=to_block)
+    ]
+    new_chain_state = deepcopy(chain_state)
+    for event in events:
+        if isinstance(event, ReceiveTokenNetworkCreatedEvent):
+            new_chain_state.token_network_addresses.append(event.token_network_address)
+    return new_chain_state, iter(events)
+
+
+def create_indexer(db_filename: str) -> ChainIndexer:
+    web3 = Mock()
+    web3.net.version = '1'
+    return ChainIndexer(
+        web3=web3,
+        contracts={
+            CONTRACT_TOKEN_NETWORK_REGISTRY: Mock(address=REGISTRY_ADDRESS),
+            CONTRACT_MONITORING_SERVICE: Mock(address=MONITOR_CONTRACT_ADDRESS),
+        },
+        db_filename=db_filename,
+        sync_start_block=BlockNumber(0),
+    )
+
+
+def test_services_read_indexed_events(tmp_path, monkeypatch):
+    monkeypatch.setattr('raiden_libs.indexer.stream_blockchain_events', stream_blockchain_events)
+    db_filename = str(tmp_path / 'events.db')
+    indexer = create_indexer(db_filename)
+    indexer._process_new_blocks(BlockNumber(10))
+    indexer._process_new_blocks(BlockNumber(20))
+
+    # the indexer resumes from the stored state
+    indexer = create_indexer(db_filename)
+    assert indexer.chain_state.latest_known_block == 20
+    assert indexer.chain_state.token_network_addresses == [TOKEN_NETWORK_ADDRESS]
+
+    store = EventStore(db_filename)
+    assert store.get_confirmed_block() == 20
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=REGISTRY_ADDRESS,
+        monitor_contract_address=MONITOR_CONTRACT_ADDRESS,
+        latest_known_block=BlockNumber(0),
+    )
+
+    # new token networks are always returned
+    new_chain_state, events = store.stream_blockchain_events(
+        chain_state, to_block=BlockNumber(10), event_types=[ReceiveChannelNewDepositEvent]
+    )
+    assert new_chain_state.token_network_addresses == [TOKEN_NETWORK_ADDRESS]
+    assert list(events) == [CHAIN_EVENTS[0], UpdatedHeadBlockEvent(BlockNumber(10))]
+
+    new_chain_state.latest_known_block = BlockNumber(10)
+    _, events = store.stream_blockchain_events(new_chain_state, to_block=BlockNumber(20))
+    assert list(events) == CHAIN_EVENTS[2:] + [UpdatedHeadBlockEvent(BlockNumber(20))]
+    _, events = store.stream_blockchain_events(
+        new_chain_state, to_block=BlockNumber(20), query_ms=False
+    )
+    assert list(events) == CHAIN_EVENTS[3:] + [UpdatedHeadBlockEvent(BlockNumber(20))]
+
+    # blocks which haven't been indexed can't be read
+    with pytest.raises(InvalidEventStore):
+        store.stream_blockchain_events(new_chain_state, to_block=BlockNumber(21))
+    new_chain_state.chain_id = ChainID(2)
+    with pytest.raises(InvalidEventStore):
+        store.stream_blockchain_events(new_chain_state, to_block=BlockNumber(20))
+
+
+def test_event_store_checks_required_confirmations(tmp_path):
+    db_filename = str(tmp_path / 'events.db')
+    indexer = create_indexer(db_filename)
+    assert indexer.store.get_required_confirmations() == DEFAULT_INDEXER_CONFIRMATIONS
+
+    store = EventStore(db_filename)
+    store.check_required_confirmations(DEFAULT_INDEXER_CONFIRMATIONS)
+    store.check_required_confirmations(DEFAULT_INDEXER_CONFIRMATIONS + 1)
+    with pytest.raises(InvalidEventStore):
+        store.check_required_confirmations(DEFAULT_INDEXER_CONFIRMATIONS - 1)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Iterator, List
+from unittest.mock import Mock
+
+import pytest
+import websockets
+
+from raiden.utils.typing import BlockNumber
+from raiden_libs.new_heads import NewHeadsSubscription, get_head_block_number
+
+
+class StandInNode:
+    """ Websocket server which answers like an Ethereum node with `newHeads` support """
+
+    def __init__(self, block_number: int):
+        self.block_number = block_number
+        self.connections: List[websockets.WebSocketServerProtocol] = []
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(self._serve())
+        self.uri = 'ws://127.0.0.1:{}'.format(self.server.sockets[0].getsockname()[1])
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def _serve(self) -> websockets.WebSocketServer:
+        return await websockets.serve(self._handle, '127.0.0.1', 0)
+
+    async def _handle(self, websocket, _path):
+        self.connections.append(websocket)
+        while True:
+            try:
+                request = json.loads(await websocket.recv())
+            except websockets.ConnectionClosed:
+                return
+            result = '0x1' if request['method'] == 'eth_subscribe' else hex(self.block_number)
+            await websocket.send(json.dumps(dict(jsonrpc='2.0', id=request['id'], result=result)))
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=1)
+
+    def announce_block(self, block_number: int) -> None:
+        self.block_number = block_number
+        notification = dict(
+            jsonrpc='2.0',
+            method='eth_subscription',
+            params=dict(subscription='0x1', result=dict(number=hex(block_number))),
+        )
+        self._run(self.connections[-1].send(json.dumps(notification)))
+
+    def drop_connections(self) -> None:
+        for websocket in self.connections:
+            self._run(websocket.close())
+
+    def stop(self) -> None:
+        self.server.close()
+        self._run(self.server.wait_closed())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def wait_for_head(new_heads: NewHeadsSubscription, block_number: int) -> None:
+    """ Wait until the subscription has been (re-)established """
+    for _ in range(100):
+        if new_heads.head_block_number == block_number:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f'Head {block_number} not announced')
+
+
+@pytest.fixture
+def node() -> Iterator[StandInNode]:
+    node = StandInNode(block_number=10)
+    yield node
+    node.stop()
+
+
+def test_new_heads_subscription(node: StandInNode):
+    web3 = Mock()
+    web3.eth.blockNumber = 5
+    new_heads = NewHeadsSubscription(node.uri, reconnect_interval=0.1)
+
+    # polling is used until the subscription is established
+    assert get_head_block_number(web3, new_heads) == 5
+    assert not new_heads.wait_for_block(BlockNumber(11), timeout=0)
+
+    new_heads.start()
+    # the current head is known right after subscribing
+    wait_for_head(new_heads, 10)
+    assert new_heads.wait_for_block(BlockNumber(10), timeout=0)
+    assert get_head_block_number(web3, new_heads) == 10
+
+    # waiting ends when the block is announced
+    waiter = threading.Thread(target=new_heads.wait_for_block, args=(BlockNumber(12), 5))
+    waiter.start()
+    node.announce_block(11)
+    node.announce_block(12)
+    waiter.join(timeout=1)
+    assert not waiter.is_alive()
+    assert get_head_block_number(web3, new_heads) == 12
+
+    # waiting ends after the timeout, the subscription is still up
+    assert new_heads.wait_for_block(BlockNumber(13), timeout=0.05)
+    assert new_heads.head_block_number == 12
+
+    # fall back to polling while the connection is down
+    node.drop_connections()
+    assert not new_heads.wait_for_block(BlockNumber(13), timeout=1)
+    assert get_head_block_number(web3, new_heads) == 5
+
+    # the subscription is restored
+    node.block_number = 20
+    wait_for_head(new_heads, 20)
+    assert get_head_block_number(web3, new_heads) == 20
+
+    new_heads.stop()
+    assert new_heads.head_block_number is None
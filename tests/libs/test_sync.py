@@ -0,0 +1,209 @@
+import time
+from copy import deepcopy
+from typing import Iterator, List, Tuple
+from unittest.mock import Mock
+
+import pytest
+
+from raiden.utils.typing import BlockNumber, ChainID, ChannelID
+from raiden_libs.events import (
+    Event,
+    ReceiveChannelClosedEvent,
+    ReceiveTokenNetworkCreatedEvent,
+    UpdatedHeadBlockEvent,
+)
+from raiden_libs.states import BlockchainState
+from raiden_libs.sync import SyncPipeline, read_block_range
+from raiden_libs.types import Address, TokenNetworkAddress
+
+
+@pytest.fixture
+def queried_ranges(monkeypatch) -> List[Tuple[int, int, int]]:
+    """ Replace the event queries, every range finds a new token network """
+    ranges = []
+
+    def stream_blockchain_events(
+        web3, contract_manager, chain_state, to_block, query_ms, event_types
+    ) -> Tuple[BlockchainState, Iterator[Event]]:
+        if to_block > 60:
+            raise ValueError('node failure')
+        from_block = chain_state.latest_known_block + 1
+        ranges.append((from_block, to_block, len(chain_state.token_network_addresses)))
+        new_chain_state = deepcopy(chain_state)
+        new_chain_state.token_network_addresses.append(
+            TokenNetworkAddress('0x{:040x}'.format(to_block))
+        )
+        return new_chain_state, iter([UpdatedHeadBlockEvent(head_block_number=to_block)])
+
+    monkeypatch.setattr('raiden_libs.sync.stream_blockchain_events', stream_blockchain_events)
+    return ranges
+
+
+def test_sync_pipeline(queried_ranges: List[Tuple[int, int, int]]):
+    web3 = Mock()
+    web3.eth.blockNumber = 55
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=Address('0x' + '1' * 40),
+        monitor_contract_address=Address('0x' + '2' * 40),
+        latest_known_block=BlockNumber(0),
+        filter_interval=10,
+    )
+    pipeline = SyncPipeline(
+        web3=web3,
+        contract_manager=Mock(),
+        chain_state=chain_state,
+        required_confirmations=5,
+        poll_interval=0.01,
+        prefetch_size=2,
+    )
+    pipeline.start()
+
+    # only `prefetch_size` ranges are fetched ahead, one more waits for space in the queue
+    time.sleep(0.1)
+    assert len(queried_ranges) == 3
+
+    # ranges are returned in order, with the chain state after the range
+    block_ranges = [pipeline.get(timeout=1) for _ in range(5)]
+    assert [block_range.last_block for block_range in block_ranges] == [10, 20, 30, 40, 50]
+    assert [block_range.events for block_range in block_ranges] == [
+        [UpdatedHeadBlockEvent(head_block_number=BlockNumber(block))]
+        for block in (10, 20, 30, 40, 50)
+    ]
+    assert queried_ranges == [(1, 10, 0), (11, 20, 1), (21, 30, 2), (31, 40, 3), (41, 50, 4)]
+    for block_range in block_ranges:
+        assert block_range.chain_state.latest_known_block == block_range.last_block - 10
+        # modifying the returned state doesn't affect the next ranges
+        block_range.chain_state.token_network_addresses.clear()
+    assert chain_state.token_network_addresses == []
+
+    # no new confirmed blocks
+    assert pipeline.get(timeout=0.05) is None
+
+    # errors are raised after the fetched ranges
+    web3.eth.blockNumber = 100
+    assert pipeline.get(timeout=1).last_block == 60
+    assert queried_ranges[-1] == (51, 60, 5)
+    with pytest.raises(ValueError):
+        pipeline.get(timeout=1)
+    pipeline.stop()
+
+
+def test_sync_pipeline_limits_events_per_range(monkeypatch):
+    """ Ranges with many events are ended at the next block """
+    created_token_networks = {
+        5: TokenNetworkAddress('0x' + '3' * 40),
+        10: TokenNetworkAddress('0x' + '4' * 40),
+    }
+
+    def stream_blockchain_events(
+        web3, contract_manager, chain_state, to_block, query_ms, event_types
+    ) -> Tuple[BlockchainState, Iterator[Event]]:
+        new_chain_state = deepcopy(chain_state)
+        events: List[Event] = []
+        for block in range(chain_state.latest_known_block + 1, to_block + 1):
+            if block in created_token_networks:
+                new_chain_state.token_network_addresses.append(created_token_networks[block])
+                events.append(
+                    ReceiveTokenNetworkCreatedEvent(
+                        token_address=Address('0x' + '5' * 40),
+                        token_network_address=created_token_networks[block],
+                        block_number=BlockNumber(block),
+                    )
+                )
+            # two events in each block, starting at block 3
+            events.extend(
+                ReceiveChannelClosedEvent(
+                    token_network_address=TokenNetworkAddress('0x' + '6' * 40),
+                    channel_identifier=ChannelID(block),
+                    closing_participant=Address('0x' + '7' * 40),
+                    block_number=BlockNumber(block),
+                )
+                for _ in range(2 if block >= 3 else 0)
+            )
+        events.append(UpdatedHeadBlockEvent(head_block_number=to_block))
+        return new_chain_state, iter(events)
+
+    monkeypatch.setattr('raiden_libs.sync.stream_blockchain_events', stream_blockchain_events)
+    web3 = Mock()
+    web3.eth.blockNumber = 25
+    pipeline = SyncPipeline(
+        web3=web3,
+        contract_manager=Mock(),
+        chain_state=BlockchainState(
+            chain_id=ChainID(1),
+            token_network_registry_address=Address('0x' + '1' * 40),
+            monitor_contract_address=Address('0x' + '2' * 40),
+            latest_known_block=BlockNumber(0),
+            filter_interval=20,
+        ),
+        required_confirmations=5,
+        poll_interval=0.01,
+        prefetch_size=1,
+        max_events_per_range=5,
+    )
+    pipeline.start()
+
+    # the events of the last block are not split
+    block_range = pipeline.get(timeout=1)
+    assert block_range.last_block == 5
+    assert len(block_range.events) == 8
+    assert block_range.events[-1] == UpdatedHeadBlockEvent(head_block_number=BlockNumber(5))
+    assert block_range.chain_state.token_network_addresses == [created_token_networks[5]]
+
+    # the next range starts after the last block with the reduced block range,
+    # token networks created after its last block are not included
+    block_range = pipeline.get(timeout=1)
+    assert block_range.last_block == 8
+    assert block_range.chain_state.filter_interval == 3
+    assert block_range.chain_state.token_network_addresses == [created_token_networks[5]]
+
+    block_range = pipeline.get(timeout=1)
+    assert block_range.last_block == 10
+    assert block_range.chain_state.token_network_addresses == list(created_token_networks.values())
+    pipeline.stop()
+
+
+def test_read_block_range_stops_reading_events():
+    """ Only the events of the returned range are read from the stream """
+    chain_state = BlockchainState(
+        chain_id=ChainID(1),
+        token_network_registry_address=Address('0x' + '1' * 40),
+        monitor_contract_address=Address('0x' + '2' * 40),
+        latest_known_block=BlockNumber(0),
+    )
+    num_read_events = 0
+
+    def iter_events() -> Iterator[Event]:
+        nonlocal num_read_events
+        for block in range(1, 1_000_001):
+            num_read_events += 1
+            yield ReceiveChannelClosedEvent(
+                token_network_address=TokenNetworkAddress('0x' + '6' * 40),
+                channel_identifier=ChannelID(block),
+                closing_participant=Address('0x' + '7' * 40),
+                block_number=BlockNumber(block),
+            )
+        yield UpdatedHeadBlockEvent(head_block_number=BlockNumber(1_000_000))
+
+    block_range = read_block_range(
+        chain_state=chain_state,
+        new_chain_state=deepcopy(chain_state),
+        last_block=BlockNumber(1_000_000),
+        events=iter_events(),
+        max_events=10,
+    )
+    assert block_range.last_block == 10
+    assert block_range.events[-1] == UpdatedHeadBlockEvent(head_block_number=BlockNumber(10))
+    assert num_read_events == 11
+
+    # small ranges are returned completely
+    block_range = read_block_range(
+        chain_state=chain_state,
+        new_chain_state=chain_state,
+        last_block=BlockNumber(20),
+        events=iter([UpdatedHeadBlockEvent(head_block_number=BlockNumber(20))]),
+        max_events=10,
+    )
+    assert block_range.last_block == 20
+    assert block_range.chain_state is chain_state
@@ -1,7 +1,21 @@
-from monitoring_service.events import ActionMonitoringTriggeredEvent, ScheduledEvent
+import pytest
+
+from monitoring_service.database import Database
+from monitoring_service.events import (
+    ActionClaimRewardTriggeredEvent,
+    ActionMonitoringTriggeredEvent,
+    ScheduledEvent,
+)
 from raiden.utils.typing import BlockNumber, ChannelID
 from raiden_libs.types import Address, TokenNetworkAddress
 
+DB_SETTINGS = dict(
+    chain_id=1,
+    msc_address=Address('0x' + '2' * 40),
+    registry_address=Address('0x' + '3' * 40),
+    receiver=Address('0x' + '4' * 40),
+)
+
 
 def test_scheduled_events(ms_database):
     # Add token network used as foreign key
@@ -49,6 +63,160 @@ def test_scheduled_events(ms_database):
     assert len(ms_database.get_scheduled_events(24)) == 1
 
 
+def test_scheduled_events_order(ms_database):
+    ms_database.conn.execute("INSERT INTO token_network(address) VALUES (?)", ['a'])
+    # `hex` would sort 0xf after 0x10
+    for trigger_block_number in [0x10, 0xF, 0x100]:
+        ms_database.upsert_scheduled_event(
+            ScheduledEvent(
+                trigger_block_number=BlockNumber(trigger_block_number),
+                event=ActionMonitoringTriggeredEvent(
+                    token_network_address=TokenNetworkAddress('a'),
+                    channel_identifier=ChannelID(1),
+                    non_closing_participant=Address('b'),
+                ),
+            )
+        )
+
+    assert [e.trigger_block_number for e in ms_database.get_scheduled_events(0x10)] == [0xF, 0x10]
+    assert len(ms_database.get_scheduled_events(0x100)) == 3
+
+    # due events are found with an index range scan
+    query_plan = ms_database.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM scheduled_events WHERE trigger_block_number <= ?",
+        ['0x0'],
+    ).fetchall()
+    assert query_plan[0]['detail'].startswith('SEARCH')
+
+
+def test_migrate_hex_encoding(tmp_path):
+    filename = str(tmp_path / 'ms.db')
+    Database(filename, **DB_SETTINGS)
+
+    # write data like older versions did
+    db = Database(filename, **DB_SETTINGS)
+    db.conn.execute("PRAGMA user_version = 0")
+    db.conn.execute("INSERT INTO token_network(address) VALUES (?)", ['a'])
+    for trigger_block_number in [0x10, 0xF]:
+        db.conn.execute(
+            "INSERT INTO scheduled_events VALUES (?, 0, 'a', ?, 'b')",
+            [hex(trigger_block_number), hex(1)],
+        )
+    db.conn.execute(
+        "INSERT INTO channel VALUES ('a', ?, 'b', 'c', ?, 1, NULL, NULL, NULL, NULL, NULL, NULL)",
+        [hex(1), hex(500)],
+    )
+    db.conn.close()
+
+    db = Database(filename, **DB_SETTINGS)
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    assert [e.trigger_block_number for e in db.get_scheduled_events(BlockNumber(0x10))] == [
+        0xF,
+        0x10,
+    ]
+    channel = db.get_channel('a', ChannelID(1))
+    assert channel is not None
+    assert channel.settle_timeout == 500
+    assert channel.closing_block is None
+
+
+def test_next_scheduled_event(tmp_path):
+    filename = str(tmp_path / 'ms.db')
+    db = Database(filename, **DB_SETTINGS)
+    db.conn.execute("INSERT INTO token_network(address) VALUES (?)", ['a'])
+    events = [
+        ScheduledEvent(
+            trigger_block_number=BlockNumber(trigger_block_number),
+            event=ActionMonitoringTriggeredEvent(
+                token_network_address=TokenNetworkAddress('a'),
+                channel_identifier=ChannelID(channel_identifier),
+                non_closing_participant=Address('b'),
+            ),
+        )
+        for trigger_block_number, channel_identifier in [(30, 1), (10, 2), (20, 3)]
+    ]
+    for event in events + events[:1]:
+        db.upsert_scheduled_event(event)
+    assert db.scheduled_event_count() == 3
+    assert db.next_scheduled_event(BlockNumber(9)) is None
+    assert db.next_scheduled_event(BlockNumber(10)) == events[1]
+
+    db.remove_scheduled_event(events[1])
+    assert db.scheduled_event_count() == 2
+    assert db.next_scheduled_event(BlockNumber(19)) is None
+    assert db.next_scheduled_event(BlockNumber(30)) == events[2]
+
+    # the scheduled events are loaded from the db
+    db = Database(filename, **DB_SETTINGS)
+    assert db.scheduled_event_count() == 2
+    assert db.next_scheduled_event(BlockNumber(30)) == events[2]
+    db.remove_scheduled_event(events[2])
+    assert db.next_scheduled_event(BlockNumber(30)) == events[0]
+    db.remove_scheduled_event(events[0])
+    assert db.next_scheduled_event(BlockNumber(30)) is None
+    assert db.get_scheduled_events(BlockNumber(30)) == []
+
+
+def test_remove_scheduled_event_of_type(tmp_path):
+    """ Events of other types for the same channel and block stay scheduled """
+    filename = str(tmp_path / 'ms.db')
+    db = Database(filename, **DB_SETTINGS)
+    db.conn.execute("INSERT INTO token_network(address) VALUES (?)", ['a'])
+    events = [
+        ScheduledEvent(
+            trigger_block_number=BlockNumber(10),
+            event=event_type(
+                token_network_address=TokenNetworkAddress('a'),
+                channel_identifier=ChannelID(1),
+                non_closing_participant=Address('b'),
+            ),
+        )
+        for event_type in [ActionMonitoringTriggeredEvent, ActionClaimRewardTriggeredEvent]
+    ]
+    for event in events:
+        db.upsert_scheduled_event(event)
+
+    db.remove_scheduled_event(events[0])
+    assert db.scheduled_event_count() == 1
+    assert db.next_scheduled_event(BlockNumber(10)) == events[1]
+    assert db.get_scheduled_events(BlockNumber(10)) == [events[1]]
+
+    # the remaining event is loaded from the db
+    db = Database(filename, **DB_SETTINGS)
+    assert db.next_scheduled_event(BlockNumber(10)) == events[1]
+
+
+def test_transaction_rollback(ms_database):
+    ms_database.conn.execute("INSERT INTO token_network(address) VALUES (?)", ['a'])
+    event = ScheduledEvent(
+        trigger_block_number=BlockNumber(10),
+        event=ActionMonitoringTriggeredEvent(
+            token_network_address=TokenNetworkAddress('a'),
+            channel_identifier=ChannelID(1),
+            non_closing_participant=Address('b'),
+        ),
+    )
+    state = ms_database.load_state()
+    state.blockchain_state.latest_known_block = BlockNumber(10)
+
+    with pytest.raises(KeyboardInterrupt):
+        with ms_database.transaction():
+            ms_database.upsert_scheduled_event(event)
+            ms_database.update_state(state)
+            raise KeyboardInterrupt
+
+    # none of the changes are stored, also not in the scheduled events heap
+    assert ms_database.load_state().blockchain_state.latest_known_block == 0
+    assert ms_database.scheduled_event_count() == 0
+    assert ms_database.next_scheduled_event(BlockNumber(10)) is None
+
+    with ms_database.transaction():
+        ms_database.upsert_scheduled_event(event)
+        ms_database.update_state(state)
+    assert ms_database.load_state().blockchain_state.latest_known_block == 10
+    assert ms_database.get_scheduled_events(BlockNumber(10)) == [event]
+
+
 def test_waiting_transactions(ms_database):
     assert ms_database.get_waiting_transactions() == []
 
@@ -0,0 +1,261 @@
+import pickle
+import random
+from typing import Callable, List
+
+import pytest
+
+from pathfinding_service.config import (
+    ARRAY_GRAPH_MIN_COMPACTION_CHANGES,
+    DEFAULT_REVEAL_TIMEOUT,
+    MAX_PATHS_PER_REQUEST,
+)
+from pathfinding_service.exceptions import InvalidCapacityUpdate
+from pathfinding_service.model import ArrayTokenNetwork, TokenNetwork
+from pathfinding_service.routing import RoutingEngine
+from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_libs.types import Address, TokenNetworkAddress
+
+TOKEN_NETWORK_ADDRESS = TokenNetworkAddress('0x' + '1' * 40)
+
+
+@pytest.fixture
+def array_token_network() -> ArrayTokenNetwork:
+    return ArrayTokenNetwork(TOKEN_NETWORK_ADDRESS)
+
+
+def assert_same_paths(
+    token_network: TokenNetwork, array_token_network: ArrayTokenNetwork, addresses: List[Address]
+):
+    random.seed(len(addresses))
+    for _ in range(20):
+        source, target = random.sample(addresses, 2)
+        value = TokenAmount(random.randint(1, 100))
+        assert array_token_network.is_path_possible(
+            source, target, value
+        ) == token_network.is_path_possible(source, target, value)
+        for engine in RoutingEngine:
+            token_network.routing_engine = engine
+            array_token_network.routing_engine = engine
+            try:
+                expected = token_network.get_paths(source, target, value, MAX_PATHS_PER_REQUEST)
+            except Exception as exc:  # pylint: disable=broad-except
+                with pytest.raises(type(exc)):
+                    array_token_network.get_paths(source, target, value, MAX_PATHS_PER_REQUEST)
+            else:
+                assert (
+                    array_token_network.get_paths(source, target, value, MAX_PATHS_PER_REQUEST)
+                    == expected
+                )
+
+
+@pytest.mark.parametrize(
+    'channel_descriptions',
+    ['channel_descriptions_case_1', 'channel_descriptions_case_2', 'channel_descriptions_case_3'],
+)
+def test_array_token_network_finds_same_paths(
+    request,
+    populate_token_network: Callable,
+    token_network_model: TokenNetwork,
+    array_token_network: ArrayTokenNetwork,
+    addresses: List[Address],
+    channel_descriptions: str,
+):
+    descriptions = request.getfixturevalue(channel_descriptions)
+    populate_token_network(token_network_model, addresses, descriptions)
+    populate_token_network(array_token_network, addresses, descriptions)
+
+    assert_same_paths(token_network_model, array_token_network, addresses)
+
+    # closing channels changes the graph for both
+    for channel_id in range(0, len(descriptions), 3):
+        token_network_model.handle_channel_closed_event(ChannelID(channel_id))
+        array_token_network.handle_channel_closed_event(ChannelID(channel_id))
+    assert dict(array_token_network.channel_id_to_addresses) == (
+        token_network_model.channel_id_to_addresses
+    )
+    # the changes are published as one version
+    assert array_token_network.has_unpublished_changes
+    assert token_network_model.has_unpublished_changes
+    array_token_network.publish_version()
+    token_network_model.publish_version()
+    assert array_token_network.version == token_network_model.version == 1
+    assert not array_token_network.has_unpublished_changes
+    assert_same_paths(token_network_model, array_token_network, addresses)
+
+
+def test_array_token_network_channel_lifecycle(
+    array_token_network: ArrayTokenNetwork, addresses: List[Address]
+):
+    # opening the same channel multiple times is idempotent
+    for _ in range(3):
+        array_token_network.handle_channel_opened_event(
+            channel_identifier=ChannelID(1),
+            participant1=addresses[0],
+            participant2=addresses[1],
+            settle_timeout=100,
+        )
+    assert dict(array_token_network.channel_id_to_addresses) == {
+        ChannelID(1): (addresses[0], addresses[1])
+    }
+
+    array_token_network.handle_channel_new_deposit_event(ChannelID(1), addresses[1], 50)
+    view_to_partner, view_from_partner = array_token_network.get_channel_views_for_partner(
+        ChannelID(1), addresses[1], addresses[0]
+    )
+    assert view_to_partner.self == addresses[1]
+    assert view_to_partner.partner == addresses[0]
+    assert view_to_partner.deposit == 50
+    assert view_to_partner.capacity == 50
+    assert view_to_partner.reveal_timeout == DEFAULT_REVEAL_TIMEOUT
+    assert view_from_partner.capacity == 0
+
+    array_token_network.handle_channel_balance_update_message(
+        channel_identifier=ChannelID(1),
+        updating_participant=addresses[1],
+        other_participant=addresses[0],
+        updating_nonce=Nonce(1),
+        other_nonce=Nonce(2),
+        updating_capacity=TokenAmount(30),
+        other_capacity=TokenAmount(20),
+        reveal_timeout=5,
+        mediation_fee=FeeAmount(3),
+    )
+    assert view_to_partner.capacity == 30
+    assert view_to_partner.update_nonce == 1
+    assert view_to_partner.reveal_timeout == 5
+    assert view_to_partner.fee(TokenAmount(10)) == 3
+    assert view_from_partner.capacity == 20
+    assert view_from_partner.update_nonce == 2
+    assert array_token_network.get_paths(addresses[1], addresses[0], TokenAmount(10), 3) == [
+        dict(path=[addresses[1], addresses[0]], estimated_fee=3)
+    ]
+
+    with pytest.raises(InvalidCapacityUpdate):
+        array_token_network.handle_channel_balance_update_message(
+            channel_identifier=ChannelID(1),
+            updating_participant=addresses[1],
+            other_participant=addresses[0],
+            updating_nonce=Nonce(2 ** 64),
+            other_nonce=Nonce(2),
+            updating_capacity=TokenAmount(30),
+            other_capacity=TokenAmount(20),
+            reveal_timeout=5,
+            mediation_fee=FeeAmount(3),
+        )
+
+    # closing is idempotent and the slot is reused for the next channel
+    array_token_network.handle_channel_closed_event(ChannelID(1))
+    array_token_network.handle_channel_closed_event(ChannelID(1))
+    assert len(array_token_network.channel_id_to_addresses) == 0
+    array_token_network.handle_channel_opened_event(
+        channel_identifier=ChannelID(2),
+        participant1=addresses[2],
+        participant2=addresses[3],
+        settle_timeout=100,
+    )
+    assert len(array_token_network.channel_ids) == 1
+    view, _ = array_token_network.get_channel_views_for_partner(
+        ChannelID(2), addresses[2], addresses[3]
+    )
+    assert view.capacity == 0
+    assert view.update_nonce == 0
+
+
+def test_array_token_network_multiple_channels_for_two_participants(
+    array_token_network: ArrayTokenNetwork, addresses: List[Address]
+):
+    for channel_id in (1, 2):
+        array_token_network.handle_channel_opened_event(
+            channel_identifier=ChannelID(channel_id),
+            participant1=addresses[0],
+            participant2=addresses[1],
+            settle_timeout=100,
+        )
+        array_token_network.handle_channel_new_deposit_event(
+            ChannelID(channel_id), addresses[0], 100
+        )
+
+    # like in `TokenNetwork`, only the latest channel is used for routing
+    paths = array_token_network.get_paths(addresses[0], addresses[1], TokenAmount(10), 1)
+    assert paths == [dict(path=[addresses[0], addresses[1]], estimated_fee=0)]
+    assert array_token_network._channel_view(0, 1).channel_id == 2
+
+    array_token_network.handle_channel_closed_event(ChannelID(2))
+    paths = array_token_network.get_paths(addresses[0], addresses[1], TokenAmount(10), 1)
+    assert paths == [dict(path=[addresses[0], addresses[1]], estimated_fee=0)]
+    assert array_token_network._channel_view(0, 1).channel_id == 1
+
+
+def test_array_token_network_updates_graph_without_rebuild(
+    array_token_network: ArrayTokenNetwork, addresses: List[Address]
+):
+    array_token_network.handle_channel_opened_event(
+        channel_identifier=ChannelID(1),
+        participant1=addresses[0],
+        participant2=addresses[1],
+        settle_timeout=100,
+    )
+    array_token_network.handle_channel_new_deposit_event(ChannelID(1), addresses[0], 100)
+    assert array_token_network.is_path_possible(addresses[0], addresses[1], TokenAmount(10))
+    graph = array_token_network.G
+
+    # opening and closing channels changes the graph in place
+    array_token_network.handle_channel_opened_event(
+        channel_identifier=ChannelID(2),
+        participant1=addresses[1],
+        participant2=addresses[2],
+        settle_timeout=100,
+    )
+    array_token_network.handle_channel_new_deposit_event(ChannelID(2), addresses[1], 100)
+    assert not array_token_network.graph_outdated
+    assert array_token_network.get_paths(addresses[0], addresses[2], TokenAmount(10), 1) == [
+        dict(path=[addresses[0], addresses[1], addresses[2]], estimated_fee=0)
+    ]
+
+    array_token_network.handle_channel_closed_event(ChannelID(1))
+    assert not array_token_network.graph_outdated
+    assert not array_token_network.is_path_possible(addresses[0], addresses[2], TokenAmount(10))
+    assert array_token_network.G is graph
+    assert graph.num_changes == 6
+
+    # the graph is rebuilt after many changes
+    graph.num_changes = ARRAY_GRAPH_MIN_COMPACTION_CHANGES
+    array_token_network.handle_channel_closed_event(ChannelID(2))
+    assert array_token_network.graph_outdated
+    assert not array_token_network.is_path_possible(addresses[1], addresses[2], TokenAmount(10))
+    assert array_token_network.G is not graph
+    assert array_token_network.G.num_changes == 0
+
+
+def test_array_token_network_channel_views_of_non_participant(
+    array_token_network: ArrayTokenNetwork, addresses: List[Address]
+):
+    array_token_network.handle_channel_opened_event(
+        channel_identifier=ChannelID(1),
+        participant1=addresses[0],
+        participant2=addresses[1],
+        settle_timeout=100,
+    )
+    with pytest.raises(KeyError):
+        array_token_network.get_channel_views_for_partner(ChannelID(1), addresses[2], addresses[0])
+    with pytest.raises(KeyError):
+        array_token_network.get_channel_views_for_partner(ChannelID(1), addresses[0], addresses[2])
+
+
+def test_array_token_network_neighbors_are_views(
+    populate_token_network: Callable,
+    token_network_model: TokenNetwork,
+    array_token_network: ArrayTokenNetwork,
+    addresses: List[Address],
+    channel_descriptions_case_1: List,
+):
+    populate_token_network(token_network_model, addresses, channel_descriptions_case_1)
+    populate_token_network(array_token_network, addresses, channel_descriptions_case_1)
+    array_token_network._update_graph()
+    neighbors = array_token_network.G.succ[0]
+    assert isinstance(neighbors.nodes, memoryview)
+    assert list(neighbors) == sorted(neighbors)
+
+    # the path workers get pickled copies
+    copied_network = pickle.loads(pickle.dumps(array_token_network))
+    assert_same_paths(token_network_model, copied_network, addresses)
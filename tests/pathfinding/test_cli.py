@@ -5,6 +5,8 @@ import pytest
 from click.testing import CliRunner
 
 from pathfinding_service.cli import main
+from pathfinding_service.model import ArrayTokenNetwork, TokenNetwork
+from pathfinding_service.routing import RoutingEngine
 from raiden_contracts.constants import (
     CONTRACT_MONITORING_SERVICE,
     CONTRACT_TOKEN_NETWORK_REGISTRY,
@@ -108,6 +110,93 @@ def test_confirmations(default_cli_args):
         assert mocks['PathfindingService'].call_args[1]['required_confirmations'] == confirmations
 
 
+@pytest.mark.usefixtures('provider_mock')
+def test_routing_engine(default_cli_args):
+    """ The `routing-engine` parameter must reach the `PathfindingService` """
+    runner = CliRunner()
+    with patch.multiple(**patch_args) as mocks, patch.multiple(**patch_info_args):
+        result = runner.invoke(main, default_cli_args, catch_exceptions=False)
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['routing_engine'] == RoutingEngine.YEN
+
+        result = runner.invoke(
+            main,
+            default_cli_args + ['--routing-engine', 'penalized-dijkstra'],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+        assert (
+            mocks['PathfindingService'].call_args[1]['routing_engine']
+            == RoutingEngine.PENALIZED_DIJKSTRA
+        )
+
+
+@pytest.mark.usefixtures('provider_mock')
+def test_graph_backend(default_cli_args):
+    """ The `graph-backend` parameter selects the token network class """
+    runner = CliRunner()
+    with patch.multiple(**patch_args) as mocks, patch.multiple(**patch_info_args):
+        result = runner.invoke(main, default_cli_args, catch_exceptions=False)
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['token_network_class'] == TokenNetwork
+
+        result = runner.invoke(
+            main, default_cli_args + ['--graph-backend', 'array'], catch_exceptions=False
+        )
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['token_network_class'] == ArrayTokenNetwork
+
+
+@pytest.mark.usefixtures('provider_mock')
+def test_route_cache_size(default_cli_args):
+    """ The `route-cache-size` parameter must reach the `PathfindingService` """
+    runner = CliRunner()
+    with patch.multiple(**patch_args) as mocks, patch.multiple(**patch_info_args):
+        result = runner.invoke(
+            main, default_cli_args + ['--route-cache-size', '0'], catch_exceptions=False
+        )
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['route_cache_size'] == 0
+
+
+@pytest.mark.usefixtures('provider_mock')
+def test_path_workers(default_cli_args):
+    """ The `path-workers` parameter must reach the `PathfindingService` """
+    runner = CliRunner()
+    with patch.multiple(**patch_args) as mocks, patch.multiple(**patch_info_args):
+        result = runner.invoke(main, default_cli_args, catch_exceptions=False)
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['num_path_workers'] == 0
+
+        result = runner.invoke(
+            main, default_cli_args + ['--path-workers', '4'], catch_exceptions=False
+        )
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['num_path_workers'] == 4
+
+
+@pytest.mark.usefixtures('provider_mock')
+def test_bootstrap_snapshot(default_cli_args, tmp_path):
+    """ The snapshot must reach the `PathfindingService`, the admin API is opt-in """
+    snapshot_file = tmp_path / 'snapshot.json.gz'
+    snapshot_file.write_bytes(b'')
+    runner = CliRunner()
+    with patch.multiple(**patch_args) as mocks, patch.multiple(**patch_info_args):
+        result = runner.invoke(main, default_cli_args, catch_exceptions=False)
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['bootstrap_snapshot'] is None
+        assert mocks['ServiceApi'].call_args[1]['enable_admin_api'] is False
+
+        result = runner.invoke(
+            main,
+            default_cli_args + ['--bootstrap-snapshot', str(snapshot_file), '--enable-admin-api'],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+        assert mocks['PathfindingService'].call_args[1]['bootstrap_snapshot'] == str(snapshot_file)
+        assert mocks['ServiceApi'].call_args[1]['enable_admin_api'] is True
+
+
 @pytest.mark.usefixtures('provider_mock')
 def test_shutdown(default_cli_args):
     """ Clean shutdown after KeyboardInterrupt """
@@ -0,0 +1,460 @@
+import sqlite3
+from typing import Any, Callable, List, Type
+from unittest.mock import Mock, patch
+
+import pytest
+from click.testing import CliRunner
+from networkx import NetworkXNoPath
+
+from pathfinding_service import PathfindingService
+from pathfinding_service.database import PFSDatabase
+from pathfinding_service.exceptions import InvalidCapacityUpdate, InvalidSnapshot
+from pathfinding_service.model import ArrayTokenNetwork, TokenNetwork
+from pathfinding_service.snapshot import (
+    decode_snapshot,
+    main as export_snapshot,
+    token_network_rows,
+    write_snapshot,
+)
+from raiden.utils.typing import BlockNumber, ChainID, ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_contracts.constants import CONTRACT_TOKEN_NETWORK_REGISTRY, CONTRACT_USER_DEPOSIT
+from raiden_libs.events import (
+    ReceiveChannelClosedEvent,
+    ReceiveChannelNewDepositEvent,
+    ReceiveChannelOpenedEvent,
+    ReceiveTokenNetworkCreatedEvent,
+)
+from raiden_libs.types import Address, TokenNetworkAddress
+from raiden_libs.utils import private_key_to_address
+from tests.pathfinding.test_capacity_updates import (
+    DEFAULT_TOKEN_NETWORK_ADDRESS,
+    PRIVAT_KEY_EXAMPLE_1,
+    PRIVAT_KEY_EXAMPLE_2,
+    get_updatepfs_message,
+)
+
+TOKEN_NETWORK_ADDRESS = TokenNetworkAddress('0x' + '1' * 40)
+CHAIN_ID = ChainID(1)
+REGISTRY_ADDRESS = Address('0x1234')
+VIEW_ATTRIBUTES = [
+    'channel_id',
+    'self',
+    'partner',
+    'settle_timeout',
+    'capacity',
+    'deposit',
+    'reveal_timeout',
+    'update_nonce',
+    'absolute_fee',
+    'relative_fee',
+]
+
+
+def create_pfs(
+    db_filename: str,
+    token_network_class: Type[TokenNetwork],
+    chain_id: ChainID = CHAIN_ID,
+    **kwargs: Any,
+) -> PathfindingService:
+    with patch('pathfinding_service.service.MatrixListener', new=Mock):
+        web3_mock = Mock()
+        web3_mock.net.version = str(chain_id)
+        return PathfindingService(
+            web3=web3_mock,
+            contracts={
+                CONTRACT_TOKEN_NETWORK_REGISTRY: Mock(address=REGISTRY_ADDRESS),
+                CONTRACT_USER_DEPOSIT: Mock(),
+            },
+            private_key='3a1076bf45ab87712ad64ccb3b10217737f7faacbf2872e88fdd9a537d8fe266',
+            db_filename=db_filename,
+            sync_start_block=BlockNumber(10),
+            token_network_class=token_network_class,
+            **kwargs,
+        )
+
+
+def assert_same_token_networks(
+    restored: TokenNetwork, token_network: TokenNetwork, addresses: List[Address]
+):
+    assert dict(restored.channel_id_to_addresses) == dict(token_network.channel_id_to_addresses)
+    for channel_id, (participant1, participant2) in token_network.channel_id_to_addresses.items():
+        for views, restored_views in zip(
+            token_network.get_channel_views_for_partner(channel_id, participant1, participant2),
+            restored.get_channel_views_for_partner(channel_id, participant1, participant2),
+        ):
+            for attribute in VIEW_ATTRIBUTES:
+                assert getattr(restored_views, attribute) == getattr(views, attribute)
+
+    def get_paths(token_network: TokenNetwork, source: int, target: int) -> List[dict]:
+        try:
+            return token_network.get_paths(
+                addresses[source], addresses[target], TokenAmount(10), max_paths=3
+            )
+        except NetworkXNoPath:
+            return []
+
+    for source in range(7):
+        for target in range(7):
+            if source != target:
+                assert get_paths(restored, source, target) == get_paths(
+                    token_network, source, target
+                )
+    assert get_paths(restored, 0, 4)
+
+
+@pytest.mark.parametrize('token_network_class', [TokenNetwork, ArrayTokenNetwork])
+def test_pfs_restores_token_networks(
+    tmp_path,
+    addresses: List[Address],
+    channel_descriptions_case_1: List,
+    token_network_class: Type[TokenNetwork],
+):
+    db_filename = str(tmp_path / 'pfs.db')
+    pfs = create_pfs(db_filename, token_network_class)
+    assert pfs.blockchain_state.latest_known_block == 10
+
+    pfs.handle_token_network_created(
+        ReceiveTokenNetworkCreatedEvent(
+            token_address=Address('0x' + '2' * 40),
+            token_network_address=TOKEN_NETWORK_ADDRESS,
+            block_number=BlockNumber(11),
+        )
+    )
+    token_network = pfs.token_networks[TOKEN_NETWORK_ADDRESS]
+    for channel_id, description in enumerate(channel_descriptions_case_1):
+        (p1, p1_deposit, p1_capacity, p1_fee, p1_reveal_timeout) = description[:5]
+        (p2, p2_deposit, p2_capacity, _p2_fee, _p2_reveal_timeout) = description[5:10]
+        pfs.handle_channel_opened(
+            ReceiveChannelOpenedEvent(
+                token_network_address=TOKEN_NETWORK_ADDRESS,
+                channel_identifier=ChannelID(channel_id),
+                participant1=addresses[p1],
+                participant2=addresses[p2],
+                settle_timeout=description[10],
+                block_number=BlockNumber(12),
+            )
+        )
+        for participant, deposit in ((p1, p1_deposit), (p2, p2_deposit)):
+            pfs.handle_channel_new_deposit(
+                ReceiveChannelNewDepositEvent(
+                    token_network_address=TOKEN_NETWORK_ADDRESS,
+                    channel_identifier=ChannelID(channel_id),
+                    participant_address=addresses[participant],
+                    total_deposit=deposit,
+                    block_number=BlockNumber(13),
+                )
+            )
+        pfs._update_token_network(
+            token_network,
+            'handle_channel_balance_update_message',
+            channel_identifier=ChannelID(channel_id),
+            updating_participant=addresses[p1],
+            other_participant=addresses[p2],
+            updating_nonce=Nonce(1),
+            other_nonce=Nonce(1),
+            updating_capacity=TokenAmount(p1_capacity),
+            other_capacity=TokenAmount(p2_capacity),
+            reveal_timeout=p1_reveal_timeout,
+            mediation_fee=FeeAmount(p1_fee),
+        )
+    pfs.handle_channel_closed(
+        ReceiveChannelClosedEvent(
+            token_network_address=TOKEN_NETWORK_ADDRESS,
+            channel_identifier=ChannelID(3),
+            closing_participant=addresses[3],
+            block_number=BlockNumber(14),
+        )
+    )
+    pfs.database.update_latest_known_block(BlockNumber(20))
+    # capacity updates are restored from the journal
+    pfs.journal.flush()
+    assert pfs.database.capacity_update_count() == len(channel_descriptions_case_1)
+
+    restarted_pfs = create_pfs(db_filename, token_network_class)
+    assert restarted_pfs.database.capacity_update_count() == 0
+    assert restarted_pfs.blockchain_state.latest_known_block == 20
+    assert restarted_pfs.blockchain_state.token_network_addresses == [TOKEN_NETWORK_ADDRESS]
+
+    restored = restarted_pfs.token_networks[TOKEN_NETWORK_ADDRESS]
+    assert ChannelID(3) not in restored.channel_id_to_addresses
+    assert_same_token_networks(restored, token_network, addresses)
+
+
+@pytest.mark.parametrize('token_network_class', [TokenNetwork, ArrayTokenNetwork])
+def test_pfs_bootstraps_from_snapshot(
+    tmp_path,
+    default_cli_args: List[str],
+    populate_token_network: Callable,
+    addresses: List[Address],
+    channel_descriptions_case_1: List,
+    token_network_class: Type[TokenNetwork],
+):
+    token_network = token_network_class(TOKEN_NETWORK_ADDRESS)
+    populate_token_network(token_network, addresses, channel_descriptions_case_1)
+    token_network.handle_channel_closed_event(ChannelID(3))
+    snapshot_filename = str(tmp_path / 'snapshot.json.gz')
+    write_snapshot(
+        snapshot_filename,
+        {TOKEN_NETWORK_ADDRESS: token_network},
+        CHAIN_ID,
+        REGISTRY_ADDRESS,
+        BlockNumber(100),
+    )
+
+    db_filename = str(tmp_path / 'pfs.db')
+    pfs = create_pfs(db_filename, token_network_class, bootstrap_snapshot=snapshot_filename)
+    assert pfs.blockchain_state.latest_known_block == 100
+    assert pfs.blockchain_state.token_network_addresses == [TOKEN_NETWORK_ADDRESS]
+    restored = pfs.token_networks[TOKEN_NETWORK_ADDRESS]
+    assert_same_token_networks(restored, token_network, addresses)
+
+    # snapshots are only loaded into empty databases
+    pfs.database.update_latest_known_block(BlockNumber(110))
+    restarted_pfs = create_pfs(
+        db_filename, token_network_class, bootstrap_snapshot=snapshot_filename
+    )
+    assert restarted_pfs.blockchain_state.latest_known_block == 110
+
+    # the exported snapshot contains the stored state
+    exported_filename = str(tmp_path / 'exported.json.gz')
+    result = CliRunner().invoke(
+        export_snapshot,
+        default_cli_args + ['--state-db', db_filename, '--output', exported_filename],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    with open(exported_filename, 'rb') as exported_file:
+        exported = exported_file.read()
+    block, token_networks = decode_snapshot(exported, CHAIN_ID, REGISTRY_ADDRESS)
+    assert block == 110
+    assert token_networks == {TOKEN_NETWORK_ADDRESS: token_network_rows(token_network)}
+
+    with pytest.raises(InvalidSnapshot):
+        decode_snapshot(b'not a snapshot', CHAIN_ID, REGISTRY_ADDRESS)
+    # snapshots of other chains and registries are rejected
+    with pytest.raises(InvalidSnapshot):
+        decode_snapshot(exported, ChainID(2), REGISTRY_ADDRESS)
+    with pytest.raises(InvalidSnapshot):
+        decode_snapshot(exported, CHAIN_ID, Address('0x' + '5' * 40))
+    with pytest.raises(InvalidSnapshot):
+        create_pfs(
+            str(tmp_path / 'other.db'),
+            token_network_class,
+            bootstrap_snapshot=snapshot_filename,
+            chain_id=ChainID(2),
+        )
+
+
+def test_database_upgrade(tmp_path):
+    """ Databases which only contain IOUs get the tables for the token networks """
+    db_filename = str(tmp_path / 'pfs.db')
+    conn = sqlite3.connect(db_filename)
+    conn.execute(
+        """
+        CREATE TABLE iou (
+            sender TEXT NOT NULL,
+            amount HEX_INT NOT NULL,
+            expiration_block HEX_INT NOT NULL,
+            signature TEXT NOT NULL,
+            claimed BOOL NOT NULL,
+            PRIMARY KEY (sender, expiration_block)
+        )
+    """
+    )
+    conn.execute("INSERT INTO iou VALUES ('0x1', '0x01', '0x02', '0x03', 0)")
+    conn.commit()
+    conn.close()
+
+    database = PFSDatabase(db_filename, pfs_address=Address('0x' + '3' * 40))
+    assert database.get_latest_known_block() is None
+    assert database.get_token_network_addresses() == []
+    assert database.conn.execute("SELECT count(*) FROM iou").fetchone()[0] == 1
+
+    database.update_latest_known_block(BlockNumber(5))
+    database.upsert_token_network(TOKEN_NETWORK_ADDRESS)
+    database = PFSDatabase(db_filename, pfs_address=Address('0x' + '3' * 40))
+    assert database.get_latest_known_block() == 5
+    assert database.get_token_network_addresses() == [TOKEN_NETWORK_ADDRESS]
+
+
+@pytest.mark.parametrize('token_network_class', [TokenNetwork, ArrayTokenNetwork])
+def test_pfs_reverts_optimistic_events(
+    tmp_path, monkeypatch, addresses: List[Address], token_network_class: Type[TokenNetwork]
+):
+    pfs = create_pfs(
+        str(tmp_path / 'pfs.db'),
+        token_network_class,
+        required_confirmations=5,
+        optimistic_channels=True,
+    )
+    pfs.handle_token_network_created(
+        ReceiveTokenNetworkCreatedEvent(
+            token_address=Address('0x' + '2' * 40),
+            token_network_address=TOKEN_NETWORK_ADDRESS,
+            block_number=BlockNumber(10),
+        )
+    )
+    token_network = pfs.token_networks[TOKEN_NETWORK_ADDRESS]
+    opened_event = ReceiveChannelOpenedEvent(
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(1),
+        participant1=addresses[0],
+        participant2=addresses[1],
+        settle_timeout=15,
+        block_number=BlockNumber(12),
+    )
+    deposit_event = ReceiveChannelNewDepositEvent(
+        token_network_address=TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(1),
+        participant_address=addresses[0],
+        total_deposit=TokenAmount(100),
+        block_number=BlockNumber(13),
+    )
+    unconfirmed_events = [(b'\x12' * 32, opened_event), (b'\x13' * 32, deposit_event)]
+    monkeypatch.setattr(
+        'pathfinding_service.service.get_unconfirmed_token_network_events',
+        lambda **kwargs: unconfirmed_events,
+    )
+
+    def deposit() -> TokenAmount:
+        view, _ = token_network.get_channel_views_for_partner(
+            ChannelID(1), addresses[0], addresses[1]
+        )
+        return view.deposit
+
+    # unconfirmed channels are routable, but not stored
+    pfs.web3.eth.blockNumber = 15
+    pfs._apply_optimistic_events()
+    assert ChannelID(1) in token_network.channel_id_to_addresses
+    assert deposit() == 100
+    assert pfs.is_unconfirmed_channel(TOKEN_NETWORK_ADDRESS, ChannelID(1))
+    assert pfs.database.get_channel_views(TOKEN_NETWORK_ADDRESS) == []
+
+    # events removed by a reorg are reverted, the events before them stay applied
+    applied_opened_event = pfs.optimistic_events[0]
+    unconfirmed_events = [(b'\x12' * 32, opened_event), (b'\x14' * 32, deposit_event)]
+    pfs._apply_optimistic_events()
+    assert deposit() == 100
+    assert pfs.optimistic_events[0] is applied_opened_event
+    assert [event.block_hash for event in pfs.optimistic_events] == [b'\x12' * 32, b'\x14' * 32]
+    unconfirmed_events = []
+    pfs._apply_optimistic_events()
+    assert ChannelID(1) not in token_network.channel_id_to_addresses
+    assert pfs.optimistic_events == []
+
+    # confirming the blocks before the unconfirmed events keeps them applied
+    unconfirmed_events = [(b'\x12' * 32, opened_event), (b'\x13' * 32, deposit_event)]
+    pfs._apply_optimistic_events()
+    optimistic_events = list(pfs.optimistic_events)
+    pfs._handle_new_blocks(BlockNumber(11), pfs.blockchain_state, [])
+    assert pfs.optimistic_events == optimistic_events
+    assert all(applied is kept for applied, kept in zip(optimistic_events, pfs.optimistic_events))
+    assert deposit() == 100
+
+    # confirmed events are handled like before
+    unconfirmed_events = unconfirmed_events[1:]
+    pfs._handle_new_blocks(BlockNumber(12), pfs.blockchain_state, [opened_event])
+    assert deposit() == 0
+    pfs._apply_optimistic_events()
+    assert deposit() == 100
+    assert not pfs.is_unconfirmed_channel(TOKEN_NETWORK_ADDRESS, ChannelID(1))
+    assert len(pfs.database.get_channel_views(TOKEN_NETWORK_ADDRESS)) == 2
+
+    # blocks are not queried while the sync is behind
+    pfs.web3.eth.blockNumber = 100
+    unconfirmed_events = []
+    pfs._apply_optimistic_events()
+    assert deposit() == 100
+
+
+@pytest.mark.parametrize('token_network_class', [TokenNetwork, ArrayTokenNetwork])
+def test_pfs_keeps_capacity_updates_of_optimistic_deposits(
+    tmp_path, monkeypatch, token_network_class: Type[TokenNetwork]
+):
+    pfs = create_pfs(
+        str(tmp_path / 'pfs.db'),
+        token_network_class,
+        required_confirmations=5,
+        optimistic_channels=True,
+    )
+    participant1 = private_key_to_address(PRIVAT_KEY_EXAMPLE_1)
+    participant2 = private_key_to_address(PRIVAT_KEY_EXAMPLE_2)
+    pfs.handle_token_network_created(
+        ReceiveTokenNetworkCreatedEvent(
+            token_address=Address('0x' + '2' * 40),
+            token_network_address=DEFAULT_TOKEN_NETWORK_ADDRESS,
+            block_number=BlockNumber(10),
+        )
+    )
+    pfs.handle_channel_opened(
+        ReceiveChannelOpenedEvent(
+            token_network_address=DEFAULT_TOKEN_NETWORK_ADDRESS,
+            channel_identifier=ChannelID(0),
+            participant1=participant1,
+            participant2=participant2,
+            settle_timeout=15,
+            block_number=BlockNumber(10),
+        )
+    )
+    pfs.on_pfs_update(
+        get_updatepfs_message(
+            updating_participant=participant1,
+            other_participant=participant2,
+            updating_nonce=Nonce(5),
+            mediation_fee=FeeAmount(3),
+        )
+    )
+    token_network = pfs.token_networks[DEFAULT_TOKEN_NETWORK_ADDRESS]
+    view, _ = token_network.get_channel_views_for_partner(ChannelID(0), participant1, participant2)
+
+    # deposits for unknown channels are skipped
+    unknown_channel_event = ReceiveChannelNewDepositEvent(
+        token_network_address=DEFAULT_TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(7),
+        participant_address=participant1,
+        total_deposit=TokenAmount(50),
+        block_number=BlockNumber(12),
+    )
+    deposit_event = ReceiveChannelNewDepositEvent(
+        token_network_address=DEFAULT_TOKEN_NETWORK_ADDRESS,
+        channel_identifier=ChannelID(0),
+        participant_address=participant1,
+        total_deposit=TokenAmount(100),
+        block_number=BlockNumber(13),
+    )
+    monkeypatch.setattr(
+        'pathfinding_service.service.get_unconfirmed_token_network_events',
+        lambda **kwargs: [(b'\x12' * 32, unknown_channel_event), (b'\x13' * 32, deposit_event)],
+    )
+    pfs.web3.eth.blockNumber = 15
+    pfs._apply_optimistic_events()
+    assert view.deposit == 100
+    assert len(pfs.optimistic_events) == 1
+
+    # skipped events are not mistaken for a reorg
+    pfs._publish_changes()
+    version = token_network.version
+    pfs._apply_optimistic_events()
+    pfs._publish_changes()
+    assert token_network.version == version
+
+    # unconfirmed deposits are not stored or exported
+    with pfs.confirmed_token_networks():
+        assert view.deposit == 0
+        assert view.update_nonce == 5
+    assert view.deposit == 100
+
+    # the capacity update survives reverting the deposit
+    pfs._handle_new_blocks(BlockNumber(12), pfs.blockchain_state, [])
+    assert view.deposit == 0
+    assert view.capacity == 90
+    assert view.update_nonce == 5
+    assert view.absolute_fee == 3
+    with pytest.raises(InvalidCapacityUpdate):
+        pfs.on_pfs_update(
+            get_updatepfs_message(
+                updating_participant=participant1,
+                other_participant=participant2,
+                updating_nonce=Nonce(4),
+            )
+        )
@@ -4,8 +4,11 @@ from typing import List
 
 import pytest
 from networkx import NetworkXNoPath
+from tests.pathfinding.config import NUMBER_OF_CHANNELS
 
+from pathfinding_service.config import DEFAULT_MAX_PATHS, MAX_PATHS_PER_REQUEST
 from pathfinding_service.model import ChannelView, TokenNetwork
+from pathfinding_service.routing import RoutingEngine
 from raiden.utils.typing import ChannelID, FeeAmount, TokenAmount
 from raiden_libs.types import Address
 
@@ -153,3 +156,129 @@ def test_diversity_penalty(
         [0, 7, 9, 10, 8],
         [0, 7, 6, 5, 8],
     ]
+
+
+def test_get_paths_leaves_graph_unmodified(
+    token_network_model: TokenNetwork,
+    populate_token_network_case_3: None,
+    addresses: List[Address],
+):
+    """ Edge weights are computed per request and never written to the shared graph """
+    edges_before = [
+        (node1, node2, dict(data)) for node1, node2, data in token_network_model.G.edges(data=True)
+    ]
+
+    token_network_model.get_paths(
+        addresses[0], addresses[8], value=TokenAmount(10), max_paths=5, diversity_penalty=10
+    )
+
+    edges_after = [
+        (node1, node2, dict(data)) for node1, node2, data in token_network_model.G.edges(data=True)
+    ]
+    assert edges_before == edges_after
+
+
+def test_routing_hides_unusable_channels(
+    token_network_model: TokenNetwork,
+    populate_token_network_case_1: None,
+    addresses: List[Address],
+):
+    # The direct channel 2->3 has a settle/reveal timeout ratio below the default ratio
+    paths = token_network_model.get_paths(
+        addresses[2], addresses[3], value=TokenAmount(10), max_paths=5
+    )
+    index_paths = [addresses_to_indexes(p['path'], addresses) for p in paths]
+    assert index_paths == [[2, 1, 4, 3], [2, 0, 1, 4, 3]]
+
+    # No channel can carry this amount
+    with pytest.raises(NetworkXNoPath):
+        token_network_model.get_paths(
+            addresses[0], addresses[1], value=TokenAmount(1000), max_paths=1
+        )
+
+
+@pytest.mark.parametrize('diversity_penalty', [1.1, 5, 10])
+def test_penalized_dijkstra_matches_yen(
+    token_network_model: TokenNetwork,
+    populate_token_network_case_3: None,
+    addresses: List[Address],
+    diversity_penalty: float,
+):
+    """ Both routing engines return the same paths unless the diversity penalty is tiny """
+
+    def get_paths(routing_engine):
+        token_network_model.routing_engine = routing_engine
+        paths = token_network_model.get_paths(
+            addresses[0],
+            addresses[8],
+            value=TokenAmount(10),
+            max_paths=5,
+            diversity_penalty=diversity_penalty,
+        )
+        return [p['path'] for p in paths]
+
+    assert get_paths(RoutingEngine.PENALIZED_DIJKSTRA) == get_paths(RoutingEngine.YEN)
+
+
+def test_routing_engine_benchmark(
+    token_network_model: TokenNetwork, populate_token_network_random: None
+):
+    """ Compare path quality and runtime of the routing engines """
+    G = token_network_model.G
+    random.seed(NUMBER_OF_CHANNELS)
+    requests = [random.sample(list(G.nodes), 2) for _ in range(20)]
+
+    results = {}
+    for routing_engine in RoutingEngine:
+        token_network_model.routing_engine = routing_engine
+        results[routing_engine] = []
+        start = time.time()
+        for source, target in requests:
+            paths = token_network_model.get_paths(
+                source, target, value=TokenAmount(100), max_paths=MAX_PATHS_PER_REQUEST
+            )
+            results[routing_engine].append([p['path'] for p in paths])
+        print(routing_engine, 'Mean runtime: ', (time.time() - start) / len(requests))
+
+    def mean_hops(results):
+        return sum(len(p) - 1 for paths in results for p in paths) / sum(map(len, results))
+
+    yen, penalized = results[RoutingEngine.YEN], results[RoutingEngine.PENALIZED_DIJKSTRA]
+    print('Paths per request: ', sum(map(len, yen)), sum(map(len, penalized)))
+    print('Mean hops: ', mean_hops(yen), mean_hops(penalized))
+
+    # The best paths are identical, later ones might differ when the penalized
+    # search keeps finding already known paths.
+    for yen_paths, penalized_paths in zip(yen, penalized):
+        assert yen_paths[:DEFAULT_MAX_PATHS] == penalized_paths[:DEFAULT_MAX_PATHS]
+    assert sum(map(len, penalized)) >= 0.9 * sum(map(len, yen))
+    assert mean_hops(penalized) <= 1.05 * mean_hops(yen)
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_get_paths_batch(token_network_model: TokenNetwork, addresses: List[Address]):
+    max_capacities = token_network_model.get_max_capacities(addresses[0])
+    assert max_capacities[addresses[1]] == 90
+    assert max_capacities[addresses[3]] == 35
+    assert addresses[5] not in max_capacities
+
+    requests = [
+        dict(source=addresses[0], target=addresses[3], value=TokenAmount(value), max_paths=3)
+        for value in (10, 35, 36)
+    ] + [
+        dict(source=addresses[2], target=addresses[3], value=TokenAmount(10), max_paths=2),
+        dict(source=addresses[0], target=addresses[5], value=TokenAmount(10), max_paths=2),
+        dict(source=addresses[2], target=addresses[3], value=TokenAmount(10), max_paths=2),
+    ]
+    results = token_network_model.get_paths_batch(requests)
+    assert len(results) == len(requests)
+    for request, result in zip(requests, results):
+        try:
+            expected = token_network_model.get_paths(**request)
+        except NetworkXNoPath:
+            expected = None
+        assert result == expected
+    assert results[2] is None
+    assert results[4] is None
+    # identical requests share the result
+    assert results[5] is results[3]
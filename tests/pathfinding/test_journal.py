@@ -0,0 +1,89 @@
+from typing import List
+
+import pytest
+
+from pathfinding_service.database import PFSDatabase
+from pathfinding_service.journal import CapacityUpdateJournal
+from pathfinding_service.model import TokenNetwork
+from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_libs.types import Address
+
+
+def capacity_update(
+    addresses: List[Address], nonce: int, capacity: int, channel_id: int = 0
+) -> dict:
+    return dict(
+        channel_identifier=ChannelID(channel_id),
+        updating_participant=addresses[0],
+        other_participant=addresses[1],
+        updating_nonce=Nonce(nonce),
+        other_nonce=Nonce(nonce),
+        updating_capacity=TokenAmount(capacity),
+        other_capacity=TokenAmount(capacity),
+        reveal_timeout=2,
+        mediation_fee=FeeAmount(1),
+    )
+
+
+@pytest.fixture
+def database(addresses: List[Address]) -> PFSDatabase:
+    return PFSDatabase(':memory:', pfs_address=addresses[-1])
+
+
+def test_journal_group_commit(database: PFSDatabase, addresses: List[Address]):
+    journal = CapacityUpdateJournal(database, flush_size=3, flush_interval=3600)
+    token_network_address = addresses[-2]
+
+    for nonce in range(1, 3):
+        journal.append(token_network_address, capacity_update(addresses, nonce, capacity=10))
+    assert database.capacity_update_count() == 0
+    assert len(journal.buffer) == 2
+
+    # the third update writes the whole group
+    journal.append(token_network_address, capacity_update(addresses, 3, capacity=10))
+    assert database.capacity_update_count() == 3
+    assert journal.buffer == []
+
+    journal.append(token_network_address, capacity_update(addresses, 4, capacity=10))
+    journal.flush()
+    assert database.capacity_update_count() == journal.num_entries == 4
+    rows = database.get_capacity_updates()
+    assert [row['updating_nonce'] for row in rows] == [1, 2, 3, 4]
+    assert dict(rows[0]) == dict(
+        capacity_update(addresses, 1, capacity=10), token_network_address=token_network_address
+    )
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_journal_replay_and_checkpoint(
+    database: PFSDatabase, token_network_model: TokenNetwork, addresses: List[Address]
+):
+    token_networks = {token_network_model.address: token_network_model}
+    journal = CapacityUpdateJournal(database, checkpoint_size=3)
+    view, _ = token_network_model.get_channel_views_for_partner(
+        ChannelID(0), addresses[0], addresses[1]
+    )
+    # the case_1 token network already contains nonces up to 2
+    for nonce, capacity in ((1, 5), (3, 20), (4, 30)):
+        journal.append(token_network_model.address, capacity_update(addresses, nonce, capacity))
+    # unknown channels are skipped
+    journal.append(
+        token_network_model.address, capacity_update(addresses, 5, capacity=1, channel_id=99)
+    )
+    journal.flush()
+
+    assert journal.replay(token_networks) == 2
+    assert view.capacity == 30
+    assert view.update_nonce == 4
+
+    # replaying twice doesn't change anything
+    assert journal.replay(token_networks) == 0
+
+    assert journal.is_checkpoint_needed()
+    journal.checkpoint(token_networks)
+    assert database.capacity_update_count() == journal.num_entries == 0
+    stored_views = database.get_channel_views(token_network_model.address)
+    assert [(row['participant1'], row['capacity']) for row in stored_views] == [
+        (addresses[0], 30),
+        (addresses[1], 30),
+    ]
@@ -113,3 +113,21 @@ def test_process_payment(
     pfs.database.conn.execute("UPDATE iou SET claimed=1")
     with pytest.raises(exceptions.IOUAlreadyClaimed):
         process_payment(iou, pfs)
+
+
+def test_process_payment_for_batch(
+    pathfinding_service_web3_mock, deposit_to_udc, create_account, get_private_key
+):
+    pfs = pathfinding_service_web3_mock
+    pfs.service_fee = 1
+    sender = create_account()
+    privkey = get_private_key(sender)
+    deposit_to_udc(sender, round(3 * UDC_SECURITY_MARGIN_FACTOR))
+
+    # The IOU has to cover the service fee for each request
+    iou = make_iou(privkey, pfs.address, amount=2)
+    with pytest.raises(exceptions.InsufficientServicePayment):
+        process_payment(iou, pfs, num_requests=3)
+
+    iou = make_iou(privkey, pfs.address, amount=3)
+    process_payment(iou, pfs, num_requests=3)
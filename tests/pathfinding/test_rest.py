@@ -9,7 +9,9 @@ from eth_utils import decode_hex, encode_hex, to_normalized_address
 
 import pathfinding_service.exceptions as exceptions
 from pathfinding_service.api import DEFAULT_MAX_PATHS, ServiceApi
+from pathfinding_service.config import API_PATH
 from pathfinding_service.model import IOU, TokenNetwork
+from pathfinding_service.snapshot import decode_snapshot, token_network_rows
 from raiden.utils.signer import LocalSigner
 from raiden.utils.signing import pack_data
 from raiden_contracts.tests.utils import get_random_privkey
@@ -134,6 +136,11 @@ def test_get_paths(
     paths = response.json()['result']
     assert len(paths) == 1
     assert paths == [{'path': [addresses[0], addresses[1], addresses[2]], 'estimated_fee': 0}]
+    # the response identifies the state of the graph used for the search
+    assert response.json()['graph_version'] == token_network_model.version
+    assert (
+        response.json()['block'] == api_sut.pathfinding_service.blockchain_state.latest_known_block
+    )
 
     # check default value for num_path
     data = {'from': addresses[0], 'to': addresses[2], 'value': 10}
@@ -155,6 +162,54 @@ def test_get_paths(
     gevent.killall([obj for obj in gc.get_objects() if isinstance(obj, gevent.Greenlet)])
 
 
+def test_get_paths_batch(
+    api_sut: ServiceApi, api_url: str, addresses: List[Address], token_network_model: TokenNetwork
+):
+    url = api_url + f'/{token_network_model.address}/paths/batch'
+
+    data = {
+        'requests': [
+            {'from': addresses[0], 'to': addresses[2], 'value': 10, 'max_paths': 3},
+            {'from': addresses[0], 'to': addresses[5], 'value': 10},  # no connection
+            {'from': addresses[0], 'to': addresses[2], 'value': 10 ** 6},  # too much
+            {'from': addresses[1], 'to': addresses[2], 'value': 10},
+        ]
+    }
+    response = requests.post(url, json=data)
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == 4
+    assert results[0] == {
+        'result': [{'path': [addresses[0], addresses[1], addresses[2]], 'estimated_fee': 0}]
+    }
+    for result in results[1:3]:
+        assert result['errors'].startswith('No suitable path found for transfer from')
+    assert results[3]['result'][0]['path'] == [addresses[1], addresses[2]]
+
+    # results are the same as for single requests
+    single_response = requests.post(
+        api_url + f'/{token_network_model.address}/paths', json=data['requests'][0]
+    )
+    assert single_response.json()['result'] == results[0]['result']
+    assert single_response.json()['graph_version'] == response.json()['graph_version']
+
+    # validation
+    response = requests.post(url, json={'requests': []})
+    assert response.status_code == 400
+    assert response.json()['error_code'] == exceptions.InvalidRequest.error_code
+    response = requests.post(url, json={'requests': [{'from': addresses[0], 'value': 10}]})
+    assert response.status_code == 400
+    assert response.json()['error_code'] == exceptions.InvalidRequest.error_code
+
+    # a single IOU has to pay for the whole batch
+    api_sut.pathfinding_service.service_fee = 1
+    response = requests.post(url, json=data)
+    assert response.json()['error_code'] == exceptions.MissingIOU.error_code
+
+    # kill all running greenlets
+    gevent.killall([obj for obj in gc.get_objects() if isinstance(obj, gevent.Greenlet)])
+
+
 #
 # tests for /info endpoint
 #
@@ -180,6 +235,28 @@ def test_get_info(api_sut: ServiceApi, api_url: str, pathfinding_service_mock):
     gevent.killall([obj for obj in gc.get_objects() if isinstance(obj, gevent.Greenlet)])
 
 
+#
+# tests for admin endpoints
+#
+def test_get_snapshot(
+    api_sut: ServiceApi, api_url: str, pathfinding_service_mock, token_network_model: TokenNetwork
+):
+    # admin endpoints are disabled by default
+    response = requests.get(api_url + '/admin/snapshot')
+    assert response.status_code == 404
+
+    pathfinding_service_mock.blockchain_state.latest_known_block = 20
+    api = ServiceApi(pathfinding_service_mock, enable_admin_api=True)
+    response = api.flask_app.test_client().get(API_PATH + '/admin/snapshot')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+    block, token_networks = decode_snapshot(
+        response.data, pathfinding_service_mock.chain_id, pathfinding_service_mock.registry_address
+    )
+    assert block == 20
+    assert token_networks == {token_network_model.address: token_network_rows(token_network_model)}
+
+
 #
 # tests for iou endpoint
 #
@@ -0,0 +1,121 @@
+from typing import List
+
+import pytest
+
+from pathfinding_service.model import TokenNetwork
+from pathfinding_service.route_cache import RouteCache
+from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_libs.types import Address
+
+
+def test_route_cache_lru(addresses: List[Address]):
+    cache = RouteCache(maxsize=2)
+    path_a, path_b, path_c = [addresses[:2]], [addresses[1:3]], [addresses[2:4]]
+
+    assert cache.get('a') is None
+    cache.put('a', path_a, [ChannelID(1)])
+    cache.put('b', path_b, [ChannelID(2)])
+    assert cache.get('a') == path_a
+
+    # 'b' is the least recently used entry
+    cache.put('c', path_c, [ChannelID(1), ChannelID(3)])
+    assert cache.get('b') is None
+    assert cache.get('a') == path_a
+    assert cache.get('c') == path_c
+    assert ChannelID(2) not in cache.keys_by_channel
+
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert cache.hit_rate == pytest.approx(0.6)
+    assert cache.stats() == dict(size=2, hits=3, misses=2, hit_rate=0.6)
+
+
+def test_route_cache_invalidation(addresses: List[Address]):
+    cache = RouteCache(maxsize=10)
+    cache.put('a', [addresses[:2]], [ChannelID(1)])
+    cache.put('b', [addresses[:3]], [ChannelID(1), ChannelID(2)])
+    cache.put('c', [addresses[2:4]], [ChannelID(3)])
+
+    cache.invalidate(ChannelID(1))
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert set(cache.keys_by_channel) == {ChannelID(3)}
+
+    # unknown channels are ignored
+    cache.invalidate(ChannelID(4))
+    assert len(cache) == 1
+
+
+def test_route_cache_disabled(addresses: List[Address]):
+    cache = RouteCache(maxsize=0)
+    cache.put('a', [addresses[:2]], [ChannelID(1)])
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert cache.hits + cache.misses == 0
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_get_paths_uses_route_cache(token_network_model: TokenNetwork, addresses: List[Address]):
+    cache = token_network_model.route_cache
+
+    def get_paths(value: int) -> List:
+        return token_network_model.get_paths(
+            addresses[2], addresses[3], value=TokenAmount(value), max_paths=2
+        )
+
+    paths = get_paths(10)
+    assert [path['path'] for path in paths] == [
+        [addresses[2], addresses[1], addresses[4], addresses[3]],
+        [addresses[2], addresses[0], addresses[1], addresses[4], addresses[3]],
+    ]
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert get_paths(10) == paths
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # a different amount needs a new search, even if the same paths are found
+    assert get_paths(15) == paths
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # update a channel which is not part of the paths
+    token_network_model.handle_channel_balance_update_message(
+        channel_identifier=ChannelID(6),
+        updating_participant=addresses[5],
+        other_participant=addresses[6],
+        updating_nonce=Nonce(3),
+        other_nonce=Nonce(2),
+        updating_capacity=TokenAmount(1),
+        other_capacity=TokenAmount(1),
+        reveal_timeout=2,
+        mediation_fee=FeeAmount(0),
+    )
+    assert get_paths(10) == paths
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # the first path can't be used for this amount anymore
+    token_network_model.handle_channel_balance_update_message(
+        channel_identifier=ChannelID(1),
+        updating_participant=addresses[2],
+        other_participant=addresses[1],
+        updating_nonce=Nonce(3),
+        other_nonce=Nonce(2),
+        updating_capacity=TokenAmount(5),
+        other_capacity=TokenAmount(130),
+        reveal_timeout=2,
+        mediation_fee=FeeAmount(0),
+    )
+    assert get_paths(10) != paths
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    # incomplete results are not cached, new channels could add paths
+    num_entries = len(cache)
+    for _ in range(2):
+        paths = token_network_model.get_paths(
+            addresses[2], addresses[3], value=TokenAmount(10), max_paths=10
+        )
+        assert len(paths) < 10
+    assert (cache.hits, cache.misses) == (2, 5)
+    assert len(cache) == num_entries
+
+    token_network_model.handle_channel_closed_event(ChannelID(4))
+    assert len(cache) == 0
@@ -1,7 +1,9 @@
 from typing import List
 
+import pytest
+
 from pathfinding_service.model import TokenNetwork
-from raiden.utils.typing import ChannelID
+from raiden.utils.typing import ChannelID, TokenAmount
 from raiden_libs.types import Address
 
 
@@ -50,3 +52,40 @@ def test_tn_multiple_channels_for_two_participants_opened(
 
     # there should be one channel left
     assert len(token_network_model.channel_id_to_addresses) == 1
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_tn_is_path_possible(token_network_model: TokenNetwork, addresses: List[Address]):
+    # connected, enough capacity
+    assert token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(10))
+    # unknown node
+    assert not token_network_model.is_path_possible(addresses[0], addresses[7], TokenAmount(10))
+    # different components
+    assert not token_network_model.is_path_possible(addresses[0], addresses[5], TokenAmount(10))
+    # the only usable channel to 3 has a capacity of 50
+    assert token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(50))
+    assert not token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(51))
+    # no channel from 4 can transfer more than 50
+    assert not token_network_model.is_path_possible(addresses[4], addresses[0], TokenAmount(51))
+
+    # closing the channels between 3 and the rest of the network splits the component
+    token_network_model.handle_channel_closed_event(ChannelID(2))
+    token_network_model.handle_channel_closed_event(ChannelID(3))
+    assert not token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(10))
+
+    # connect the components
+    token_network_model.handle_channel_opened_event(
+        ChannelID(7), addresses[3], addresses[5], settle_timeout=100
+    )
+    token_network_model.handle_channel_opened_event(
+        ChannelID(8), addresses[4], addresses[5], settle_timeout=100
+    )
+    token_network_model.handle_channel_new_deposit_event(ChannelID(8), addresses[4], 100)
+    assert token_network_model.components.connected(
+        token_network_model.G, addresses[0], addresses[3]
+    )
+    # no capacity for the new channel to 3 yet
+    assert not token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(1))
+    token_network_model.handle_channel_new_deposit_event(ChannelID(7), addresses[5], 100)
+    assert token_network_model.is_path_possible(addresses[0], addresses[3], TokenAmount(1))
+    assert token_network_model.get_paths(addresses[0], addresses[3], TokenAmount(1), 1)
@@ -0,0 +1,104 @@
+from typing import Generator, List
+
+import pytest
+from networkx import NetworkXNoPath
+
+from pathfinding_service.model import TokenNetwork
+from pathfinding_service.workers import PathWorkerError, PathWorkerPool
+from raiden.utils.typing import ChannelID, FeeAmount, Nonce, TokenAmount
+from raiden_libs.types import Address
+
+
+@pytest.fixture
+def worker_pool() -> Generator[PathWorkerPool, None, None]:
+    pool = PathWorkerPool(num_workers=2)
+    yield pool
+    pool.stop()
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_worker_pool_get_paths(
+    worker_pool: PathWorkerPool, token_network_model: TokenNetwork, addresses: List[Address]
+):
+    worker_pool.start({token_network_model.address: token_network_model})
+
+    def get_paths(source: Address, target: Address) -> List[dict]:
+        kwargs = dict(source=source, target=target, value=TokenAmount(10), max_paths=3)
+        return worker_pool.call(token_network_model.address, 'get_paths', kwargs)
+
+    # all workers have the same snapshot
+    for _ in range(len(worker_pool.workers)):
+        assert get_paths(addresses[0], addresses[3]) == token_network_model.get_paths(
+            addresses[0], addresses[3], TokenAmount(10), 3
+        )
+
+    # exceptions are raised in the main process
+    with pytest.raises(NetworkXNoPath):
+        get_paths(addresses[0], addresses[5])
+
+    # updates of the main process are replayed in the workers
+    kwargs = dict(
+        channel_identifier=ChannelID(3),
+        updating_participant=addresses[3],
+        other_participant=addresses[4],
+        updating_nonce=Nonce(10),
+        other_nonce=Nonce(10),
+        updating_capacity=TokenAmount(5),
+        other_capacity=TokenAmount(5),
+        reveal_timeout=2,
+        mediation_fee=FeeAmount(0),
+    )
+    token_network_model.handle_channel_balance_update_message(**kwargs)  # type: ignore
+    worker_pool.record_update(
+        token_network_model.address, 'handle_channel_balance_update_message', kwargs
+    )
+    # only once they are published
+    for _ in range(len(worker_pool.workers)):
+        assert len(get_paths(addresses[0], addresses[3])) > 0
+    worker_pool.publish()
+    for _ in range(len(worker_pool.workers)):
+        with pytest.raises(NetworkXNoPath):
+            get_paths(addresses[0], addresses[3])
+
+    # new token networks are sent as snapshot
+    other_network = TokenNetwork(Address('0x' + '2' * 40))
+    other_network.handle_channel_opened_event(ChannelID(1), addresses[0], addresses[1], 100)
+    other_network.handle_channel_new_deposit_event(ChannelID(1), addresses[0], 100)
+    worker_pool.add_token_network(other_network)
+    worker_pool.publish()
+    paths = worker_pool.call(
+        other_network.address,
+        'get_paths',
+        dict(source=addresses[0], target=addresses[1], value=TokenAmount(10), max_paths=1),
+    )
+    assert paths == [dict(path=[addresses[0], addresses[1]], estimated_fee=0)]
+
+
+@pytest.mark.usefixtures('populate_token_network_case_1')
+def test_worker_pool_replaces_terminated_worker(
+    worker_pool: PathWorkerPool, token_network_model: TokenNetwork, addresses: List[Address]
+):
+    token_networks = {token_network_model.address: token_network_model}
+    worker_pool.start(token_networks)
+    kwargs = dict(source=addresses[0], target=addresses[4], value=TokenAmount(10), max_paths=3)
+    paths_before_close = token_network_model.get_paths(**kwargs)  # type: ignore
+
+    # the replacement gets the changes made after the pool was started
+    token_network_model.handle_channel_closed_event(ChannelID(5))
+    worker_pool.record_update(
+        token_network_model.address, 'handle_channel_closed_event', dict(channel_identifier=5)
+    )
+    worker_pool.publish()
+    expected = token_network_model.get_paths(**kwargs)  # type: ignore
+    assert expected != paths_before_close
+
+    killed_worker = worker_pool.workers[0]
+    killed_worker.process.kill()
+    killed_worker.process.join()
+    with pytest.raises(PathWorkerError):
+        worker_pool.call(token_network_model.address, 'get_paths', kwargs)
+
+    assert worker_pool.workers[0] is not killed_worker
+    assert worker_pool.workers[0].process.is_alive()
+    for _ in range(2 * len(worker_pool.workers)):
+        assert worker_pool.call(token_network_model.address, 'get_paths', kwargs) == expected